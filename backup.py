@@ -7,6 +7,8 @@ import shutil
 import xbmc
 import xbmcgui
 import xbmcaddon
+from locking import file_lock
+from storage import atomic_write_json
 from utils import Utils
 from url_manager import URLManager
 
@@ -54,9 +56,8 @@ class BackupManager:
             backup_filename = f"plugin_backup_{timestamp}.json"
             backup_path = os.path.join(self.backup_dir, backup_filename)
             
-            # Guardar respaldo
-            with open(backup_path, 'w', encoding='utf-8') as f:
-                json.dump(backup_data, f, indent=2, ensure_ascii=False)
+            # Guardar respaldo (list_backups nunca ve un archivo a medio escribir)
+            atomic_write_json(backup_path, backup_data, indent=2)
             
             Utils.log(f"Respaldo creado: {backup_path}")
             return backup_path
@@ -65,34 +66,35 @@ class BackupManager:
             Utils.log(f"Error al crear respaldo: {str(e)}", xbmc.LOGERROR)
             return None
     
-    def restore_backup(self, backup_path, restore_settings=True):
-        """Restaurar desde archivo de respaldo"""
+    def restore_backup(self, backup_path, restore_settings=True, progress=None):
+        """Restaurar desde archivo de respaldo.
+        
+        progress es un diálogo de progreso opcional (Utils.create_progress_dialog);
+        si el usuario lo cancela no se modifica nada.
+        """
         try:
             if not os.path.exists(backup_path):
                 Utils.log(f"Archivo de respaldo no encontrado: {backup_path}", xbmc.LOGERROR)
                 return False
             
+            Utils.update_progress_dialog(progress, 5, "Leyendo respaldo...")
             with open(backup_path, 'r', encoding='utf-8') as f:
                 backup_data = json.load(f)
             
-            # Restaurar URLs
+            # Restaurar URLs: el conjunto final se construye en memoria y se escribe de una vez
             if 'urls' in backup_data:
-                url_manager = URLManager()
-                # Limpiar URLs existentes
-                current_urls = url_manager.get_saved_urls()
-                for url in current_urls:
-                    url_manager.delete_url(url['id'])
+                def report(done, total):
+                    percent = 10 + int(80 * done / total)
+                    return Utils.update_progress_dialog(progress, percent, f"Restaurando URLs... {done}/{total}")
                 
-                # Restaurar URLs del respaldo
-                for url_data in backup_data['urls']:
-                    url_manager.save_url(
-                        url_data['name'],
-                        url_data['url'],
-                        url_data.get('description', '')
-                    )
+                url_manager = URLManager()
+                if not url_manager.replace_urls(backup_data['urls'], report):
+                    Utils.log(f"Restauración de URLs no completada: {backup_path}", xbmc.LOGWARNING)
+                    return False
             
             # Restaurar configuraciones si se solicita
             if restore_settings and 'settings' in backup_data:
+                Utils.update_progress_dialog(progress, 95, "Restaurando configuraciones...")
                 self._restore_settings(backup_data['settings'])
             
             Utils.log(f"Respaldo restaurado desde: {backup_path}")
@@ -207,45 +209,57 @@ class BackupManager:
             return 0
     
     def auto_backup(self):
-        """Realizar respaldo automático según configuración"""
+        """Realizar respaldo automático según configuración.
+        
+        Si otra invocación ya está haciendo el respaldo automático no se espera:
+        esta lo omite en lugar de crear un segundo respaldo.
+        """
         try:
             if not Utils.get_addon_setting('auto_backup_urls', False):
                 return False
             
-            frequency = Utils.get_addon_setting('backup_frequency', '0')
-            last_backup = Utils.get_addon_setting('last_auto_backup', '')
-            
-            # Determinar si es necesario hacer respaldo
-            should_backup = False
-            
-            if not last_backup:
-                should_backup = True
-            else:
-                try:
-                    import datetime
-                    last_backup_date = datetime.datetime.fromisoformat(last_backup)
-                    now = datetime.datetime.now()
-                    
-                    if frequency == '0':  # Diario
-                        should_backup = (now - last_backup_date).days >= 1
-                    elif frequency == '1':  # Semanal
-                        should_backup = (now - last_backup_date).days >= 7
-                    elif frequency == '2':  # Mensual
-                        should_backup = (now - last_backup_date).days >= 30
-                        
-                except (ValueError, TypeError):
-                    should_backup = True
-            
-            if should_backup:
-                backup_path = self.create_backup(include_settings=False)
-                if backup_path:
-                    Utils.set_addon_setting('last_auto_backup', Utils.get_current_datetime())
-                    self.cleanup_old_backups()
-                    Utils.log("Respaldo automático completado")
-                    return True
-            
-            return False
+            with file_lock(os.path.join(self.backup_dir, 'auto_backup'), blocking=False) as locked:
+                if not locked:
+                    Utils.log("Respaldo automático en curso en otra invocación")
+                    return False
+                return self._auto_backup_locked()
             
         except Exception as e:
             Utils.log(f"Error en respaldo automático: {str(e)}", xbmc.LOGERROR)
-            return False
\ No newline at end of file
+            return False
+    
+    def _auto_backup_locked(self):
+        """Comprobar la fecha del último respaldo y crearlo si toca (con el bloqueo tomado)"""
+        frequency = Utils.get_addon_setting('backup_frequency', '0')
+        last_backup = Utils.get_addon_setting('last_auto_backup', '')
+        
+        # Determinar si es necesario hacer respaldo
+        should_backup = False
+        
+        if not last_backup:
+            should_backup = True
+        else:
+            try:
+                import datetime
+                last_backup_date = datetime.datetime.fromisoformat(last_backup)
+                now = datetime.datetime.now()
+                
+                if frequency == '0':  # Diario
+                    should_backup = (now - last_backup_date).days >= 1
+                elif frequency == '1':  # Semanal
+                    should_backup = (now - last_backup_date).days >= 7
+                elif frequency == '2':  # Mensual
+                    should_backup = (now - last_backup_date).days >= 30
+                    
+            except (ValueError, TypeError):
+                should_backup = True
+        
+        if should_backup:
+            backup_path = self.create_backup(include_settings=False)
+            if backup_path:
+                Utils.set_addon_setting('last_auto_backup', Utils.get_current_datetime())
+                self.cleanup_old_backups()
+                Utils.log("Respaldo automático completado")
+                return True
+        
+        return False
\ No newline at end of file
@@ -3,7 +3,6 @@
 
 import os
 import json
-import sqlite3
 import xbmc
 import xbmcaddon
 import xbmcgui
@@ -102,9 +101,12 @@ class BookmarkManager:
         if not bookmarks_db:
             return []
         
+        # sqlite3 solo se carga al importar de Firefox
+        import sqlite3
+        
+        temp_db = bookmarks_db + '.temp'
         try:
             # Hacer una copia temporal para evitar bloqueos
-            temp_db = bookmarks_db + '.temp'
             import shutil
             shutil.copy2(bookmarks_db, temp_db)
             
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import xbmc
+import xbmcaddon
+from utils import Utils
+
+# Contenido ya decodificado del archivo de caché: con reuselanguageinvoker este módulo
+# sobrevive entre invocaciones y se evita volver a leer el archivo si no ha cambiado
+_loaded_files = {}
+
+class BrowserCache:
+    """Caché persistente de navegadores detectados en el perfil del addon"""
+
+    CACHE_VERSION = 1
+
+    def __init__(self):
+        self.addon = xbmcaddon.Addon()
+        # Usar xbmcvfs.translatePath para compatibilidad con Kodi 19+
+        try:
+            import xbmcvfs
+            data_dir = xbmcvfs.translatePath(self.addon.getAddonInfo('profile'))
+        except (ImportError, AttributeError):
+            # Fallback para versiones anteriores de Kodi
+            data_dir = xbmc.translatePath(self.addon.getAddonInfo('profile'))
+
+        self.cache_dir = os.path.join(data_dir, 'cache')
+        self.cache_file = os.path.join(self.cache_dir, 'detected_browsers.json')
+
+    @staticmethod
+    def build_signature(paths):
+        """Obtener el mtime de cada ruta vigilada (None si no existe)"""
+        signature = {}
+        for path in paths:
+            try:
+                signature[path] = os.stat(path).st_mtime_ns
+            except OSError:
+                signature[path] = None
+        return signature
+
+    def load(self, context):
+        """Devolver los navegadores en caché si siguen siendo válidos"""
+        data = self._read_cache_file()
+        if data is None:
+            return None
+
+        if data.get('version') != self.CACHE_VERSION or data.get('context') != context:
+            return None
+
+        # Revalidar con una llamada a stat por ruta vigilada
+        signature = data.get('signature', {})
+        if self.build_signature(signature.keys()) != signature:
+            Utils.log("Caché de navegadores invalidada: cambios en el sistema de archivos")
+            return None
+
+        return data.get('browsers')
+
+    def _read_cache_file(self):
+        """Leer el archivo de caché, reutilizando la versión en memoria si no ha cambiado"""
+        try:
+            stat = os.stat(self.cache_file)
+        except OSError:
+            _loaded_files.pop(self.cache_file, None)
+            return None
+
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        loaded = _loaded_files.get(self.cache_file)
+        if loaded and loaded[0] == stamp:
+            return loaded[1]
+
+        try:
+            with open(self.cache_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return None
+
+        _loaded_files[self.cache_file] = (stamp, data)
+        return data
+
+    def save(self, context, watch_paths, browsers):
+        """Guardar navegadores detectados junto con la firma de las rutas vigiladas"""
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+
+            data = {
+                'version': self.CACHE_VERSION,
+                'context': context,
+                'signature': self.build_signature(watch_paths),
+                'browsers': browsers
+            }
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            return True
+        except (IOError, OSError) as e:
+            Utils.log(f"Error al guardar caché de navegadores: {str(e)}", xbmc.LOGWARNING)
+            return False
+
+    def invalidate(self):
+        """Eliminar la caché para forzar una nueva detección"""
+        try:
+            if os.path.exists(self.cache_file):
+                os.remove(self.cache_file)
+            Utils.log("Caché de navegadores eliminada")
+            return True
+        except OSError as e:
+            Utils.log(f"Error al eliminar caché de navegadores: {str(e)}", xbmc.LOGERROR)
+            return False
@@ -2,20 +2,55 @@
 # -*- coding: utf-8 -*-
 
 import os
+import time
 import platform
+import threading
 import subprocess
 import xbmc
+import xbmcgui
 import xbmcaddon
+from browser_cache import BrowserCache
 from utils import Utils
+from window_cache import WindowCache
 
 class BrowserDetector:
     """Clase para detectar navegadores web instalados en el sistema"""
     
+    # Datos de la ventana principal donde el servicio publica la detección
+    PUBLISHED_NAMESPACE = 'browsers'
+    HEARTBEAT_PROPERTY = 'plugin.navegador.kodi.service_heartbeat'
+    # Segundos sin latido tras los que se ignoran los datos publicados
+    HEARTBEAT_TIMEOUT = 30
+    # Sondeos más lentos que se registran tras cada detección
+    SLOWEST_PROBES_LOGGED = 3
+    
     def __init__(self):
         self.addon = xbmcaddon.Addon()
         self.system = platform.system().lower()
         self.addon_path = self.addon.getAddonInfo('path')
         self.icons_path = os.path.join(self.addon_path, 'resources', 'images')
+        self.cache = BrowserCache()
+        self.path_index = None
+        self._path_index_lock = threading.Lock()
+        self.probe_timings = []
+        self.detection_complete = True
+        # Ejecutable -> navegador de la última lista obtenida
+        self.browser_index = {}
+        
+        # Detección en paralelo con número de hilos y plazo máximo configurables
+        self.parallel_detection = self.addon.getSetting('parallel_detection') == 'true'
+        self.detection_workers = max(1, int(self.addon.getSetting('detection_workers') or '8'))
+        self.detection_timeout = max(1, int(self.addon.getSetting('detection_timeout') or '10'))
+        
+        # Modo de descubrimiento de navegadores adicionales: 0 = MIME, 1 = palabras clave
+        self.discovery_mode = self.addon.getSetting('desktop_discovery_mode') or '0'
+        
+        # Directorios con archivos .desktop (Linux)
+        self.desktop_paths = [
+            '/usr/share/applications/',
+            '/usr/local/share/applications/',
+            '~/.local/share/applications/'
+        ]
         
         # Definir navegadores conocidos por sistema operativo
         self.browsers_config = {
@@ -172,128 +207,389 @@ class BrowserDetector:
             Utils.log(f"Icono no encontrado: {icon_path}, usando por defecto", xbmc.LOGWARNING)
             return 'DefaultProgram.png'
     
-    def get_installed_browsers(self):
-        """Obtener lista de navegadores instalados en el sistema"""
+    def get_installed_browsers(self, use_cache=True, force_refresh=False, detect=True, use_published=True):
+        """Obtener lista de navegadores instalados en el sistema.
+        
+        Con detect=False solo se consultan los datos publicados y la caché en disco;
+        si no hay ninguno se devuelve una lista vacía en lugar de detectar.
+        Con use_published=False se omiten los datos publicados por el servicio, de
+        modo que la caché en disco se revalida y se detecta de nuevo si ha caducado.
+        """
+        context = self._get_cache_context()
+        
+        if use_cache and not force_refresh:
+            # Resultados mantenidos al día por el servicio en segundo plano
+            published_browsers = self._load_published(context) if use_published else None
+            if published_browsers is not None:
+                Utils.log(f"Navegadores obtenidos del servicio: {len(published_browsers)}")
+                return self._index_browsers(published_browsers)
+            
+            cached_browsers = self.cache.load(context)
+            if cached_browsers is not None:
+                Utils.log(f"Navegadores obtenidos de caché: {len(cached_browsers)}")
+                return self._index_browsers(cached_browsers)
+        
+        if not detect:
+            return self._index_browsers([])
+        
+        installed_browsers = self._detect_browsers()
+        
+        # Una detección interrumpida por el plazo no se guarda en caché
+        if use_cache and self.detection_complete:
+            self.cache.save(context, self.get_watch_paths(installed_browsers), installed_browsers)
+        
+        return self._index_browsers(installed_browsers)
+    
+    def _index_browsers(self, browsers):
+        """Indexar los navegadores por ejecutable para búsquedas directas"""
+        self.browser_index = {browser['executable']: browser for browser in browsers}
+        return browsers
+    
+    def find_browser(self, executable):
+        """Obtener el navegador de un ejecutable sin lanzar una nueva detección"""
+        if executable not in self.browser_index:
+            self.get_installed_browsers(detect=False)
+        return self.browser_index.get(executable)
+    
+    def _load_published(self, context):
+        """Leer la detección publicada por el servicio si está activo"""
+        try:
+            heartbeat = float(xbmcgui.Window(10000).getProperty(self.HEARTBEAT_PROPERTY) or 0)
+        except ValueError:
+            return None
+        if time.time() - heartbeat > self.HEARTBEAT_TIMEOUT:
+            return None
+        
+        data = WindowCache(self.PUBLISHED_NAMESPACE).get()
+        if not data or data.get('context') != context:
+            return None
+        return data.get('browsers')
+    
+    def publish_browsers(self, browsers):
+        """Publicar la detección para que el plugin la lea sin acceder a disco"""
+        cache = WindowCache(self.PUBLISHED_NAMESPACE)
+        data = {
+            'context': self._get_cache_context(),
+            'browsers': browsers
+        }
+        cache.set(data, cache.get_generation())
+    
+    @classmethod
+    def is_published(cls):
+        """Comprobar si hay una detección publicada vigente"""
+        return WindowCache(cls.PUBLISHED_NAMESPACE).has_data()
+    
+    @classmethod
+    def clear_published(cls):
+        """Retirar la detección publicada por el servicio"""
+        WindowCache(cls.PUBLISHED_NAMESPACE).invalidate()
+        xbmcgui.Window(10000).clearProperty(cls.HEARTBEAT_PROPERTY)
+    
+    @classmethod
+    def service_heartbeat(cls):
+        """Indicar que el servicio sigue activo"""
+        xbmcgui.Window(10000).setProperty(cls.HEARTBEAT_PROPERTY, str(time.time()))
+    
+    def _detect_browsers(self):
+        """Realizar una detección completa de navegadores"""
         installed_browsers = []
         
+        # El índice del PATH se construye una sola vez por detección
+        self.path_index = None
+        self.probe_timings = []
+        self.detection_complete = True
+        
         # Obtener configuración de navegadores para el sistema actual
         browsers = self.browsers_config.get(self.system, [])
         
-        for browser in browsers:
-            browser_path = self._find_browser_executable(browser)
+        if self.parallel_detection:
+            browser_paths, additional_browsers = self._probe_parallel(browsers)
+        else:
+            browser_paths = [self._find_browser_executable(browser) for browser in browsers]
+            additional_browsers = self._detect_additional_browsers()
+        
+        # Mantener el orden de browsers_config
+        for browser, browser_path in zip(browsers, browser_paths):
             if browser_path:
                 installed_browser = browser.copy()
                 installed_browser['executable'] = browser_path
                 installed_browser['icon'] = self._get_icon_path(browser.get('icon'))
                 installed_browsers.append(installed_browser)
         
-        # Intentar detectar navegadores adicionales
-        additional_browsers = self._detect_additional_browsers()
-        installed_browsers.extend(additional_browsers)
+        # Añadir navegadores adicionales, omitiendo los ya detectados
+        known_executables = {os.path.realpath(b['executable']) for b in installed_browsers}
+        for browser in additional_browsers:
+            real_executable = os.path.realpath(browser['executable'])
+            if real_executable not in known_executables:
+                known_executables.add(real_executable)
+                installed_browsers.append(browser)
+        
+        if self.path_index:
+            timings = self.path_index.get_timings()
+            Utils.log(f"Resolución en PATH: {timings['lookups']} consultas, {timings['total_ms']:.1f} ms")
+        
+        slowest = self.get_probe_timings()[:self.SLOWEST_PROBES_LOGGED]
+        if slowest:
+            Utils.log("Sondeos más lentos: " + ', '.join(
+                f"{probe['name']} en {probe['path']} {probe['ms']:.1f} ms" for probe in slowest))
         
         Utils.log(f"Navegadores detectados: {len(installed_browsers)}")
         return installed_browsers
     
+    def _probe_parallel(self, browsers):
+        """Sondear todas las rutas candidatas y directorios a la vez con un plazo global"""
+        from concurrent.futures import ThreadPoolExecutor
+        
+        deadline = time.monotonic() + self.detection_timeout
+        executor = ThreadPoolExecutor(max_workers=self.detection_workers)
+        
+        try:
+            # Construir el índice del PATH mientras se sondean las rutas
+            if self.system == 'linux':
+                executor.submit(self._get_path_index)
+            
+            probe_futures = []
+            for browser in browsers:
+                for path in browser['paths']:
+                    path = self._expand_path(path)
+                    probe_futures.append((path, executor.submit(self._probe_path, browser['name'], path)))
+            
+            # Mientras tanto, el hilo principal busca navegadores adicionales usando el mismo pool
+            additional_browsers = self._detect_additional_browsers(
+                lambda func, items: self._collect_with_deadline(
+                    [executor.submit(func, item) for item in items], deadline, []))
+            
+            found, _ = self._collect_with_deadline(
+                [future for path, future in probe_futures], deadline, False)
+            found_paths = {path for (path, future), is_found in zip(probe_futures, found) if is_found}
+        finally:
+            executor.shutdown(wait=False)
+        
+        if not self.detection_complete:
+            Utils.log("Plazo de detección agotado: algunas rutas no se comprobaron", xbmc.LOGWARNING)
+        
+        browser_paths = []
+        for browser in browsers:
+            browser_path = None
+            for path in browser['paths']:
+                path = self._expand_path(path)
+                if path in found_paths:
+                    browser_path = path
+                    break
+            
+            # El índice del PATH solo se consulta si se llegó a construir dentro del plazo
+            if not browser_path and self.path_index:
+                browser_path = self.path_index.find(browser['executable'])
+            
+            if browser_path:
+                Utils.log(f"Navegador encontrado: {browser['name']} en {browser_path}")
+            browser_paths.append(browser_path)
+        
+        return browser_paths, additional_browsers
+    
+    def _collect_with_deadline(self, futures, deadline, default):
+        """Recoger resultados en orden; los que no terminan antes del plazo valen default"""
+        from concurrent.futures import wait
+        
+        done, not_done = wait(futures, timeout=max(0, deadline - time.monotonic()))
+        
+        for future in not_done:
+            future.cancel()
+        if not_done:
+            self.detection_complete = False
+        
+        results = [future.result() if future in done else default for future in futures]
+        return results, not not_done
+    
+    def _probe_path(self, browser_name, path):
+        """Comprobar si una ruta candidata es ejecutable, registrando su tiempo"""
+        start = time.perf_counter()
+        found = os.path.isfile(path) and os.access(path, os.X_OK)
+        self.probe_timings.append({
+            'name': browser_name,
+            'path': path,
+            'found': found,
+            'ms': (time.perf_counter() - start) * 1000
+        })
+        return found
+    
+    def get_probe_timings(self):
+        """Obtener los tiempos de cada candidato de la última detección, más lentos primero"""
+        return sorted(self.probe_timings, key=lambda x: x['ms'], reverse=True)
+    
+    def _expand_path(self, path):
+        """Expandir variables de entorno en Windows"""
+        if self.system == 'windows':
+            return os.path.expandvars(path)
+        return path
+    
+    def _get_cache_context(self):
+        """Datos que, si cambian, invalidan la caché por completo"""
+        return {
+            'system': self.system,
+            'addon_path': self.addon_path,
+            'addon_version': self.addon.getAddonInfo('version'),
+            'path_env': os.environ.get('PATH', ''),
+            'discovery_mode': self.discovery_mode
+        }
+    
+    def get_watch_paths(self, installed_browsers):
+        """Rutas cuyo mtime determina la validez de la caché"""
+        watch_paths = set()
+        
+        # Directorios de las rutas candidatas (detectan instalaciones y desinstalaciones)
+        for browser in self.browsers_config.get(self.system, []):
+            for path in browser['paths']:
+                if self.system == 'windows':
+                    path = os.path.expandvars(path)
+                watch_paths.add(os.path.dirname(path))
+        
+        # Ejecutables encontrados (detectan actualizaciones)
+        for browser in installed_browsers:
+            watch_paths.add(browser['executable'])
+        
+        if self.system == 'linux':
+            # Directorios del PATH y de archivos .desktop
+            for path_dir in os.environ.get('PATH', '').split(os.pathsep):
+                if path_dir:
+                    watch_paths.add(path_dir)
+            for desktop_path in self.desktop_paths:
+                watch_paths.add(os.path.expanduser(desktop_path))
+            if self.discovery_mode == '0':
+                from mime_discovery import MimeBrowserDiscovery
+                watch_paths.update(MimeBrowserDiscovery().get_watch_paths())
+        
+        return sorted(watch_paths)
+    
     def _find_browser_executable(self, browser):
         """Encontrar el ejecutable de un navegador específico"""
         for path in browser['paths']:
-            # Expandir variables de entorno en Windows
-            if self.system == 'windows':
-                path = os.path.expandvars(path)
+            path = self._expand_path(path)
             
-            if os.path.isfile(path) and os.access(path, os.X_OK):
+            if self._probe_path(browser['name'], path):
                 Utils.log(f"Navegador encontrado: {browser['name']} en {path}")
                 return path
         
         # Intentar encontrar en PATH
         if self.system == 'linux':
-            try:
-                result = subprocess.run(['which', browser['executable']], 
-                                     capture_output=True, text=True, timeout=5)
-                if result.returncode == 0:
-                    path = result.stdout.strip()
-                    if path:
-                        Utils.log(f"Navegador encontrado en PATH: {browser['name']} en {path}")
-                        return path
-            except (subprocess.TimeoutExpired, subprocess.SubprocessError):
-                pass
+            path = self._get_path_index().find(browser['executable'])
+            if path:
+                Utils.log(f"Navegador encontrado en PATH: {browser['name']} en {path}")
+                return path
         
         return None
     
-    def _detect_additional_browsers(self):
+    def _get_path_index(self):
+        """Obtener el índice del PATH de la detección en curso"""
+        from path_index import PathIndex
+        
+        with self._path_index_lock:
+            if self.path_index is None:
+                self.path_index = PathIndex()
+            return self.path_index
+    
+    def _detect_additional_browsers(self, map_func=None):
         """Detectar navegadores adicionales no incluidos en la configuración"""
+        # Solo se cargan cuando hay que detectar (no en los aciertos de caché)
+        from desktop_index import DesktopIndex
+        from mime_discovery import MimeBrowserDiscovery
+        
         additional_browsers = []
         
-        if self.system == 'linux':
-            # Buscar en aplicaciones del sistema
-            desktop_paths = [
-                '/usr/share/applications/',
-                '/usr/local/share/applications/',
-                '~/.local/share/applications/'
-            ]
+        if self.system == 'linux' and self.discovery_mode == '0':
+            # Consultar las asociaciones MIME de http(s) y leer solo esos .desktop
+            def discover(_):
+                start = time.perf_counter()
+                discovery = MimeBrowserDiscovery(self._get_path_index())
+                browsers = discovery.discover()
+                self.probe_timings.append({
+                    'name': 'MIME',
+                    'path': ', '.join(discovery.data_dirs),
+                    'found': bool(browsers),
+                    'ms': (time.perf_counter() - start) * 1000
+                })
+                return browsers, discovery.read_files
             
-            for desktop_path in desktop_paths:
-                expanded_path = os.path.expanduser(desktop_path)
-                if os.path.exists(expanded_path):
-                    for filename in os.listdir(expanded_path):
-                        if filename.endswith('.desktop'):
-                            browser_info = self._parse_desktop_file(os.path.join(expanded_path, filename))
-                            if browser_info:
-                                additional_browsers.append(browser_info)
+            if map_func:
+                results, complete = map_func(discover, [None])
+                # Plazo agotado: la búsqueda por palabras clave tampoco terminaría a tiempo
+                if not complete:
+                    return additional_browsers
+                browsers, read_files = results[0]
+            else:
+                browsers, read_files = discover(None)
+            if read_files:
+                return browsers
+            Utils.log("Sin cachés MIME de XDG, usando búsqueda por palabras clave")
         
-        return additional_browsers
-    
-    def _parse_desktop_file(self, desktop_file):
-        """Parsear archivo .desktop para extraer información del navegador"""
-        try:
-            with open(desktop_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-            
-            # Buscar aplicaciones que parezcan navegadores
-            browser_keywords = ['browser', 'web browser', 'internet', 'chrome', 'firefox', 'opera', 'safari', 'edge']
-            # Excluir aplicaciones que NO son navegadores
-            exclude_keywords = ['connector', 'extension', 'plugin', 'helper', 'manager', 'settings', 'preferences']
+        if self.system == 'linux':
+            # Buscar en aplicaciones del sistema usando el índice incremental
+            desktop_index = DesktopIndex()
+            expanded_paths = [os.path.expanduser(path) for path in self.desktop_paths]
             
-            name = None
-            exec_command = None
-            comment = None
+            if map_func:
+                entries_by_dir, complete = map_func(self._timed_desktop_entries(desktop_index), expanded_paths)
+            else:
+                entries_by_dir, complete = [desktop_index.get_entries(path) for path in expanded_paths], True
             
-            for line in content.split('\n'):
-                line = line.strip()
-                if line.startswith('Name='):
-                    name = line.split('=', 1)[1]
-                elif line.startswith('Exec='):
-                    exec_command = line.split('=', 1)[1]
-                elif line.startswith('Comment='):
-                    comment = line.split('=', 1)[1]
+            for entries in entries_by_dir:
+                for entry in entries:
+                    browser_info = self._desktop_entry_to_browser(entry)
+                    if browser_info:
+                        additional_browsers.append(browser_info)
             
-            # Verificar si parece un navegador
-            if name and exec_command:
-                name_lower = name.lower()
-                
-                # Verificar que contiene palabras clave de navegador
-                is_browser = any(keyword in name_lower for keyword in browser_keywords)
-                
-                # Verificar que NO contiene palabras clave excluidas
-                is_excluded = any(keyword in name_lower for keyword in exclude_keywords)
+            # Un directorio sin terminar podría seguir modificando el índice
+            if complete:
+                desktop_index.save()
+            Utils.log(f"Archivos .desktop: {desktop_index.parsed_files} parseados, "
+                      f"{desktop_index.reused_files} reutilizados del índice")
+        
+        return additional_browsers
+    
+    def _timed_desktop_entries(self, desktop_index):
+        """Envolver get_entries registrando el tiempo de cada directorio"""
+        def get_entries(directory):
+            start = time.perf_counter()
+            entries = desktop_index.get_entries(directory)
+            self.probe_timings.append({
+                'name': '.desktop',
+                'path': directory,
+                'found': bool(entries),
+                'ms': (time.perf_counter() - start) * 1000
+            })
+            return entries
+        return get_entries
+    
+    def _desktop_entry_to_browser(self, entry):
+        """Convertir una entrada .desktop en navegador si lo parece"""
+        # Buscar aplicaciones que parezcan navegadores
+        browser_keywords = ['browser', 'web browser', 'internet', 'chrome', 'firefox', 'opera', 'safari', 'edge']
+        # Excluir aplicaciones que NO son navegadores
+        exclude_keywords = ['connector', 'extension', 'plugin', 'helper', 'manager', 'settings', 'preferences']
+        
+        name = entry['name']
+        name_lower = name.lower()
+        
+        # Verificar que contiene palabras clave de navegador
+        is_browser = any(keyword in name_lower for keyword in browser_keywords)
+        
+        # Verificar que NO contiene palabras clave excluidas
+        is_excluded = any(keyword in name_lower for keyword in exclude_keywords)
+        
+        if is_browser and not is_excluded:
+            # Extraer el comando ejecutable
+            exec_parts = entry['exec'].split()
+            if exec_parts:
+                executable = exec_parts[0]
                 
-                if is_browser and not is_excluded:
-                    # Extraer el comando ejecutable
-                    exec_parts = exec_command.split()
-                    if exec_parts:
-                        executable = exec_parts[0]
-                        
-                        # Verificar si el ejecutable existe
-                        if os.path.isfile(executable) and os.access(executable, os.X_OK):
-                            return {
-                                'name': name,
-                                'executable': executable,
-                                'description': comment or f'Navegador web {name}',
-                                'icon': 'DefaultProgram.png'
-                            }
-        
-        except (IOError, UnicodeDecodeError):
-            pass
+                # Verificar si el ejecutable existe
+                if os.path.isfile(executable) and os.access(executable, os.X_OK):
+                    return {
+                        'name': name,
+                        'executable': executable,
+                        'description': entry.get('comment') or f'Navegador web {name}',
+                        'icon': 'DefaultProgram.png'
+                    }
         
         return None
     
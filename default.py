@@ -7,17 +7,23 @@ import xbmc
 import xbmcgui
 import xbmcplugin
 import xbmcaddon
-from browser_detector import BrowserDetector
-from url_manager import URLManager
-from history_manager import HistoryManager
-from bookmark_manager import BookmarkManager
 from utils import Utils
 import os
 
-# Obtener información del addon
-addon = xbmcaddon.Addon()
-addon_handle = int(sys.argv[1])
-addon_url = sys.argv[0]
+# Información de la invocación actual. Con reuselanguageinvoker el intérprete y los
+# módulos importados sobreviven entre llamadas, así que se asignan en cada main()
+addon = None
+addon_handle = -1
+addon_url = ''
+
+# Resultados máximos de una búsqueda
+SEARCH_RESULTS_LIMIT = 50
+
+# Entradas de la lista de sitios principales
+TOP_SITES_LIMIT = 20
+
+# Elementos por página en los listados del historial y de las URLs guardadas
+PAGE_SIZE = 50
 
 def set_fanart():
     """Configurar fanart como fondo del plugin"""
@@ -29,8 +35,18 @@ def get_url(**kwargs):
     """Construir URL del plugin con parámetros"""
     return '{}?{}'.format(addon_url, urllib.parse.urlencode(kwargs))
 
+def add_page(items, action, offset, has_more):
+    """Entregar una página a Kodi en una sola llamada, con "Página siguiente" si hay más"""
+    if has_more:
+        list_item = xbmcgui.ListItem(label=addon.getLocalizedString(30183))  # "Página siguiente"
+        list_item.setArt({'icon': 'DefaultFolder.png'})
+        items.append((get_url(action=action, offset=offset + PAGE_SIZE), list_item, True))
+    xbmcplugin.addDirectoryItems(addon_handle, items, len(items))
+
 def list_browsers():
     """Mostrar lista de navegadores detectados"""
+    from browser_detector import BrowserDetector
+    
     xbmcplugin.setPluginCategory(addon_handle, addon.getLocalizedString(30001))
     xbmcplugin.setContent(addon_handle, 'files')
     
@@ -52,7 +68,7 @@ def list_browsers():
             list_item.setInfo('video', {'title': browser['name'], 'plot': browser['description']})
             list_item.setArt({'icon': browser.get('icon', 'DefaultProgram.png')})
             
-            url = get_url(action='open_browser', browser=browser['executable'])
+            url = get_url(action='open_browser', browser=browser['executable'], browser_name=browser['name'])
             xbmcplugin.addDirectoryItem(addon_handle, url, list_item, False)
     
     # Agregar opción para introducir URL personalizada
@@ -92,22 +108,23 @@ def list_browsers():
     
     xbmcplugin.endOfDirectory(addon_handle)
 
-def open_browser(browser_path, url=None):
+def open_browser(browser_path, url=None, browser_name=None):
     """Abrir navegador con URL opcional"""
+    from browser_detector import BrowserDetector
+    from history_manager import HistoryManager
+    
     detector = BrowserDetector()
     success = detector.launch_browser(browser_path, url)
     
     # Agregar al historial si está habilitado
     if url and success:
         history_manager = HistoryManager()
-        browser_name = None
         
-        # Intentar obtener el nombre del navegador
-        browsers = detector.get_installed_browsers()
-        for browser in browsers:
-            if browser['executable'] == browser_path:
+        # Sin nombre (p. ej. favoritos antiguos): buscarlo en la última detección
+        if not browser_name:
+            browser = detector.find_browser(browser_path)
+            if browser:
                 browser_name = browser['name']
-                break
         
         history_manager.add_to_history(url, browser_name=browser_name)
     
@@ -115,9 +132,14 @@ def open_browser(browser_path, url=None):
         Utils.show_notification(addon.getLocalizedString(30020), addon.getLocalizedString(30021))
     else:
         Utils.show_notification(addon.getLocalizedString(30022), addon.getLocalizedString(30023), xbmcgui.NOTIFICATION_ERROR)
+    
+    return success
 
 def custom_url():
     """Permitir al usuario introducir una URL personalizada"""
+    from browser_detector import BrowserDetector
+    from url_manager import URLManager
+    
     keyboard = xbmc.Keyboard('', addon.getLocalizedString(30030))
     keyboard.doModal()
     
@@ -139,8 +161,8 @@ def custom_url():
                 selected = dialog.select(addon.getLocalizedString(30031), options)
                 
                 if selected >= 0:
-                    browser_path = browsers[selected]['executable']
-                    open_browser(browser_path, url)
+                    browser = browsers[selected]
+                    open_browser(browser['executable'], url, browser['name'])
                     
                     # Preguntar si guardar la URL
                     if dialog.yesno(addon.getLocalizedString(30032), addon.getLocalizedString(30033)):
@@ -151,8 +173,10 @@ def custom_url():
             else:
                 Utils.show_notification(addon.getLocalizedString(30022), addon.getLocalizedString(30035), xbmcgui.NOTIFICATION_ERROR)
 
-def manage_urls():
-    """Gestionar URLs guardadas"""
+def manage_urls(offset=0, action='manage_urls'):
+    """Gestionar URLs guardadas (una página a partir de offset)"""
+    from url_manager import URLManager
+    
     xbmcplugin.setPluginCategory(addon_handle, addon.getLocalizedString(30013))
     xbmcplugin.setContent(addon_handle, 'files')
     
@@ -160,7 +184,8 @@ def manage_urls():
     set_fanart()
     
     url_manager = URLManager()
-    saved_urls = url_manager.get_saved_urls()
+    # Un elemento de más indica si hay página siguiente
+    saved_urls = url_manager.get_saved_urls(PAGE_SIZE + 1, offset)
     
     if not saved_urls:
         # Mostrar mensaje si no hay URLs guardadas
@@ -168,7 +193,8 @@ def manage_urls():
         xbmcplugin.addDirectoryItem(addon_handle, '', list_item, False)
     else:
         # Mostrar URLs guardadas
-        for url_data in saved_urls:
+        items = []
+        for url_data in saved_urls[:PAGE_SIZE]:
             list_item = xbmcgui.ListItem(label=url_data['name'])
             list_item.setInfo('video', {'title': url_data['name'], 'plot': url_data['url']})
             list_item.setArt({'icon': 'DefaultAddonsSearch.png'})
@@ -180,12 +206,17 @@ def manage_urls():
             ])
             
             url = get_url(action='open_saved_url', url_id=url_data['id'])
-            xbmcplugin.addDirectoryItem(addon_handle, url, list_item, False)
+            items.append((url, list_item, False))
+        
+        add_page(items, action, offset, len(saved_urls) > PAGE_SIZE)
     
     xbmcplugin.endOfDirectory(addon_handle)
 
 def open_saved_url(url_id):
     """Abrir URL guardada"""
+    from browser_detector import BrowserDetector
+    from url_manager import URLManager
+    
     url_manager = URLManager()
     url_data = url_manager.get_url_by_id(url_id)
     
@@ -200,11 +231,14 @@ def open_saved_url(url_id):
             selected = dialog.select(addon.getLocalizedString(30031), options)
             
             if selected >= 0:
-                browser_path = browsers[selected]['executable']
-                open_browser(browser_path, url_data['url'])
+                browser = browsers[selected]
+                if open_browser(browser['executable'], url_data['url'], browser['name']):
+                    url_manager.increment_access_count(url_id)
 
 def delete_url(url_id):
     """Eliminar URL guardada"""
+    from url_manager import URLManager
+    
     dialog = xbmcgui.Dialog()
     if dialog.yesno(addon.getLocalizedString(30050), addon.getLocalizedString(30051)):
         url_manager = URLManager()
@@ -214,6 +248,8 @@ def delete_url(url_id):
 
 def edit_url(url_id):
     """Editar URL guardada"""
+    from url_manager import URLManager
+    
     url_manager = URLManager()
     url_data = url_manager.get_url_by_id(url_id)
     
@@ -238,12 +274,11 @@ def manage_history():
     # Configurar fanart como fondo
     set_fanart()
     
-    history_manager = HistoryManager()
-    
     # Agregar opciones de gestión del historial
     options = [
         (addon.getLocalizedString(30072), 'recent_history'),  # "Ver historial reciente"
         (addon.getLocalizedString(30073), 'most_visited'),    # "URLs más visitadas"
+        (addon.getLocalizedString(30182), 'top_sites'),       # "Sitios principales"
         (addon.getLocalizedString(30074), 'search_history'),  # "Buscar en historial"
         (addon.getLocalizedString(30075), 'history_stats'),   # "Estadísticas"
         (addon.getLocalizedString(30076), 'clear_history')    # "Limpiar historial"
@@ -253,12 +288,14 @@ def manage_history():
         list_item = xbmcgui.ListItem(label=title)
         list_item.setArt({'icon': 'DefaultVideo.png'})
         url = get_url(action=action)
-        xbmcplugin.addDirectoryItem(addon_handle, url, list_item, action != 'clear_history')
+        xbmcplugin.addDirectoryItem(addon_handle, url, list_item, action not in ('history_stats', 'clear_history'))
     
     xbmcplugin.endOfDirectory(addon_handle)
 
-def recent_history():
-    """Mostrar historial reciente"""
+def recent_history(offset=0):
+    """Mostrar historial reciente (una página a partir de offset)"""
+    from history_manager import HistoryManager
+    
     xbmcplugin.setPluginCategory(addon_handle, addon.getLocalizedString(30072))
     xbmcplugin.setContent(addon_handle, 'files')
     
@@ -266,13 +303,15 @@ def recent_history():
     set_fanart()
     
     history_manager = HistoryManager()
-    history = history_manager.get_recent_history()
+    # Un elemento de más indica si hay página siguiente
+    history = history_manager.get_recent_history(PAGE_SIZE + 1, offset)
     
     if not history:
         list_item = xbmcgui.ListItem(label=addon.getLocalizedString(30077))  # "No hay historial"
         xbmcplugin.addDirectoryItem(addon_handle, '', list_item, False)
     else:
-        for i, entry in enumerate(history):
+        items = []
+        for entry in history[:PAGE_SIZE]:
             title = f"{entry.get('title', entry['url'])} ({entry['date']})"
             list_item = xbmcgui.ListItem(label=title)
             list_item.setInfo('video', {
@@ -283,16 +322,101 @@ def recent_history():
             
             # Menú contextual
             list_item.addContextMenuItems([
-                (addon.getLocalizedString(30051), f'RunPlugin({get_url(action="delete_history", history_id=i)})')
+                (addon.getLocalizedString(30051), f'RunPlugin({get_url(action="delete_history", history_id=entry["id"])})')
             ])
             
-            url = get_url(action='open_history_item', history_id=i)
+            url = get_url(action='open_history_item', history_id=entry['id'])
+            items.append((url, list_item, False))
+        
+        add_page(items, 'recent_history', offset, len(history) > PAGE_SIZE)
+    
+    xbmcplugin.endOfDirectory(addon_handle)
+
+def search_history():
+    """Buscar en el historial y en las URLs guardadas"""
+    from search_index import SearchIndex
+    
+    query = Utils.get_user_input(addon.getLocalizedString(30074))
+    if not query:
+        xbmcplugin.endOfDirectory(addon_handle, succeeded=False)
+        return
+    
+    xbmcplugin.setPluginCategory(addon_handle, addon.getLocalizedString(30074))
+    xbmcplugin.setContent(addon_handle, 'files')
+    
+    # Configurar fanart como fondo
+    set_fanart()
+    
+    try:
+        index = SearchIndex()
+        try:
+            index.ensure_built()
+            results = index.search(query, limit=SEARCH_RESULTS_LIMIT)
+        finally:
+            index.close()
+    except Exception as e:
+        # Sin SQLite: recorrer ambos almacenes
+        Utils.log(f"Índice de búsqueda no disponible: {str(e)}", xbmc.LOGWARNING)
+        results = search_without_index(query)
+    
+    if not results:
+        list_item = xbmcgui.ListItem(label=addon.getLocalizedString(30181))  # "No se encontraron resultados"
+        xbmcplugin.addDirectoryItem(addon_handle, '', list_item, False)
+    else:
+        for result in results:
+            list_item = xbmcgui.ListItem(label=result['title'])
+            list_item.setInfo('video', {'title': result['title'], 'plot': f"URL: {result['url']}\n{result['description']}"})
+            
+            if result['source'] == SearchIndex.SOURCE_URLS:
+                list_item.setArt({'icon': 'DefaultFavourites.png'})
+                url = get_url(action='open_saved_url', url_id=result['ref'])
+            else:
+                list_item.setArt({'icon': 'DefaultVideo.png'})
+                url = get_url(action='open_url', url=result['url'])
             xbmcplugin.addDirectoryItem(addon_handle, url, list_item, False)
     
     xbmcplugin.endOfDirectory(addon_handle)
 
-def most_visited():
-    """Mostrar URLs más visitadas"""
+def search_without_index(query):
+    """Búsqueda lineal en el historial y las URLs guardadas, con el formato del índice"""
+    from history_manager import HistoryManager
+    from search_index import SearchIndex
+    from url_manager import URLManager
+    
+    docs = [SearchIndex.url_doc(url_data) for url_data in URLManager().search_urls(query)]
+    docs += [SearchIndex.history_doc(entry) for entry in HistoryManager().search_history(query)]
+    
+    results = []
+    seen = set()
+    for doc in docs:
+        canonical = Utils.canonicalize_url(doc['url'])
+        if canonical not in seen:
+            seen.add(canonical)
+            results.append(doc)
+    return results[:SEARCH_RESULTS_LIMIT]
+
+def open_url(url):
+    """Elegir navegador y abrir una URL"""
+    from browser_detector import BrowserDetector
+    
+    detector = BrowserDetector()
+    browsers = detector.get_installed_browsers()
+    
+    if browsers:
+        options = [browser['name'] for browser in browsers]
+        dialog = xbmcgui.Dialog()
+        selected = dialog.select(addon.getLocalizedString(30031), options)
+        
+        if selected >= 0:
+            browser = browsers[selected]
+            open_browser(browser['executable'], url, browser['name'])
+    else:
+        Utils.show_notification(addon.getLocalizedString(30022), addon.getLocalizedString(30035), xbmcgui.NOTIFICATION_ERROR)
+
+def most_visited(offset=0):
+    """Mostrar URLs más visitadas (una página a partir de offset)"""
+    from history_manager import HistoryManager
+    
     xbmcplugin.setPluginCategory(addon_handle, addon.getLocalizedString(30073))
     xbmcplugin.setContent(addon_handle, 'files')
     
@@ -300,13 +424,15 @@ def most_visited():
     set_fanart()
     
     history_manager = HistoryManager()
-    most_visited = history_manager.get_most_visited()
+    # Un elemento de más indica si hay página siguiente
+    most_visited = history_manager.get_most_visited(PAGE_SIZE + 1, offset)
     
     if not most_visited:
         list_item = xbmcgui.ListItem(label=addon.getLocalizedString(30077))
         xbmcplugin.addDirectoryItem(addon_handle, '', list_item, False)
     else:
-        for i, entry in enumerate(most_visited):
+        items = []
+        for entry in most_visited[:PAGE_SIZE]:
             title = f"{entry.get('title', entry['url'])} ({entry.get('access_count', 1)} visitas)"
             list_item = xbmcgui.ListItem(label=title)
             list_item.setInfo('video', {
@@ -315,22 +441,73 @@ def most_visited():
             })
             list_item.setArt({'icon': 'DefaultVideo.png'})
             
-            url = get_url(action='open_history_item', history_id=i, list_type='most_visited')
+            url = get_url(action='open_history_item', history_id=entry['id'])
+            items.append((url, list_item, False))
+        
+        add_page(items, 'most_visited', offset, len(most_visited) > PAGE_SIZE)
+    
+    xbmcplugin.endOfDirectory(addon_handle)
+
+def top_sites():
+    """Mostrar los sitios con mayor frecencia del historial y de las URLs guardadas"""
+    from frecency import Frecency
+    from history_manager import HistoryManager
+    from url_manager import URLManager
+    
+    xbmcplugin.setPluginCategory(addon_handle, addon.getLocalizedString(30182))
+    xbmcplugin.setContent(addon_handle, 'files')
+    
+    # Configurar fanart como fondo
+    set_fanart()
+    
+    # Cada URL aparece una vez con su mejor clave. Las URLs guardadas van primero para
+    # que tengan preferencia, porque conservan el nombre dado por el usuario
+    sites = {}
+    candidates = [(Frecency.url_key(url_data), True, url_data)
+                  for url_data in URLManager().get_top_frecency(TOP_SITES_LIMIT)]
+    candidates += [(Frecency.history_key(entry), False, entry)
+                   for entry in HistoryManager().get_top_frecency(TOP_SITES_LIMIT)]
+    for key, saved, record in candidates:
+        canonical = Utils.canonicalize_url(record['url'])
+        if canonical in sites:
+            sites[canonical][0] = max(sites[canonical][0], key)
+        else:
+            sites[canonical] = [key, saved, record]
+    
+    ranked = sorted(sites.values(), key=lambda site: site[0], reverse=True)[:TOP_SITES_LIMIT]
+    
+    if not ranked:
+        list_item = xbmcgui.ListItem(label=addon.getLocalizedString(30077))
+        xbmcplugin.addDirectoryItem(addon_handle, '', list_item, False)
+    else:
+        for key, saved, record in ranked:
+            title = record['name'] if saved else record.get('title', record['url'])
+            list_item = xbmcgui.ListItem(label=title)
+            list_item.setInfo('video', {
+                'title': title,
+                'plot': f"URL: {record['url']}\nVisitas: {record.get('access_count', 1)}\n"
+                        f"Puntuación: {Frecency.score(key):.1f}"
+            })
+            
+            if saved:
+                list_item.setArt({'icon': 'DefaultFavourites.png'})
+                url = get_url(action='open_saved_url', url_id=record['id'])
+            else:
+                list_item.setArt({'icon': 'DefaultVideo.png'})
+                url = get_url(action='open_url', url=record['url'])
             xbmcplugin.addDirectoryItem(addon_handle, url, list_item, False)
     
     xbmcplugin.endOfDirectory(addon_handle)
 
-def open_history_item(history_id, list_type='recent'):
+def open_history_item(history_id):
     """Abrir item del historial"""
-    history_manager = HistoryManager()
+    from browser_detector import BrowserDetector
+    from history_manager import HistoryManager
     
-    if list_type == 'most_visited':
-        history = history_manager.get_most_visited()
-    else:
-        history = history_manager.get_recent_history()
+    history_manager = HistoryManager()
+    entry = history_manager.get_entry(history_id)
     
-    if history and int(history_id) < len(history):
-        entry = history[int(history_id)]
+    if entry:
         url = entry['url']
         
         # Mostrar navegadores disponibles
@@ -343,16 +520,17 @@ def open_history_item(history_id, list_type='recent'):
             selected = dialog.select(addon.getLocalizedString(30031), options)
             
             if selected >= 0:
-                browser_path = browsers[selected]['executable']
-                open_browser(browser_path, url)
+                browser = browsers[selected]
+                open_browser(browser['executable'], url, browser['name'])
 
 def delete_history(history_id):
     """Eliminar entrada del historial"""
+    from history_manager import HistoryManager
+    
     history_manager = HistoryManager()
-    history = history_manager.get_recent_history()
+    entry = history_manager.get_entry(history_id)
     
-    if history and int(history_id) < len(history):
-        entry = history[int(history_id)]
+    if entry:
         dialog = xbmcgui.Dialog()
         
         if dialog.yesno(addon.getLocalizedString(30078), 
@@ -361,8 +539,41 @@ def delete_history(history_id):
             Utils.show_notification(addon.getLocalizedString(30055), addon.getLocalizedString(30056))
             xbmc.executebuiltin('Container.Refresh')
 
+def history_stats():
+    """Mostrar estadísticas del historial y de las URLs guardadas"""
+    from history_manager import HistoryManager
+    from url_manager import URLManager
+    
+    stats = HistoryManager().get_history_stats()
+    url_stats = URLManager().get_statistics()
+    
+    lines = []
+    if stats['total_entries']:
+        lines += [
+            f"Entradas: {stats['total_entries']}",
+            f"Visitas: {stats['total_visits']}",
+            f"Más visitada: {stats['most_visited_url']} ({stats['most_visited_count']} visitas)",
+            f"Navegador más usado: {stats['most_used_browser']}",
+            f"Primera visita: {stats['oldest_entry']}",
+            f"Última visita: {stats['newest_entry']}"
+        ]
+    else:
+        lines.append(addon.getLocalizedString(30077))  # "No hay historial"
+    
+    lines += [
+        '',
+        f"URLs guardadas: {url_stats['total_urls']}",
+        f"Accesos a URLs guardadas: {url_stats['total_accesses']} (media {url_stats['average_accesses']:.1f})"
+    ]
+    if url_stats['most_accessed'] and url_stats['total_accesses']:
+        lines.append(f"URL guardada más abierta: {url_stats['most_accessed']['name']}")
+    
+    Utils.show_dialog(addon.getLocalizedString(30075), '\n'.join(lines))
+
 def clear_history():
     """Limpiar todo el historial"""
+    from history_manager import HistoryManager
+    
     dialog = xbmcgui.Dialog()
     if dialog.yesno(addon.getLocalizedString(30076), addon.getLocalizedString(30080)):
         history_manager = HistoryManager()
@@ -395,18 +606,19 @@ def manage_bookmarks():
 
 def import_bookmarks():
     """Importar marcadores de navegadores"""
+    from url_manager import URLManager
+    from bookmark_manager import BookmarkManager
+    
     bookmark_manager = BookmarkManager()
     selected_bookmarks = bookmark_manager.show_import_dialog()
     
     if selected_bookmarks:
         # Guardar marcadores seleccionados como URLs guardadas
         url_manager = URLManager()
-        imported_count = 0
-        
-        for bookmark in selected_bookmarks:
-            name = f"{bookmark['name']} ({bookmark['source']})"
-            if url_manager.save_url(name, bookmark['url']):
-                imported_count += 1
+        items = [{'name': f"{bookmark['name']} ({bookmark['source']})", 'url': bookmark['url']}
+                 for bookmark in selected_bookmarks]
+        results = url_manager.save_urls_bulk(items)
+        imported_count = sum(1 for result in results if result['status'] == 'saved')
         
         if imported_count > 0:
             Utils.show_notification(
@@ -422,6 +634,9 @@ def import_bookmarks():
 
 def open_github():
     """Abrir repositorio de GitHub del proyecto"""
+    from browser_detector import BrowserDetector
+    from history_manager import HistoryManager
+    
     github_url = "https://github.com/sapoclay/abridor-web"
     
     # Detectar navegadores disponibles
@@ -471,6 +686,17 @@ def open_github():
             xbmcgui.NOTIFICATION_ERROR
         )
 
+def clear_cache():
+    """Eliminar la caché de navegadores detectados"""
+    from browser_detector import BrowserDetector
+    from browser_cache import BrowserCache
+    
+    BrowserDetector.clear_published()
+    if BrowserCache().invalidate():
+        Utils.show_notification(addon.getLocalizedString(30088), addon.getLocalizedString(30089))
+    else:
+        Utils.show_notification(addon.getLocalizedString(30022), addon.getLocalizedString(30089), xbmcgui.NOTIFICATION_ERROR)
+
 def router(paramstring):
     """Enrutador principal del plugin"""
     params = dict(urllib.parse.parse_qsl(paramstring))
@@ -479,11 +705,11 @@ def router(paramstring):
         action = params.get('action')
         
         if action == 'open_browser':
-            open_browser(params.get('browser'))
+            open_browser(params.get('browser'), browser_name=params.get('browser_name'))
         elif action == 'custom_url':
             custom_url()
         elif action == 'manage_urls':
-            manage_urls()
+            manage_urls(int(params.get('offset', 0)))
         elif action == 'open_saved_url':
             open_saved_url(params.get('url_id'))
         elif action == 'delete_url':
@@ -493,13 +719,21 @@ def router(paramstring):
         elif action == 'manage_history':
             manage_history()
         elif action == 'recent_history':
-            recent_history()
+            recent_history(int(params.get('offset', 0)))
         elif action == 'most_visited':
-            most_visited()
+            most_visited(int(params.get('offset', 0)))
+        elif action == 'top_sites':
+            top_sites()
+        elif action == 'search_history':
+            search_history()
+        elif action == 'open_url':
+            open_url(params.get('url'))
         elif action == 'open_history_item':
-            open_history_item(params.get('history_id'), params.get('list_type', 'recent'))
+            open_history_item(params.get('history_id'))
         elif action == 'delete_history':
             delete_history(params.get('history_id'))
+        elif action == 'history_stats':
+            history_stats()
         elif action == 'clear_history':
             clear_history()
         elif action == 'manage_bookmarks':
@@ -507,13 +741,25 @@ def router(paramstring):
         elif action == 'import_bookmarks':
             import_bookmarks()
         elif action == 'view_bookmarks':
-            manage_urls()  # Reutilizar la función existente
+            manage_urls(int(params.get('offset', 0)), action)  # Reutilizar la función existente
         elif action == 'open_github':
             open_github()
+        elif action == 'clear_cache':
+            clear_cache()
         else:
             raise ValueError('Acción inválida: {}'.format(action))
     else:
         list_browsers()
 
+def main(argv):
+    """Punto de entrada de cada invocación del plugin"""
+    global addon, addon_handle, addon_url
+    
+    addon = xbmcaddon.Addon()
+    addon_handle = int(argv[1])
+    addon_url = argv[0]
+    
+    router(argv[2][1:])  # Omitir el primer '?'
+
 if __name__ == '__main__':
-    router(sys.argv[2][1:])  # Omitir el primer '?'
\ No newline at end of file
+    main(sys.argv)
\ No newline at end of file
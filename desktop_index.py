@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import xbmc
+import xbmcaddon
+from utils import Utils
+
+class DesktopIndex:
+    """Índice persistente de archivos .desktop ya parseados"""
+
+    INDEX_VERSION = 1
+
+    def __init__(self):
+        self.addon = xbmcaddon.Addon()
+        # Usar xbmcvfs.translatePath para compatibilidad con Kodi 19+
+        try:
+            import xbmcvfs
+            data_dir = xbmcvfs.translatePath(self.addon.getAddonInfo('profile'))
+        except (ImportError, AttributeError):
+            # Fallback para versiones anteriores de Kodi
+            data_dir = xbmc.translatePath(self.addon.getAddonInfo('profile'))
+
+        self.cache_dir = os.path.join(data_dir, 'cache')
+        self.index_file = os.path.join(self.cache_dir, 'desktop_index.json')
+        self.directories = self._load_index()
+        self.dirty = False
+        self.parsed_files = 0
+        self.reused_files = 0
+
+    def _load_index(self):
+        """Cargar índice desde el perfil"""
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == self.INDEX_VERSION:
+                return data.get('directories', {})
+        except (IOError, ValueError):
+            pass
+        return {}
+
+    def save(self):
+        """Guardar índice si ha cambiado"""
+        if not self.dirty:
+            return True
+
+        try:
+            if not os.path.exists(self.cache_dir):
+                os.makedirs(self.cache_dir)
+
+            data = {
+                'version': self.INDEX_VERSION,
+                'directories': self.directories
+            }
+            with open(self.index_file, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            self.dirty = False
+            return True
+        except (IOError, OSError) as e:
+            Utils.log(f"Error al guardar índice de archivos .desktop: {str(e)}", xbmc.LOGWARNING)
+            return False
+
+    def get_entries(self, directory):
+        """Obtener las entradas de un directorio parseando solo archivos nuevos o modificados"""
+        try:
+            filenames = os.listdir(directory)
+        except OSError:
+            if directory in self.directories:
+                del self.directories[directory]
+                self.dirty = True
+            return []
+
+        previous = self.directories.get(directory, {})
+        current = {}
+        entries = []
+
+        for filename in filenames:
+            if not filename.endswith('.desktop'):
+                continue
+
+            desktop_file = os.path.join(directory, filename)
+            try:
+                stat = os.stat(desktop_file)
+            except OSError:
+                continue
+
+            cached = previous.get(filename)
+            if cached and cached['mtime'] == stat.st_mtime_ns and cached['size'] == stat.st_size:
+                record = cached
+                self.reused_files += 1
+            else:
+                record = {
+                    'mtime': stat.st_mtime_ns,
+                    'size': stat.st_size,
+                    'entry': self.parse_desktop_file(desktop_file)
+                }
+                self.parsed_files += 1
+                self.dirty = True
+
+            current[filename] = record
+            if record['entry']:
+                entries.append(record['entry'])
+
+        # Los archivos eliminados desaparecen al no estar en el listado actual
+        if len(current) != len(previous):
+            self.dirty = True
+
+        self.directories[directory] = current
+        return entries
+
+    @staticmethod
+    def parse_desktop_file(desktop_file):
+        """Extraer Name, Exec y Comment de un archivo .desktop"""
+        try:
+            with open(desktop_file, 'r', encoding='utf-8') as f:
+                content = f.read()
+        except (IOError, UnicodeDecodeError):
+            return None
+
+        name = None
+        exec_command = None
+        comment = None
+
+        for line in content.split('\n'):
+            line = line.strip()
+            if line.startswith('Name='):
+                name = line.split('=', 1)[1]
+            elif line.startswith('Exec='):
+                exec_command = line.split('=', 1)[1]
+            elif line.startswith('Comment='):
+                comment = line.split('=', 1)[1]
+
+        if not name or not exec_command:
+            return None
+
+        return {
+            'name': name,
+            'exec': exec_command,
+            'comment': comment
+        }
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import math
+import time
+import heapq
+import datetime
+
+class Frecency:
+    """Puntuación que combina número de visitas y antigüedad (frecuencia + recencia).
+
+    Cada visita aporta 1 punto que se reduce a la mitad cada HALF_LIFE_DAYS días,
+    así que la puntuación en el instante t es suma(exp(-λ(t - t_i))). En lugar de
+    la puntuación se guarda la clave ln(suma(exp(λ t_i))), que no cambia con el
+    paso del tiempo: ordenar por la clave equivale a ordenar por la puntuación
+    actual, y una visita nueva solo actualiza la clave de su entrada.
+    """
+
+    HALF_LIFE_DAYS = 30
+    DECAY = math.log(2) / (HALF_LIFE_DAYS * 24 * 60 * 60)
+
+    @classmethod
+    def add_visit(cls, key, timestamp, weight=1.0):
+        """Clave tras sumar una visita en `timestamp` a la clave anterior (o None)"""
+        visit = math.log(weight) + cls.DECAY * timestamp
+        if key is None:
+            return visit
+        # log(exp(key) + exp(visit)) sin desbordamiento
+        high, low = (key, visit) if key >= visit else (visit, key)
+        return high + math.log1p(math.exp(low - high))
+
+    @classmethod
+    def estimate(cls, visits, timestamp):
+        """Clave aproximada para registros anteriores a la puntuación.
+
+        Sin las fechas de cada visita se suponen todas en la última. Devuelve None
+        si no hay visitas.
+        """
+        if not visits or visits <= 0 or not timestamp:
+            return None
+        return math.log(visits) + cls.DECAY * timestamp
+
+    @classmethod
+    def score(cls, key, now=None):
+        """Puntuación actual (visitas equivalentes) a partir de una clave"""
+        if key is None:
+            return 0.0
+        if now is None:
+            now = time.time()
+        return math.exp(key - cls.DECAY * now)
+
+    @classmethod
+    def history_key(cls, entry):
+        """Clave de una entrada del historial"""
+        key = entry.get('frecency')
+        if key is None:
+            key = cls.estimate(entry.get('access_count', 1), entry.get('timestamp'))
+        return key
+
+    @classmethod
+    def url_key(cls, url_data):
+        """Clave de una URL guardada (None si nunca se ha abierto)"""
+        key = url_data.get('frecency')
+        if key is None:
+            key = cls.estimate(url_data.get('access_count', 0), cls._iso_to_timestamp(url_data.get('last_accessed')))
+        return key
+
+    @staticmethod
+    def _iso_to_timestamp(value):
+        """Convertir una fecha ISO a segundos desde epoch (None si no es válida)"""
+        try:
+            return datetime.datetime.fromisoformat(value).timestamp()
+        except (TypeError, ValueError):
+            return None
+
+    @staticmethod
+    def top(records, limit, key):
+        """Los `limit` registros con mayor clave, con un montículo acotado (O(n log limit)).
+
+        Se descartan los registros sin clave.
+        """
+        keyed = ((key(record), record) for record in records)
+        best = heapq.nlargest(limit, (item for item in keyed if item[0] is not None), key=lambda item: item[0])
+        return [record for _, record in best]
@@ -4,15 +4,21 @@
 import os
 import json
 import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 import xbmc
 import xbmcaddon
 import xbmcvfs
 from utils import Utils
+from history_store import JSONHistoryStore, SQLiteHistoryStore, entry_id
+from search_index import SearchIndex
 
 class HistoryManager:
     """Gestiona el historial de URLs visitadas"""
     
+    # Entradas eliminadas como máximo en cada paso de la poda
+    RETENTION_BATCH = 500
+    
     def __init__(self):
         self.addon = xbmcaddon.Addon()
         
@@ -26,17 +32,68 @@ class HistoryManager:
         if not os.path.exists(profile_path):
             os.makedirs(profile_path)
         
-        self.history_file = os.path.join(profile_path, 'history.json')
+        # Backend de almacenamiento: 0 = JSON, 1 = SQLite
+        self.store = None
+        if self.addon.getSetting('history_backend') == '1':
+            try:
+                self.store = SQLiteHistoryStore(profile_path)
+            except Exception as e:
+                Utils.log(f"SQLite no disponible para el historial, usando JSON: {str(e)}", xbmc.LOGWARNING)
+        if self.store is None:
+            self.store = JSONHistoryStore(profile_path)
+        
         self.max_history_entries = int(self.addon.getSetting('max_history_entries') or '100')
         self.history_retention_days = int(self.addon.getSetting('history_retention_days') or '30')
+        # Cambios para el índice de búsqueda pendientes de la transacción en curso
+        self._search_updates = None
+    
+    @contextmanager
+    def transaction(self):
+        """Agrupar varias modificaciones del historial en una sola escritura.
+        
+        Uso: with history_manager.transaction(): ... Un error al escribir se
+        propaga como excepción al salir del bloque. El índice de búsqueda se
+        actualiza al final del bloque con el bloqueo del almacén aún tomado, para
+        que reciba los cambios de varios procesos en el mismo orden que el almacén;
+        si después la escritura falla, el índice se marca como caducado.
+        """
+        if self._search_updates is not None:
+            with self.store.transaction():
+                yield self
+            return
+        
+        self._search_updates = []
+        applied = False
+        try:
+            with self.store.transaction():
+                yield self
+                applied = SearchIndex.apply_updates(self._search_updates)
+        except BaseException:
+            # El índice refleja cambios que el almacén no llegó a guardar
+            if applied:
+                SearchIndex.mark_stale()
+            raise
+        finally:
+            self._search_updates = None
+    
+    def _write(self, operation, error_message):
+        """Ejecutar una escritura del almacén en una transacción; devuelve None si falla"""
+        try:
+            with self.transaction():
+                return operation()
+        except Exception as e:
+            Utils.log(f"{error_message}: {str(e)}", xbmc.LOGERROR)
+            return None
+    
+    def _update_search_index(self, method, *args):
+        """Reflejar un cambio en el índice de búsqueda (al confirmar la transacción)"""
+        self._search_updates.append((method, args))
     
     def add_to_history(self, url, title=None, browser_name=None):
         """Añadir una URL al historial"""
         if not self.addon.getSettingBool('enable_history'):
             return
         
-        history = self.load_history()
-        
         entry = {
             'url': url,
             'title': title or url,
@@ -46,110 +103,118 @@ class HistoryManager:
             'access_count': 1
         }
         
-        # Verificar si la URL ya existe
-        existing_entry = None
-        for i, hist_entry in enumerate(history):
-            if hist_entry['url'] == url:
-                existing_entry = i
-                break
-        
-        if existing_entry is not None:
-            # Actualizar entrada existente
-            history[existing_entry]['timestamp'] = entry['timestamp']
-            history[existing_entry]['date'] = entry['date']
-            history[existing_entry]['browser'] = entry['browser']
-            history[existing_entry]['access_count'] += 1
-        else:
-            # Añadir nueva entrada
-            history.insert(0, entry)
-        
-        # Limpiar historial antiguo
-        self._cleanup_history(history)
-        
-        # Limitar número de entradas
-        if len(history) > self.max_history_entries:
-            history = history[:self.max_history_entries]
-        
-        self.save_history(history)
-        Utils.log(f"URL añadida al historial: {url}")
+        def record_visit():
+            stored_entry = self.store.record_visit(entry, self.max_history_entries)
+            if stored_entry:
+                self._update_search_index('upsert', [SearchIndex.history_doc(stored_entry)])
+                self._update_search_index('trim', SearchIndex.SOURCE_HISTORY, self.max_history_entries)
+            return stored_entry
+        
+        if self._write(record_visit, "Error guardando historial"):
+            Utils.log(f"URL añadida al historial: {url}")
     
     def load_history(self):
-        """Cargar historial desde archivo"""
-        if not os.path.exists(self.history_file):
-            return []
-        
-        try:
-            with open(self.history_file, 'r', encoding='utf-8') as f:
-                return json.load(f)
-        except Exception as e:
-            Utils.log(f"Error cargando historial: {str(e)}", xbmc.LOGERROR)
-            return []
+        """Cargar historial completo, de más reciente a más antiguo"""
+        return self.store.load()
     
     def save_history(self, history):
-        """Guardar historial a archivo"""
-        try:
-            with open(self.history_file, 'w', encoding='utf-8') as f:
-                json.dump(history, f, indent=2, ensure_ascii=False)
-        except Exception as e:
-            Utils.log(f"Error guardando historial: {str(e)}", xbmc.LOGERROR)
-    
-    def _cleanup_history(self, history):
-        """Limpiar entradas antiguas del historial"""
-        if self.history_retention_days <= 0:
-            return history
+        """Guardar historial completo"""
+        def save():
+            if not self.store.save(history):
+                return False
+            self._update_search_index('replace_source', SearchIndex.SOURCE_HISTORY,
+                                      [SearchIndex.history_doc(entry) for entry in history])
+            return True
         
-        cutoff_time = time.time() - (self.history_retention_days * 24 * 60 * 60)
-        return [entry for entry in history if entry['timestamp'] > cutoff_time]
+        return bool(self._write(save, "Error guardando historial"))
     
-    def get_recent_history(self, limit=20):
-        """Obtener historial reciente"""
-        history = self.load_history()
-        return history[:limit]
+    def apply_retention(self, batch=RETENTION_BATCH):
+        """Eliminar un lote de entradas caducadas o que superan max_history_entries.
+        
+        Se eliminan primero las visitas más antiguas. La caducidad por días solo se
+        aplica con auto_cleanup_history activado; el límite de entradas, siempre.
+        Devuelve el número de entradas eliminadas (menos que batch si ya no quedan).
+        """
+        cutoff = None
+        if self.addon.getSettingBool('auto_cleanup_history') and self.history_retention_days > 0:
+            cutoff = time.time() - (self.history_retention_days * 24 * 60 * 60)
+        
+        def prune():
+            urls = self.store.prune(cutoff, self.max_history_entries, batch)
+            if urls:
+                self._update_search_index('remove', SearchIndex.SOURCE_HISTORY, urls)
+            return urls
+        
+        urls = self._write(prune, "Error podando historial")
+        if not urls:
+            return 0
+        
+        Utils.log(f"Historial podado: {len(urls)} entradas")
+        return len(urls)
     
-    def get_most_visited(self, limit=10):
-        """Obtener URLs más visitadas"""
-        history = self.load_history()
-        
-        # Ordenar por número de accesos
-        sorted_history = sorted(history, key=lambda x: x.get('access_count', 1), reverse=True)
-        return sorted_history[:limit]
+    def compact_history(self):
+        """Compactar el almacenamiento si hay escrituras pendientes de consolidar"""
+        if self.store.needs_compaction():
+            return self.store.compact()
+        return False
+    
+    def get_recent_history(self, limit=20, offset=0):
+        """Obtener historial reciente (limit entradas a partir de offset)"""
+        return self._with_ids(self.store.get_recent(limit, offset))
+    
+    def get_most_visited(self, limit=10, offset=0):
+        """Obtener URLs más visitadas (limit entradas a partir de offset)"""
+        return self._with_ids(self.store.get_most_visited(limit, offset))
+    
+    @staticmethod
+    def _with_ids(entries):
+        """Asegurar el id estable en entradas leídas de una caché anterior a los ids"""
+        for entry in entries:
+            if not entry.get('id'):
+                entry['id'] = entry_id(entry['url'])
+        return entries
+    
+    def get_top_frecency(self, limit=20):
+        """Obtener URLs con mayor frecencia (visitas ponderadas por antigüedad)"""
+        return self.store.get_top_frecency(limit)
+    
+    def get_entry(self, entry_id):
+        """Obtener una entrada del historial por su id estable (o None)"""
+        return self.store.get_by_id(entry_id)
     
     def search_history(self, query):
         """Buscar en el historial"""
-        history = self.load_history()
-        query_lower = query.lower()
-        
-        results = []
-        for entry in history:
-            if (query_lower in entry['url'].lower() or 
-                query_lower in entry.get('title', '').lower()):
-                results.append(entry)
-        
-        return results
+        return self.store.search(query)
     
     def clear_history(self):
         """Limpiar todo el historial"""
-        try:
-            if os.path.exists(self.history_file):
-                os.remove(self.history_file)
+        def clear():
+            if not self.store.clear():
+                return False
+            self._update_search_index('replace_source', SearchIndex.SOURCE_HISTORY, [])
+            return True
+        
+        if self._write(clear, "Error limpiando historial"):
             Utils.log("Historial limpiado")
             return True
-        except Exception as e:
-            Utils.log(f"Error limpiando historial: {str(e)}", xbmc.LOGERROR)
-            return False
+        return False
     
     def remove_entry(self, url):
         """Eliminar una entrada específica del historial"""
-        history = self.load_history()
-        history = [entry for entry in history if entry['url'] != url]
-        self.save_history(history)
-        Utils.log(f"Entrada eliminada del historial: {url}")
+        def remove():
+            if not self.store.remove(url):
+                return False
+            self._update_search_index('remove', SearchIndex.SOURCE_HISTORY, [url])
+            return True
+        
+        if self._write(remove, "Error eliminando entrada del historial"):
+            Utils.log(f"Entrada eliminada del historial: {url}")
     
     def get_history_stats(self):
-        """Obtener estadísticas del historial"""
-        history = self.load_history()
+        """Obtener estadísticas del historial (agregados mantenidos por el almacén)"""
+        stats = self.store.get_stats()
         
-        if not history:
+        if not stats:
             return {
                 'total_entries': 0,
                 'total_visits': 0,
@@ -159,32 +224,14 @@ class HistoryManager:
                 'newest_entry': None
             }
         
-        total_visits = sum(entry.get('access_count', 1) for entry in history)
-        
-        # URL más visitada
-        most_visited = max(history, key=lambda x: x.get('access_count', 1))
-        
-        # Navegador más usado
-        browser_counts = {}
-        for entry in history:
-            browser = entry.get('browser', 'Desconocido')
-            browser_counts[browser] = browser_counts.get(browser, 0) + entry.get('access_count', 1)
-        
-        most_used_browser = max(browser_counts.keys(), key=lambda x: browser_counts[x]) if browser_counts else None
-        
-        # Entradas más antigua y reciente
-        oldest_entry = min(history, key=lambda x: x['timestamp'])
-        newest_entry = max(history, key=lambda x: x['timestamp'])
-        
-        return {
-            'total_entries': len(history),
-            'total_visits': total_visits,
-            'most_visited_url': most_visited['url'],
-            'most_visited_count': most_visited.get('access_count', 1),
-            'most_used_browser': most_used_browser,
-            'oldest_entry': oldest_entry['date'],
-            'newest_entry': newest_entry['date']
-        }
+        return stats
+    
+    def check_history_stats(self):
+        """Recalcular las estadísticas desde cero y avisar si no coincidían"""
+        consistent = self.store.rebuild_stats()
+        if not consistent:
+            Utils.log("Estadísticas del historial inconsistentes: recalculadas", xbmc.LOGWARNING)
+        return consistent
     
     def export_history(self, export_path):
         """Exportar historial a archivo"""
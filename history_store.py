@@ -0,0 +1,1018 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+import heapq
+import hashlib
+import itertools
+from contextlib import contextmanager
+import xbmc
+from frecency import Frecency
+from locking import file_lock
+from storage import atomic_write_json, append_lines
+from utils import Utils
+from window_cache import WindowCache
+
+# Índices id -> entrada del historial JSON, con la versión de los datos con que se
+# construyeron. Con reuselanguageinvoker sobreviven entre invocaciones del plugin
+_loaded_id_indexes = {}
+
+# Índices URL -> entrada del historial JSON que usan los escritores, con la versión
+# de los archivos y la posición del diario hasta la que se han aplicado
+_loaded_url_indexes = {}
+
+def entry_id(url):
+    """Id estable de una entrada del historial: no depende de su posición en la lista.
+
+    Las entradas se identifican por su URL exacta, así que el id se obtiene de ella.
+    """
+    return hashlib.sha1(url.encode('utf-8')).hexdigest()[:16]
+
+def entries_by_url(history):
+    """Índice URL -> entrada de una lista del historial, de la más antigua a la más reciente.
+
+    Si una URL estuviera repetida se conserva la aparición más reciente. Las
+    entradas guardadas antes de que existieran los ids lo reciben aquí.
+    """
+    entries = {}
+    for entry in reversed(history):
+        if 'id' not in entry:
+            entry['id'] = entry_id(entry['url'])
+        entries.pop(entry['url'], None)
+        entries[entry['url']] = entry
+    return entries
+
+class HistoryStats:
+    """Agregados del historial que se actualizan con cada operación.
+
+    Entradas, visitas y visitas por navegador se suman y restan al añadir o quitar
+    entradas. La entrada más visitada solo se vuelve a buscar si se elimina, y las
+    fechas extremas se toman de los extremos de la lista (ordenada por fecha).
+    """
+
+    def __init__(self, data=None):
+        data = data or {}
+        self.entries = data.get('entries', 0)
+        self.visits = data.get('visits', 0)
+        self.browsers = dict(data.get('browsers', {}))
+        self.most_visited = data.get('most_visited')
+        self.newest = data.get('newest')
+        self.oldest = data.get('oldest')
+
+    @classmethod
+    def from_history(cls, history):
+        """Calcular los agregados recorriendo todo el historial"""
+        return cls.from_entries(entries_by_url(history))
+
+    @classmethod
+    def from_entries(cls, entries):
+        """Calcular los agregados recorriendo el índice URL -> entrada"""
+        stats = cls()
+        for entry in entries.values():
+            stats.add(entry)
+        stats.sync(entries)
+        return stats
+
+    def add(self, entry):
+        """Contar una entrada (la más reciente de la lista)"""
+        count = entry.get('access_count', 1)
+        browser = entry.get('browser', 'Desconocido')
+        self.entries += 1
+        self.visits += count
+        self.browsers[browser] = self.browsers.get(browser, 0) + count
+        # En caso de empate gana la más reciente, como max() sobre la lista
+        if self.most_visited is None or count >= self.most_visited['count']:
+            self.most_visited = {'url': entry['url'], 'count': count}
+
+    def remove(self, entry):
+        """Descontar una entrada eliminada"""
+        count = entry.get('access_count', 1)
+        browser = entry.get('browser', 'Desconocido')
+        self.entries -= 1
+        self.visits -= count
+        remaining = self.browsers.get(browser, 0) - count
+        if remaining > 0:
+            self.browsers[browser] = remaining
+        else:
+            self.browsers.pop(browser, None)
+        if self.most_visited and self.most_visited['url'] == entry['url']:
+            self.most_visited = None
+
+    def sync(self, entries):
+        """Actualizar lo que depende del orden: fechas extremas y, si se eliminó, la más visitada.
+
+        entries es el índice URL -> entrada, de la más antigua a la más reciente.
+        """
+        newest = next(reversed(entries.values()), None)
+        oldest = next(iter(entries.values()), None)
+        self.newest = newest.get('date') if newest else None
+        self.oldest = oldest.get('date') if oldest else None
+        if self.most_visited is None and entries:
+            # En caso de empate gana la más reciente
+            most_visited = max(reversed(entries.values()), key=lambda x: x.get('access_count', 1))
+            self.most_visited = {'url': most_visited['url'], 'count': most_visited.get('access_count', 1)}
+
+    def to_dict(self):
+        """Datos para guardar en disco"""
+        return {
+            'entries': self.entries,
+            'visits': self.visits,
+            'browsers': self.browsers,
+            'most_visited': self.most_visited,
+            'newest': self.newest,
+            'oldest': self.oldest
+        }
+
+    def summary(self):
+        """Estadísticas con el formato de HistoryManager.get_history_stats (None si está vacío)"""
+        if not self.entries:
+            return None
+        return {
+            'total_entries': self.entries,
+            'total_visits': self.visits,
+            'most_visited_url': self.most_visited['url'] if self.most_visited else None,
+            'most_visited_count': self.most_visited['count'] if self.most_visited else 0,
+            'most_used_browser': max(self.browsers, key=self.browsers.get) if self.browsers else None,
+            'oldest_entry': self.oldest,
+            'newest_entry': self.newest
+        }
+
+class JSONHistoryStore:
+    """Almacén del historial en archivos JSON.
+
+    history.json guarda la última instantánea (lista de más reciente a más antigua)
+    y history.journal las operaciones posteriores, una línea JSON por operación.
+    Cada visita solo añade una línea al diario; la compactación vuelca el diario
+    en una nueva instantánea cuando supera JOURNAL_MAX_BYTES o cuando el servicio
+    está inactivo. Las operaciones guardan el estado final de la entrada, así que
+    volver a aplicarlas tras una compactación interrumpida no cambia el resultado.
+
+    history.stats.json guarda los agregados de HistoryStats junto con el tamaño de
+    los archivos a los que corresponden; si no coinciden se recalculan.
+
+    Los escritores no cargan la lista: trabajan sobre un índice URL -> entrada que
+    se conserva en memoria y se pone al día leyendo solo las líneas del diario
+    añadidas desde la última escritura, así que una visita cuesta una consulta al
+    índice y una línea en el diario. history.index.json guarda ese índice para la
+    instantánea actual (se escribe al reemplazar el historial y al compactar) y
+    evita reconstruirlo en cada proceso nuevo. La lista completa solo se forma al
+    leer y al compactar.
+    """
+
+    # Tamaño del diario a partir del cual se compacta al escribir
+    JOURNAL_MAX_BYTES = 256 * 1024
+    # Campos de cada entrada en history.index.json
+    INDEX_FIELDS = ('url', 'title', 'browser', 'timestamp', 'date', 'access_count', 'frecency', 'id')
+
+    def __init__(self, profile_path):
+        self.history_file = os.path.join(profile_path, 'history.json')
+        self.journal_file = os.path.join(profile_path, 'history.journal')
+        # Diario retirado por una compactación en curso (o interrumpida)
+        self.compacting_file = self.journal_file + '.compacting'
+        self.stats_file = os.path.join(profile_path, 'history.stats.json')
+        self.index_file = os.path.join(profile_path, 'history.index.json')
+        self.cache = WindowCache('history')
+        # Cambios de la transacción en curso, pendientes de escribir
+        self._pending = None
+
+    @contextmanager
+    def transaction(self):
+        """Agrupar varias operaciones en una sola escritura al final del bloque.
+
+        Dentro del bloque load() ya refleja los cambios hechos. Si el bloque termina
+        con una excepción no se escribe nada. Las transacciones anidadas se integran
+        en la exterior. Los escritores de otros procesos esperan al bloqueo del
+        historial; los lectores no (el diario tolera una última línea a medias).
+        """
+        if self._pending is not None:
+            yield self
+            return
+
+        with file_lock(self.history_file):
+            index = self._url_index()
+            stats = self._read_stats() or HistoryStats.from_entries(index['entries'])
+            self._pending = {'index': index, 'operations': [], 'replace': False, 'stats': stats}
+            try:
+                yield self
+                pending = self._pending
+                self._pending = None
+                self._commit(pending)
+            except BaseException:
+                # El índice en memoria tiene cambios que no llegaron a escribirse
+                _loaded_url_indexes.pop(self.history_file, None)
+                raise
+            finally:
+                self._pending = None
+
+    def _commit(self, pending):
+        """Escribir los cambios de una transacción"""
+        index = pending['index']
+        if pending['replace']:
+            # Reemplazo completo: nueva instantánea sin diario pendiente
+            try:
+                atomic_write_json(self.history_file, list(reversed(index['entries'].values())))
+                self._remove_file(self.compacting_file)
+                self._remove_file(self.journal_file)
+            finally:
+                self.cache.invalidate()
+            self._write_stats(pending['stats'])
+            self._save_url_index(index['entries'])
+            return
+
+        if not pending['operations']:
+            return
+
+        lines = [json.dumps(operation, ensure_ascii=False, separators=(',', ':')) + '\n'
+                 for operation in pending['operations']]
+        try:
+            journal_size = append_lines(self.journal_file, lines)
+        finally:
+            self.cache.invalidate()
+        # El índice ya incluye estas operaciones: no hay que volver a leerlas
+        index['offset'] = journal_size
+        self._write_stats(pending['stats'])
+
+        if journal_size > self.JOURNAL_MAX_BYTES:
+            self.compact()
+
+    def load(self):
+        """Cargar historial desde la caché de sesión o desde archivo"""
+        if self._pending is not None:
+            return list(reversed(self._pending['index']['entries'].values()))
+
+        generation = self.cache.get_generation()
+        cached_history = self.cache.get(generation)
+        if cached_history is not None:
+            return cached_history
+
+        history = self._read_disk()
+        if history is None:
+            return []
+        self.cache.set(history, generation)
+        return history
+
+    def _read_disk(self, include_journal=True):
+        """Leer la instantánea y aplicar encima las operaciones del diario.
+
+        Se lee sin bloqueo aunque otro proceso esté compactando: el diario se lee
+        antes que el retirado y que la instantánea, y se repite la lectura si la
+        instantánea cambió mientras tanto. Una operación leída dos veces no cambia
+        el resultado.
+        """
+        for _ in range(3):
+            before = self._snapshot_stamp()
+            journal_operations = self._read_journal(self.journal_file) if include_journal else []
+            compacting_operations = self._read_journal(self.compacting_file)
+
+            history = []
+            if before is not None:
+                try:
+                    with open(self.history_file, 'r', encoding='utf-8') as f:
+                        history = json.load(f)
+                except FileNotFoundError:
+                    pass
+                except Exception as e:
+                    Utils.log(f"Error cargando historial: {str(e)}", xbmc.LOGERROR)
+                    return None
+
+            if self._snapshot_stamp() == before:
+                break
+
+        entries = entries_by_url(history)
+        for operation in compacting_operations + journal_operations:
+            self._apply(entries, operation)
+        return list(reversed(entries.values()))
+
+    def _snapshot_stamp(self):
+        """Identificar la instantánea actual (None si no existe)"""
+        return self._file_stamp(self.history_file)
+
+    @staticmethod
+    def _file_stamp(path):
+        """Identificar la versión de un archivo (None si no existe)"""
+        try:
+            stat = os.stat(path)
+            return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _url_index(self):
+        """Índice URL -> entrada al día con los archivos (con el bloqueo de escritura tomado).
+
+        Se reutiliza el de memoria si la instantánea y el diario retirado no han
+        cambiado, aplicando solo las líneas nuevas del diario. Si no, se parte de
+        history.index.json (o de la instantánea) y se aplican los dos diarios.
+        """
+        loaded = _loaded_url_indexes.get(self.history_file)
+        stamp = (self._snapshot_stamp(), self._file_stamp(self.compacting_file))
+        try:
+            journal_size = os.path.getsize(self.journal_file)
+        except OSError:
+            journal_size = 0
+
+        if loaded is None or loaded['stamp'] != stamp or journal_size < loaded['offset']:
+            entries = self._load_url_index()
+            for operation in self._read_journal(self.compacting_file):
+                self._apply(entries, operation)
+            loaded = {'stamp': stamp, 'offset': 0, 'entries': entries}
+            _loaded_url_indexes[self.history_file] = loaded
+
+        if journal_size > loaded['offset']:
+            operations, loaded['offset'] = self._read_journal_tail(self.journal_file, loaded['offset'])
+            for operation in operations:
+                self._apply(loaded['entries'], operation)
+        return loaded
+
+    def _load_url_index(self):
+        """Índice URL -> entrada de la instantánea, desde history.index.json si le corresponde"""
+        snapshot = self._snapshot_stamp()
+        if snapshot is None:
+            return {}
+
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('snapshot') == list(snapshot):
+                return {row[0]: {field: value for field, value in zip(self.INDEX_FIELDS, row) if value is not None}
+                        for row in data['entries']}
+        except FileNotFoundError:
+            pass
+        except (IOError, ValueError, KeyError, TypeError, IndexError) as e:
+            Utils.log(f"Índice del historial ilegible, se reconstruye: {str(e)}", xbmc.LOGWARNING)
+
+        try:
+            with open(self.history_file, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            Utils.log(f"Error cargando historial: {str(e)}", xbmc.LOGERROR)
+            return {}
+
+        entries = entries_by_url(history)
+        self._save_url_index(entries)
+        return entries
+
+    def _save_url_index(self, entries):
+        """Guardar el índice URL -> entrada de la instantánea actual (y recordarlo en memoria)"""
+        _loaded_url_indexes[self.history_file] = {
+            'stamp': (self._snapshot_stamp(), self._file_stamp(self.compacting_file)),
+            'offset': 0,
+            'entries': entries
+        }
+        try:
+            # Se puede reconstruir desde la instantánea: no hace falta esperar al disco
+            atomic_write_json(self.index_file, {
+                'snapshot': list(self._snapshot_stamp() or ()),
+                'entries': [[entry.get(field) for field in self.INDEX_FIELDS] for entry in entries.values()]
+            }, sync=False)
+        except (IOError, OSError) as e:
+            Utils.log(f"Error guardando índice del historial: {str(e)}", xbmc.LOGWARNING)
+
+    def _read_journal_tail(self, journal, offset):
+        """Leer las operaciones añadidas al diario a partir de offset; devuelve (operaciones, nuevo offset)"""
+        try:
+            with open(journal, 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+        except FileNotFoundError:
+            return [], offset
+
+        operations = []
+        for line in data.splitlines():
+            try:
+                operations.append(json.loads(line))
+            except ValueError:
+                Utils.log(f"Línea incompleta ignorada en {journal}", xbmc.LOGWARNING)
+        return operations, offset + len(data)
+
+    def _read_journal(self, journal):
+        """Leer las operaciones de un diario, ignorando una última línea incompleta"""
+        operations = []
+        try:
+            with open(journal, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        operations.append(json.loads(line))
+                    except ValueError:
+                        # Escritura interrumpida: el resto del historial sigue intacto
+                        Utils.log(f"Línea incompleta ignorada en {journal}", xbmc.LOGWARNING)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            Utils.log(f"Error leyendo diario del historial: {str(e)}", xbmc.LOGERROR)
+        return operations
+
+    @staticmethod
+    def _apply(entries, operation, stats=None):
+        """Aplicar una operación del diario sobre el índice URL -> entrada (y sus agregados)"""
+        op = operation.get('op')
+        if op == 'prune':
+            removed = [entries.pop(url) for url in operation['urls'] if url in entries]
+        else:
+            url = operation['entry']['url'] if op == 'visit' else operation.get('url')
+            previous = entries.pop(url, None)
+            removed = [previous] if previous is not None else []
+        evicted = []
+        if op == 'visit':
+            entries[url] = operation['entry']
+            max_entries = operation.get('max')
+            if max_entries and 0 < max_entries < len(entries):
+                # Las más antiguas están al principio del índice
+                for oldest in list(itertools.islice(entries, len(entries) - max_entries)):
+                    evicted.append(entries.pop(oldest))
+
+        if stats is not None:
+            # Primero la entrada sustituida y la nueva; después las descartadas por el límite
+            for e in removed:
+                stats.remove(e)
+            if op == 'visit':
+                stats.add(operation['entry'])
+            for e in evicted:
+                stats.remove(e)
+            stats.sync(entries)
+
+    def _append(self, operation):
+        """Añadir una operación al diario (dentro de una transacción si la hay)"""
+        try:
+            with self.transaction():
+                self._apply(self._pending['index']['entries'], operation, self._pending['stats'])
+                self._pending['operations'].append(operation)
+            return True
+        except Exception as e:
+            Utils.log(f"Error guardando historial: {str(e)}", xbmc.LOGERROR)
+            return False
+
+    def _remove_file(self, path):
+        """Eliminar un archivo si existe"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def compact(self):
+        """Volcar el diario en una nueva instantánea"""
+        try:
+            with file_lock(self.history_file):
+                # Retirar el diario: si se interrumpe, la próxima compactación lo retoma
+                if not os.path.exists(self.compacting_file):
+                    if not os.path.exists(self.journal_file):
+                        return False
+                    os.replace(self.journal_file, self.compacting_file)
+
+                history = self._read_disk(include_journal=False)
+                if history is None:
+                    return False
+
+                atomic_write_json(self.history_file, history)
+                self._remove_file(self.compacting_file)
+                entries = entries_by_url(history)
+                self._write_stats(HistoryStats.from_entries(entries))
+                self._save_url_index(entries)
+            Utils.log(f"Historial compactado: {len(history)} entradas")
+            return True
+        except Exception as e:
+            Utils.log(f"Error compactando historial: {str(e)}", xbmc.LOGERROR)
+            return False
+        finally:
+            self.cache.invalidate()
+
+    def _stats_stamp(self):
+        """Versión de los archivos del historial a la que corresponden los agregados"""
+        stamp = []
+        for path in (self.history_file, self.compacting_file, self.journal_file):
+            try:
+                stat = os.stat(path)
+                stamp += [stat.st_mtime_ns, stat.st_size]
+            except OSError:
+                stamp += [None, None]
+        return stamp
+
+    def _read_stats(self):
+        """Leer los agregados guardados si siguen correspondiendo a los archivos (o None)"""
+        try:
+            with open(self.stats_file, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            return None
+        if data.get('stamp') != self._stats_stamp():
+            return None
+        return HistoryStats(data.get('stats'))
+
+    def _write_stats(self, stats):
+        """Guardar los agregados con la versión actual de los archivos"""
+        try:
+            # Se pueden reconstruir: no hace falta esperar al disco
+            atomic_write_json(self.stats_file, {'stamp': self._stats_stamp(), 'stats': stats.to_dict()},
+                              sync=False)
+        except (IOError, OSError) as e:
+            Utils.log(f"Error guardando estadísticas del historial: {str(e)}", xbmc.LOGWARNING)
+
+    def get_stats(self):
+        """Estadísticas del historial sin recorrerlo, salvo que haya que recalcularlas"""
+        if self._pending is not None:
+            return self._pending['stats'].summary()
+        stats = self._read_stats()
+        if stats is None:
+            # Solo se guardan con el bloqueo: sin él, otro proceso podría escribir
+            # entre la lectura y el guardado y los agregados quedarían con su versión
+            with file_lock(self.history_file, blocking=False) as locked:
+                stats = (locked and self._read_stats()) or HistoryStats.from_history(self.load())
+                if locked:
+                    self._write_stats(stats)
+        return stats.summary()
+
+    def rebuild_stats(self):
+        """Recalcular los agregados desde cero; devuelve False si se encontraron diferencias"""
+        with file_lock(self.history_file):
+            stored = self._read_stats()
+            stats = HistoryStats.from_history(self.load())
+            self._write_stats(stats)
+        return stored is None or stored.to_dict() == stats.to_dict()
+
+    def needs_compaction(self):
+        """Comprobar si hay operaciones pendientes de compactar"""
+        return os.path.exists(self.journal_file) or os.path.exists(self.compacting_file)
+
+    def save(self, history):
+        """Reemplazar todo el historial por una nueva instantánea"""
+        try:
+            with self.transaction():
+                entries = self._pending['index']['entries']
+                entries.clear()
+                entries.update(entries_by_url(history))
+                self._pending['operations'] = []
+                self._pending['replace'] = True
+                self._pending['stats'] = HistoryStats.from_entries(entries)
+            return True
+        except Exception as e:
+            Utils.log(f"Error guardando historial: {str(e)}", xbmc.LOGERROR)
+            return False
+
+    def record_visit(self, entry, max_entries):
+        """Registrar una visita añadiendo una línea al diario; devuelve la entrada guardada"""
+        # La operación guarda el estado final para que reaplicarla sea inocuo. La
+        # consulta va dentro de la transacción para no perder visitas de otro proceso
+        try:
+            with self.transaction():
+                previous_key = None
+                existing = self._pending['index']['entries'].get(entry['url'])
+                if existing is not None:
+                    previous_key = Frecency.history_key(existing)
+                    entry = dict(existing, timestamp=entry['timestamp'], date=entry['date'],
+                                 browser=entry['browser'], access_count=existing.get('access_count', 1) + 1)
+                else:
+                    entry = dict(entry, id=entry_id(entry['url']))
+                entry['frecency'] = Frecency.add_visit(previous_key, entry['timestamp'])
+
+                if not self._append({'op': 'visit', 'entry': entry, 'max': max_entries}):
+                    return None
+            return entry
+        except Exception as e:
+            Utils.log(f"Error guardando historial: {str(e)}", xbmc.LOGERROR)
+            return None
+
+    def remove(self, url):
+        """Eliminar una entrada por URL"""
+        return self._append({'op': 'remove', 'url': url})
+
+    def get_by_id(self, entry_id):
+        """Obtener una entrada por su id (o None).
+
+        El índice id -> entrada se construye una vez por versión del historial y se
+        reutiliza entre invocaciones; dentro de una transacción se busca en el índice.
+        """
+        if self._pending is not None:
+            return next((e for e in self._pending['index']['entries'].values() if e.get('id') == entry_id), None)
+
+        stamp = [self.cache.get_generation()] + self._stats_stamp()
+        loaded = _loaded_id_indexes.get(self.history_file)
+        if not loaded or loaded[0] != stamp:
+            loaded = (stamp, {entry.get('id') or entry_id(entry['url']): entry for entry in self.load()})
+            _loaded_id_indexes[self.history_file] = loaded
+        return loaded[1].get(entry_id)
+
+    def prune(self, cutoff, max_entries, batch):
+        """Eliminar hasta `batch` entradas caducadas o por encima del límite.
+
+        Se recorre el índice desde el principio (la visita más antigua) y se para en
+        la primera entrada que deba conservarse, así que el coste depende de lo que
+        se elimina y no del tamaño del historial. Devuelve las URLs eliminadas, o
+        None si no se pudo guardar.
+        """
+        try:
+            # Elegir dentro de la transacción para ver las visitas más recientes
+            with self.transaction():
+                entries = self._pending['index']['entries']
+                excess = len(entries) - max_entries if max_entries > 0 else 0
+                urls = []
+                for entry in entries.values():
+                    if len(urls) >= batch:
+                        break
+                    if excess > 0 or (cutoff is not None and entry['timestamp'] < cutoff):
+                        urls.append(entry['url'])
+                        excess -= 1
+                    else:
+                        break
+
+                if urls:
+                    operation = {'op': 'prune', 'urls': urls}
+                    self._apply(entries, operation, self._pending['stats'])
+                    self._pending['operations'].append(operation)
+            return urls
+        except Exception as e:
+            Utils.log(f"Error podando historial: {str(e)}", xbmc.LOGERROR)
+            return None
+
+    def clear(self):
+        """Eliminar todo el historial"""
+        return self.save([])
+
+    def get_recent(self, limit, offset=0):
+        """Obtener las entradas más recientes (una página a partir de offset)"""
+        return self.load()[offset:offset + limit]
+
+    def get_most_visited(self, limit, offset=0):
+        """Obtener las entradas con más accesos (una página a partir de offset)"""
+        return heapq.nlargest(offset + limit, self.load(), key=lambda x: x.get('access_count', 1))[offset:]
+
+    def get_top_frecency(self, limit):
+        """Obtener las entradas con mayor puntuación de frecencia"""
+        return Frecency.top(self.load(), limit, Frecency.history_key)
+
+    def search(self, query):
+        """Buscar por subcadena en URL y título"""
+        query_lower = query.lower()
+
+        results = []
+        for entry in self.load():
+            if (query_lower in entry['url'].lower() or
+                query_lower in entry.get('title', '').lower()):
+                results.append(entry)
+
+        return results
+
+class SQLiteHistoryStore:
+    """Almacén del historial en SQLite con índices por URL, fecha, número de accesos y frecencia.
+
+    Los totales y las visitas por navegador se guardan en tablas propias que
+    mantienen los disparadores de history, sea cual sea la sentencia que la modifique.
+    """
+
+    SCHEMA_VERSION = 1
+
+    def __init__(self, profile_path):
+        import sqlite3
+
+        self.db_file = os.path.join(profile_path, 'history.db')
+        self.json_file = os.path.join(profile_path, 'history.json')
+
+        # El servicio y el plugin pueden acceder a la vez: WAL permite leer mientras se escribe
+        # Sin transacciones implícitas: se abren explícitamente en transaction()
+        self.conn = sqlite3.connect(self.db_file, timeout=10, isolation_level=None)
+        self._transaction_depth = 0
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        # La clave de frecencia se actualiza dentro de la propia sentencia de la visita
+        self.conn.create_function('frecency_visit', 4, self._frecency_visit)
+        self._ensure_schema()
+
+    @staticmethod
+    def _frecency_visit(key, access_count, previous_timestamp, timestamp):
+        """Clave de frecencia de una fila existente tras una visita nueva"""
+        if key is None:
+            key = Frecency.estimate(access_count, previous_timestamp)
+        return Frecency.add_visit(key, timestamp)
+
+    @contextmanager
+    def transaction(self):
+        """Agrupar varias operaciones en una transacción de SQLite (anidable)"""
+        if self._transaction_depth:
+            self._transaction_depth += 1
+            try:
+                yield self
+            finally:
+                self._transaction_depth -= 1
+            return
+
+        self.conn.execute('BEGIN IMMEDIATE')
+        self._transaction_depth = 1
+        try:
+            yield self
+            self.conn.execute('COMMIT')
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        finally:
+            self._transaction_depth = 0
+
+    def _ensure_schema(self):
+        """Crear tablas e índices y migrar history.json la primera vez"""
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+
+        # Volcar el diario del almacén JSON para migrar el historial completo
+        JSONHistoryStore(os.path.dirname(self.db_file)).compact()
+
+        with self.transaction():
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS history (
+                    url TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    browser TEXT NOT NULL,
+                    timestamp REAL NOT NULL,
+                    date TEXT NOT NULL,
+                    access_count INTEGER NOT NULL DEFAULT 1,
+                    frecency REAL,
+                    id TEXT
+                )''')
+            self.conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_history_url ON history (url)')
+            self.conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_history_id ON history (id)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_history_timestamp ON history (timestamp)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_history_access_count ON history (access_count)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS idx_history_frecency ON history (frecency)')
+            # Los agregados se calculan tras la migración en vez de fila a fila en los disparadores
+            migrated = self._migrate_json()
+            self._create_stats_schema()
+            self._rebuild_stats_tables()
+            self.conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+        if migrated is not None:
+            # El archivo se conserva como respaldo pero deja de usarse
+            try:
+                os.replace(self.json_file, self.json_file + '.migrated')
+            except OSError as e:
+                Utils.log(f"No se pudo renombrar {self.json_file}: {str(e)}", xbmc.LOGWARNING)
+            Utils.log(f"Historial migrado a SQLite: {migrated} entradas")
+
+    def _create_stats_schema(self):
+        """Tablas de agregados y disparadores que las mantienen al día"""
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS history_totals (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                entries INTEGER NOT NULL,
+                visits INTEGER NOT NULL
+            )''')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS history_browsers (
+                browser TEXT PRIMARY KEY,
+                visits INTEGER NOT NULL
+            )''')
+        self.conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS history_stats_insert AFTER INSERT ON history BEGIN
+                UPDATE history_totals SET entries = entries + 1, visits = visits + NEW.access_count;
+                INSERT INTO history_browsers SELECT NEW.browser, 0
+                    WHERE NOT EXISTS (SELECT 1 FROM history_browsers WHERE browser = NEW.browser);
+                UPDATE history_browsers SET visits = visits + NEW.access_count WHERE browser = NEW.browser;
+            END''')
+        self.conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS history_stats_delete AFTER DELETE ON history BEGIN
+                UPDATE history_totals SET entries = entries - 1, visits = visits - OLD.access_count;
+                UPDATE history_browsers SET visits = visits - OLD.access_count WHERE browser = OLD.browser;
+                DELETE FROM history_browsers WHERE browser = OLD.browser AND visits <= 0;
+            END''')
+        self.conn.execute('''
+            CREATE TRIGGER IF NOT EXISTS history_stats_update AFTER UPDATE OF browser, access_count ON history BEGIN
+                UPDATE history_totals SET visits = visits - OLD.access_count + NEW.access_count;
+                UPDATE history_browsers SET visits = visits - OLD.access_count WHERE browser = OLD.browser;
+                DELETE FROM history_browsers WHERE browser = OLD.browser AND visits <= 0;
+                INSERT INTO history_browsers SELECT NEW.browser, 0
+                    WHERE NOT EXISTS (SELECT 1 FROM history_browsers WHERE browser = NEW.browser);
+                UPDATE history_browsers SET visits = visits + NEW.access_count WHERE browser = NEW.browser;
+            END''')
+
+    def _rebuild_stats_tables(self):
+        """Recalcular las tablas de agregados desde history (dentro de una transacción)"""
+        self.conn.execute('DELETE FROM history_totals')
+        self.conn.execute('''
+            INSERT INTO history_totals
+            SELECT 0, COUNT(*), COALESCE(SUM(access_count), 0) FROM history''')
+        self.conn.execute('DELETE FROM history_browsers')
+        self.conn.execute('''
+            INSERT INTO history_browsers
+            SELECT browser, SUM(access_count) FROM history GROUP BY browser HAVING SUM(access_count) > 0''')
+
+    def _migrate_json(self):
+        """Importar history.json dentro de la transacción de creación del esquema"""
+        if not os.path.exists(self.json_file):
+            return None
+
+        try:
+            with open(self.json_file, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+        except (IOError, ValueError) as e:
+            Utils.log(f"Error leyendo historial para migrar: {str(e)}", xbmc.LOGERROR)
+            return None
+
+        rows = self._rows(history)
+        # Si la URL estuviera repetida se conserva la primera (la más reciente)
+        self.conn.executemany('INSERT OR IGNORE INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?)', rows)
+        return len(rows)
+
+    @staticmethod
+    def _rows(history):
+        """Filas de history para unas entradas, con valores por defecto en las columnas NOT NULL.
+
+        Sin ellos, INSERT OR IGNORE descartaría en silencio las entradas incompletas.
+        """
+        rows = []
+        for entry in history:
+            if not entry.get('url'):
+                continue
+            rows.append((entry['url'], entry.get('title') or entry['url'],
+                         entry.get('browser') or 'Desconocido', entry.get('timestamp') or 0,
+                         entry.get('date') or '', entry.get('access_count') or 1,
+                         Frecency.history_key(entry), entry_id(entry['url'])))
+        return rows
+
+    def _query(self, sql, params=()):
+        """Ejecutar una consulta y devolver las filas como diccionarios"""
+        try:
+            return [dict(row) for row in self.conn.execute(sql, params)]
+        except Exception as e:
+            Utils.log(f"Error consultando historial: {str(e)}", xbmc.LOGERROR)
+            return []
+
+    def load(self):
+        """Cargar todo el historial, de más reciente a más antiguo"""
+        return self._query('SELECT * FROM history ORDER BY timestamp DESC')
+
+    def save(self, history):
+        """Reemplazar todo el historial"""
+        try:
+            with self.transaction():
+                self.conn.execute('DELETE FROM history')
+                # Si la URL estuviera repetida se conserva la primera (la más reciente)
+                self.conn.executemany('INSERT OR IGNORE INTO history VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                                      self._rows(history))
+            return True
+        except Exception as e:
+            Utils.log(f"Error guardando historial: {str(e)}", xbmc.LOGERROR)
+            return False
+
+    def record_visit(self, entry, max_entries):
+        """Registrar una visita con una única sentencia de inserción o actualización.
+
+        Devuelve la entrada tal como queda guardada, o None si falla.
+        """
+        entry = dict(entry, frecency=Frecency.add_visit(None, entry['timestamp']), id=entry_id(entry['url']))
+        try:
+            with self.transaction():
+                # Las expresiones de SET leen los valores anteriores de la fila
+                self.conn.execute('''
+                    INSERT INTO history VALUES
+                        (:url, :title, :browser, :timestamp, :date, :access_count, :frecency, :id)
+                    ON CONFLICT (url) DO UPDATE SET
+                        browser = excluded.browser,
+                        timestamp = excluded.timestamp,
+                        date = excluded.date,
+                        access_count = access_count + 1,
+                        frecency = frecency_visit(frecency, access_count, timestamp, excluded.timestamp)''', entry)
+
+                # Limitar número de entradas eliminando las más antiguas (usa el índice por fecha);
+                # 0 es sin límite, como en el almacén JSON
+                if max_entries > 0:
+                    self.conn.execute('''
+                        DELETE FROM history WHERE timestamp < (
+                            SELECT timestamp FROM history ORDER BY timestamp DESC LIMIT 1 OFFSET ?)''',
+                        (max_entries - 1,))
+                rows = self._query('SELECT * FROM history WHERE url = ?', (entry['url'],))
+            return rows[0] if rows else None
+        except Exception as e:
+            Utils.log(f"Error guardando historial: {str(e)}", xbmc.LOGERROR)
+            return None
+
+    def get_by_id(self, entry_id):
+        """Obtener una entrada por su id (o None)"""
+        rows = self._query('SELECT * FROM history WHERE id = ?', (entry_id,))
+        return rows[0] if rows else None
+
+    def remove(self, url):
+        """Eliminar una entrada por URL"""
+        try:
+            with self.transaction():
+                self.conn.execute('DELETE FROM history WHERE url = ?', (url,))
+            return True
+        except Exception as e:
+            Utils.log(f"Error eliminando entrada del historial: {str(e)}", xbmc.LOGERROR)
+            return False
+
+    def prune(self, cutoff, max_entries, batch):
+        """Eliminar hasta `batch` entradas caducadas o por encima del límite.
+
+        Usa el índice por fecha desde la visita más antigua y el total mantenido en
+        history_totals, sin recorrer la tabla. Devuelve las URLs eliminadas, o None
+        si falla.
+        """
+        try:
+            with self.transaction():
+                entries = self.conn.execute('SELECT entries FROM history_totals').fetchone()[0]
+                excess = entries - max_entries if max_entries > 0 else 0
+                rows = []
+                for row in self.conn.execute(
+                        'SELECT rowid, url, timestamp FROM history ORDER BY timestamp LIMIT ?', (batch,)):
+                    if excess > 0 or (cutoff is not None and row['timestamp'] < cutoff):
+                        rows.append(row)
+                        excess -= 1
+                    else:
+                        break
+                self.conn.executemany('DELETE FROM history WHERE rowid = ?', [(row['rowid'],) for row in rows])
+            return [row['url'] for row in rows]
+        except Exception as e:
+            Utils.log(f"Error podando historial: {str(e)}", xbmc.LOGERROR)
+            return None
+
+    def clear(self):
+        """Eliminar todo el historial"""
+        try:
+            with self.transaction():
+                self.conn.execute('DELETE FROM history')
+            return True
+        except Exception as e:
+            Utils.log(f"Error limpiando historial: {str(e)}", xbmc.LOGERROR)
+            return False
+
+    def get_recent(self, limit, offset=0):
+        """Obtener las entradas más recientes (una página a partir de offset)"""
+        return self._query('SELECT * FROM history ORDER BY timestamp DESC LIMIT ? OFFSET ?', (limit, offset))
+
+    def get_most_visited(self, limit, offset=0):
+        """Obtener las entradas con más accesos (una página a partir de offset)"""
+        return self._query('SELECT * FROM history ORDER BY access_count DESC, timestamp DESC LIMIT ? OFFSET ?',
+                           (limit, offset))
+
+    def get_top_frecency(self, limit):
+        """Obtener las entradas con mayor puntuación de frecencia (usa el índice)"""
+        return self._query('SELECT * FROM history WHERE frecency IS NOT NULL ORDER BY frecency DESC LIMIT ?',
+                           (limit,))
+
+    def search(self, query):
+        """Buscar por subcadena en URL y título"""
+        pattern = '%' + query.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+        return self._query('''
+            SELECT * FROM history
+            WHERE url LIKE ? ESCAPE '\\' OR title LIKE ? ESCAPE '\\'
+            ORDER BY timestamp DESC''', (pattern, pattern))
+
+    def _read_stats_tables(self):
+        """Contenido de las tablas de agregados, para compararlo"""
+        totals = self.conn.execute('SELECT entries, visits FROM history_totals').fetchone()
+        browsers = dict(tuple(row) for row in self.conn.execute('SELECT browser, visits FROM history_browsers'))
+        return (tuple(totals) if totals else None), browsers
+
+    def get_stats(self):
+        """Estadísticas a partir de las tablas de agregados y de los índices (None si está vacío)"""
+        try:
+            entries, visits = self.conn.execute('SELECT entries, visits FROM history_totals').fetchone()
+            if not entries:
+                return None
+
+            most_visited = self.conn.execute(
+                'SELECT url, access_count FROM history ORDER BY access_count DESC, timestamp DESC LIMIT 1').fetchone()
+            browser = self.conn.execute(
+                'SELECT browser FROM history_browsers ORDER BY visits DESC LIMIT 1').fetchone()
+            oldest = self.conn.execute('SELECT date FROM history ORDER BY timestamp ASC LIMIT 1').fetchone()
+            newest = self.conn.execute('SELECT date FROM history ORDER BY timestamp DESC LIMIT 1').fetchone()
+            return {
+                'total_entries': entries,
+                'total_visits': visits,
+                'most_visited_url': most_visited['url'],
+                'most_visited_count': most_visited['access_count'],
+                'most_used_browser': browser['browser'] if browser else None,
+                'oldest_entry': oldest['date'],
+                'newest_entry': newest['date']
+            }
+        except Exception as e:
+            Utils.log(f"Error consultando estadísticas del historial: {str(e)}", xbmc.LOGERROR)
+            return None
+
+    def rebuild_stats(self):
+        """Recalcular los agregados desde cero; devuelve False si se encontraron diferencias"""
+        try:
+            with self.transaction():
+                stored = self._read_stats_tables()
+                self._rebuild_stats_tables()
+                return stored == self._read_stats_tables()
+        except Exception as e:
+            Utils.log(f"Error recalculando estadísticas del historial: {str(e)}", xbmc.LOGERROR)
+            return True
+
+    def needs_compaction(self):
+        """SQLite no usa diario propio; el WAL se vuelca en compact()"""
+        return True
+
+    def compact(self):
+        """Volcar el WAL en la base de datos principal"""
+        try:
+            self.conn.execute('PRAGMA wal_checkpoint(PASSIVE)')
+            return True
+        except Exception as e:
+            Utils.log(f"Error compactando historial: {str(e)}", xbmc.LOGERROR)
+            return False
+
+    def close(self):
+        """Cerrar la conexión con la base de datos"""
+        self.conn.close()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import platform
+import xbmc
+from utils import Utils
+
+class InotifyWatcher:
+    """Vigilancia de rutas mediante inotify de Linux (vía ctypes)"""
+
+    IN_MODIFY = 0x00000002
+    IN_ATTRIB = 0x00000004
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_FROM = 0x00000040
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_DELETE = 0x00000200
+    IN_DELETE_SELF = 0x00000400
+    IN_MOVE_SELF = 0x00000800
+    IN_NONBLOCK = 0o4000
+    IN_CLOEXEC = 0o2000000
+
+    WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO |
+                  IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+    EVENT_HEADER = struct.Struct('iIII')
+
+    _libc = None
+
+    @classmethod
+    def _get_libc(cls):
+        """Cargar libc una sola vez"""
+        if cls._libc is None:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+            libc.inotify_init1.argtypes = [ctypes.c_int]
+            libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+            cls._libc = libc
+        return cls._libc
+
+    @classmethod
+    def is_available(cls):
+        """Comprobar si inotify puede usarse en este sistema"""
+        if platform.system().lower() != 'linux':
+            return False
+        try:
+            return hasattr(cls._get_libc(), 'inotify_init1')
+        except OSError:
+            return False
+
+    def __init__(self):
+        self.libc = self._get_libc()
+        self.fd = self.libc.inotify_init1(self.IN_NONBLOCK | self.IN_CLOEXEC)
+        if self.fd < 0:
+            err = ctypes.get_errno()
+            raise OSError(err, os.strerror(err))
+        self.watches = {}
+
+    def add_watch(self, path):
+        """Vigilar una ruta; si no existe, vigilar su ascendiente más cercano"""
+        while path and not os.path.exists(path):
+            parent = os.path.dirname(path.rstrip(os.sep))
+            if parent == path:
+                return None
+            path = parent
+
+        # La raíz y el directorio personal cambian constantemente: no aportan nada
+        if path in (os.sep, os.path.expanduser('~')) or path in self.watches.values():
+            return None
+
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), self.WATCH_MASK)
+        if wd < 0:
+            Utils.log(f"No se puede vigilar {path}: {os.strerror(ctypes.get_errno())}", xbmc.LOGDEBUG)
+            return None
+
+        self.watches[wd] = path
+        return wd
+
+    def read_events(self, timeout=0):
+        """Devolver las rutas vigiladas que han cambiado desde la última lectura"""
+        changed = set()
+
+        try:
+            readable, _, _ = select.select([self.fd], [], [], timeout)
+        except (OSError, ValueError):
+            return changed
+
+        while readable:
+            try:
+                buffer = os.read(self.fd, 65536)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+
+            offset = 0
+            while offset + self.EVENT_HEADER.size <= len(buffer):
+                wd, mask, cookie, length = self.EVENT_HEADER.unpack_from(buffer, offset)
+                offset += self.EVENT_HEADER.size + length
+                if wd in self.watches:
+                    changed.add(self.watches[wd])
+
+        return changed
+
+    def close(self):
+        """Liberar el descriptor de inotify y todas sus vigilancias"""
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+            self.watches = {}
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import threading
+import xbmc
+from contextlib import contextmanager
+from utils import Utils
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import msvcrt
+except ImportError:
+    msvcrt = None
+
+# Bloqueos que ya tiene este proceso (ruta -> [descriptor, profundidad]): una
+# transacción anidada o una compactación lanzada desde un commit no se bloquea a sí misma
+_held_locks = {}
+
+# Contadores de espera para diagnosticar contención entre invocaciones
+_lock_stats = {'acquired': 0, 'contended': 0, 'timeouts': 0, 'wait_total': 0.0, 'wait_max': 0.0}
+
+# Esperas a partir de las cuales se registran en el log
+LOG_WAIT_SECONDS = 0.05
+WARN_WAIT_SECONDS = 1.0
+
+# Las esperas cortas se resuelven por sondeo; a partir de aquí se espera en la
+# cola de flock, que no deja a un proceso esperando indefinidamente
+QUEUE_AFTER_SECONDS = 0.004
+
+def _try_lock(fd):
+    """Intentar tomar el bloqueo exclusivo sin esperar"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        elif msvcrt is not None:
+            os.lseek(fd, 0, os.SEEK_SET)
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError as e:
+        # flock indica el bloqueo ocupado con EWOULDBLOCK; msvcrt, con EACCES o EDEADLOCK
+        if fcntl is not None and not isinstance(e, BlockingIOError):
+            raise
+        return False
+
+def _unlock(fd):
+    """Liberar el bloqueo"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    elif msvcrt is not None:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+def _wait_flock(fd, timeout):
+    """Esperar al bloqueo en la cola de flock con un tiempo límite.
+
+    flock no admite tiempo límite, así que la espera bloqueante se hace en un
+    hilo sobre un duplicado del descriptor (comparten el bloqueo). Si se agota el
+    tiempo, el hilo libera el bloqueo en cuanto lo obtenga.
+    """
+    waiter_fd = os.dup(fd)
+    acquired = threading.Event()
+    guard = threading.Lock()
+    state = {'abandoned': False}
+
+    def wait():
+        try:
+            fcntl.flock(waiter_fd, fcntl.LOCK_EX)
+            with guard:
+                if state['abandoned']:
+                    fcntl.flock(waiter_fd, fcntl.LOCK_UN)
+                else:
+                    acquired.set()
+        except OSError:
+            pass
+        finally:
+            os.close(waiter_fd)
+
+    threading.Thread(target=wait, name='file_lock', daemon=True).start()
+    if acquired.wait(timeout):
+        return True
+    with guard:
+        if acquired.is_set():
+            return True
+        state['abandoned'] = True
+    return False
+
+def _acquire(fd, lock_path, timeout, blocking):
+    """Esperar al bloqueo; devuelve False si no se obtiene sin esperar.
+
+    Con flock se espera en la cola del sistema, que atiende a los procesos en
+    cuanto se libera; con msvcrt, por sondeo con pausas crecientes.
+    """
+    start = time.monotonic()
+    delay = 0.001
+    contended = False
+    while not _try_lock(fd):
+        if not blocking:
+            return False
+        contended = True
+        remaining = timeout - (time.monotonic() - start)
+        if remaining > 0 and fcntl is not None and delay > QUEUE_AFTER_SECONDS:
+            if _wait_flock(fd, remaining):
+                break
+        if time.monotonic() - start >= timeout:
+            _lock_stats['timeouts'] += 1
+            raise TimeoutError(f"Tiempo de espera agotado para el bloqueo {lock_path}")
+        time.sleep(delay)
+        delay = min(delay * 2, 0.05)
+
+    waited = time.monotonic() - start
+    _lock_stats['acquired'] += 1
+    _lock_stats['wait_total'] += waited
+    _lock_stats['wait_max'] = max(_lock_stats['wait_max'], waited)
+    if contended:
+        _lock_stats['contended'] += 1
+    if waited >= LOG_WAIT_SECONDS:
+        level = xbmc.LOGWARNING if waited >= WARN_WAIT_SECONDS else xbmc.LOGDEBUG
+        Utils.log(f"Espera de {waited * 1000:.0f} ms por el bloqueo {os.path.basename(lock_path)}", level)
+    return True
+
+@contextmanager
+def file_lock(path, timeout=10.0, blocking=True):
+    """Bloqueo exclusivo entre procesos sobre `path` + '.lock'.
+
+    Solo lo toman los escritores: los lectores leen archivos que se sustituyen de
+    forma atómica y no esperan nunca. Las esperas cortas se resuelven por sondeo
+    y las largas en la cola de flock (ver _acquire); si se supera `timeout` se
+    lanza TimeoutError (un OSError, que los gestores ya tratan como error de escritura). Con blocking=False el bloque
+    recibe False en lugar de esperar si otro proceso tiene el bloqueo.
+    Donde no hay fcntl ni msvcrt el bloqueo no tiene efecto.
+    """
+    lock_path = path + '.lock'
+    held = _held_locks.get(lock_path)
+    if held is not None:
+        held[1] += 1
+        try:
+            yield True
+        finally:
+            held[1] -= 1
+        return
+
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if not _acquire(fd, lock_path, timeout, blocking):
+            yield False
+            return
+        _held_locks[lock_path] = [fd, 1]
+        try:
+            yield True
+        finally:
+            del _held_locks[lock_path]
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+def lock_stats():
+    """Copia de los contadores de espera de este proceso"""
+    return dict(_lock_stats)
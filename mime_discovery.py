@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import shlex
+from utils import Utils
+
+class MimeBrowserDiscovery:
+    """Descubrir navegadores a partir de las asociaciones MIME de XDG"""
+
+    # Tipos leídos de mimeinfo.cache y mimeapps.list
+    BROWSER_MIME_TYPES = ('x-scheme-handler/http', 'x-scheme-handler/https', 'text/html')
+    # Un navegador debe manejar al menos uno de estos esquemas
+    SCHEME_MIME_TYPES = ('x-scheme-handler/http', 'x-scheme-handler/https')
+
+    # Directorios exportados por flatpak y snap
+    EXTRA_DATA_DIRS = [
+        '~/.local/share/flatpak/exports/share',
+        '/var/lib/flatpak/exports/share',
+        '/var/lib/snapd/desktop'
+    ]
+
+    FLATPAK_EXPORT_BINS = [
+        '~/.local/share/flatpak/exports/bin',
+        '/var/lib/flatpak/exports/bin'
+    ]
+
+    def __init__(self, path_index=None):
+        self.path_index = path_index
+        self.data_dirs = self.get_data_dirs()
+        self.config_dirs = self.get_config_dirs()
+        self.read_files = 0
+
+    @classmethod
+    def get_data_dirs(cls):
+        """Directorios de datos XDG por orden de prioridad"""
+        data_home = os.environ.get('XDG_DATA_HOME') or '~/.local/share'
+        data_dirs = os.environ.get('XDG_DATA_DIRS') or '/usr/local/share:/usr/share'
+
+        dirs = []
+        for path in [data_home] + data_dirs.split(':') + cls.EXTRA_DATA_DIRS:
+            if path:
+                path = os.path.expanduser(path).rstrip('/')
+                if path not in dirs:
+                    dirs.append(path)
+        return dirs
+
+    @staticmethod
+    def get_config_dirs():
+        """Directorios de configuración XDG por orden de prioridad"""
+        config_home = os.environ.get('XDG_CONFIG_HOME') or '~/.config'
+        config_dirs = os.environ.get('XDG_CONFIG_DIRS') or '/etc/xdg'
+
+        dirs = []
+        for path in [config_home] + config_dirs.split(':'):
+            if path:
+                path = os.path.expanduser(path).rstrip('/')
+                if path not in dirs:
+                    dirs.append(path)
+        return dirs
+
+    def _get_mimeapps_files(self):
+        """Archivos mimeapps.list en orden de prioridad"""
+        files = [os.path.join(path, 'mimeapps.list') for path in self.config_dirs]
+        files += [os.path.join(path, 'applications', 'mimeapps.list') for path in self.data_dirs]
+        return files
+
+    def _get_mimeinfo_files(self):
+        """Archivos mimeinfo.cache en orden de prioridad"""
+        return [os.path.join(path, 'applications', 'mimeinfo.cache') for path in self.data_dirs]
+
+    def get_watch_paths(self):
+        """Rutas cuyo cambio afecta al resultado del descubrimiento"""
+        paths = [os.path.join(path, 'applications') for path in self.data_dirs]
+        paths += self._get_mimeapps_files() + self._get_mimeinfo_files()
+        return paths
+
+    def _read_sections(self, path, sections):
+        """Leer asociaciones MIME de las secciones indicadas de un archivo INI"""
+        associations = {}
+
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.read_files += 1
+                current_section = None
+
+                for line in f:
+                    line = line.strip()
+                    if not line or line.startswith('#'):
+                        continue
+                    if line.startswith('['):
+                        current_section = line.strip('[]')
+                        continue
+                    if current_section not in sections or '=' not in line:
+                        continue
+
+                    mime_type, desktop_ids = line.split('=', 1)
+                    mime_type = mime_type.strip()
+                    if mime_type in self.BROWSER_MIME_TYPES:
+                        ids = [i.strip() for i in desktop_ids.split(';') if i.strip()]
+                        associations.setdefault(current_section, {}).setdefault(mime_type, []).extend(ids)
+        except (IOError, UnicodeDecodeError):
+            pass
+
+        return associations
+
+    def find_browser_desktop_ids(self):
+        """Obtener identificadores .desktop que manejan http(s), en orden de preferencia"""
+        ordered_ids = []
+        handled_mimes = {}
+        removed = set()
+
+        def add(desktop_id, mime_type):
+            if (desktop_id, mime_type) in removed:
+                return
+            if desktop_id not in handled_mimes:
+                ordered_ids.append(desktop_id)
+                handled_mimes[desktop_id] = set()
+            handled_mimes[desktop_id].add(mime_type)
+
+        # mimeapps.list: predeterminados y asociaciones del usuario y del sistema
+        for path in self._get_mimeapps_files():
+            sections = self._read_sections(
+                path, ('Default Applications', 'Added Associations', 'Removed Associations'))
+
+            for mime_type, ids in sections.get('Removed Associations', {}).items():
+                removed.update((desktop_id, mime_type) for desktop_id in ids)
+            for section in ('Default Applications', 'Added Associations'):
+                for mime_type, ids in sections.get(section, {}).items():
+                    for desktop_id in ids:
+                        add(desktop_id, mime_type)
+
+        # mimeinfo.cache: todas las aplicaciones instaladas que declaran el tipo
+        for path in self._get_mimeinfo_files():
+            sections = self._read_sections(path, ('MIME Cache',))
+            for mime_type, ids in sections.get('MIME Cache', {}).items():
+                for desktop_id in ids:
+                    add(desktop_id, mime_type)
+
+        return [desktop_id for desktop_id in ordered_ids
+                if handled_mimes[desktop_id].intersection(self.SCHEME_MIME_TYPES)]
+
+    def _resolve_desktop_file(self, desktop_id):
+        """Localizar el archivo de un identificador .desktop en los directorios de datos"""
+        candidates = [desktop_id]
+        # "vendor-app.desktop" puede estar en applications/vendor/app.desktop
+        if '-' in desktop_id:
+            candidates.append(desktop_id.replace('-', os.sep, 1))
+
+        for data_dir in self.data_dirs:
+            for candidate in candidates:
+                path = os.path.join(data_dir, 'applications', candidate)
+                if os.path.isfile(path):
+                    return path
+        return None
+
+    def parse_desktop_entry(self, desktop_file):
+        """Leer solo la sección [Desktop Entry], deteniéndose al terminarla"""
+        entry = {}
+
+        try:
+            with open(desktop_file, 'r', encoding='utf-8') as f:
+                self.read_files += 1
+                in_entry = False
+
+                for line in f:
+                    line = line.strip()
+                    if line.startswith('['):
+                        if in_entry:
+                            break
+                        in_entry = line == '[Desktop Entry]'
+                        continue
+                    if not in_entry or '=' not in line:
+                        continue
+
+                    key, value = line.split('=', 1)
+                    key = key.strip()
+                    if key in ('Name', 'Exec', 'Comment', 'Hidden', 'Type'):
+                        entry[key] = value.strip()
+        except (IOError, UnicodeDecodeError):
+            return None
+
+        if entry.get('Hidden', '').lower() == 'true' or entry.get('Type', 'Application') != 'Application':
+            return None
+        if not entry.get('Name') or not entry.get('Exec'):
+            return None
+
+        return {
+            'name': entry['Name'],
+            'exec': entry['Exec'],
+            'comment': entry.get('Comment')
+        }
+
+    def resolve_executable(self, exec_command):
+        """Obtener el ejecutable real de una línea Exec"""
+        try:
+            parts = shlex.split(exec_command)
+        except ValueError:
+            parts = exec_command.split()
+
+        # Omitir "env VAR=valor" delante del comando (habitual en snap)
+        if parts and os.path.basename(parts[0]) == 'env':
+            parts = parts[1:]
+            while parts and '=' in parts[0] and not parts[0].startswith('/'):
+                parts = parts[1:]
+
+        if not parts:
+            return None
+
+        # "flatpak run ... org.app.Id" se lanza mediante el script exportado
+        if os.path.basename(parts[0]) == 'flatpak' and 'run' in parts:
+            app_ids = [p for p in parts[parts.index('run') + 1:]
+                       if not p.startswith(('-', '@@', '%'))]
+            if not app_ids:
+                return None
+            for bin_dir in self.FLATPAK_EXPORT_BINS:
+                path = os.path.join(os.path.expanduser(bin_dir), app_ids[0])
+                if os.path.isfile(path) and os.access(path, os.X_OK):
+                    return path
+            return None
+
+        executable = parts[0]
+        if not os.path.isabs(executable):
+            return self.path_index.find(executable) if self.path_index else None
+
+        if os.path.isfile(executable) and os.access(executable, os.X_OK):
+            return executable
+        return None
+
+    def discover(self):
+        """Devolver navegadores declarados como manejadores de http(s)"""
+        browsers = []
+
+        for desktop_id in self.find_browser_desktop_ids():
+            desktop_file = self._resolve_desktop_file(desktop_id)
+            if not desktop_file:
+                continue
+
+            entry = self.parse_desktop_entry(desktop_file)
+            if not entry:
+                continue
+
+            executable = self.resolve_executable(entry['exec'])
+            if executable:
+                browsers.append({
+                    'name': entry['name'],
+                    'executable': executable,
+                    'description': entry.get('comment') or f"Navegador web {entry['name']}",
+                    'icon': 'DefaultProgram.png'
+                })
+
+        Utils.log(f"Descubrimiento MIME: {len(browsers)} navegadores, {self.read_files} archivos leídos")
+        return browsers
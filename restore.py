@@ -85,7 +85,8 @@ class RestoreManager:
             # Realizar restauración
             success = self.backup_manager.restore_backup(
                 backup_info['path'],
-                restore_settings
+                restore_settings,
+                progress
             )
             
             progress.update(100, "Restauración completada")
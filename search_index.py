@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import datetime
+import xbmc
+import xbmcaddon
+import xbmcvfs
+from utils import Utils
+
+class SearchIndex:
+    """Índice de trigramas persistente sobre el historial y las URLs guardadas.
+
+    Cada documento (una entrada del historial o una URL guardada) se guarda con su
+    texto normalizado y un trigrama por fila. Una consulta se divide en términos;
+    los de tres o más caracteres reducen los candidatos con el índice y todos se
+    comprueban después como subcadena, así que el resultado es exacto.
+    """
+
+    SCHEMA_VERSION = 2
+    # Un trigrama con más documentos que este límite apenas filtra: no se usa para buscar
+    SELECTIVE_TRIGRAM_LIMIT = 2000
+    # Trigramas por término usados para obtener candidatos (los menos frecuentes)
+    TRIGRAMS_PER_TERM = 3
+    SOURCE_HISTORY = 'history'
+    SOURCE_URLS = 'urls'
+
+    def __init__(self):
+        import sqlite3
+
+        self.db_file = self.get_db_file()
+        self.conn = sqlite3.connect(self.db_file, timeout=10)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self._ensure_schema()
+
+    @staticmethod
+    def get_db_file():
+        """Ruta de la base de datos del índice en el perfil del addon"""
+        addon = xbmcaddon.Addon()
+        # Usar xbmcvfs.translatePath para compatibilidad con Kodi 19+
+        try:
+            profile_path = xbmcvfs.translatePath(addon.getAddonInfo('profile'))
+        except AttributeError:
+            # Fallback para versiones anteriores
+            profile_path = xbmc.translatePath(addon.getAddonInfo('profile'))
+
+        if not os.path.exists(profile_path):
+            os.makedirs(profile_path)
+        return os.path.join(profile_path, 'search_index.db')
+
+    @classmethod
+    def apply_updates(cls, updates):
+        """Aplicar cambios de los almacenes al índice si ya está construido.
+
+        updates es una lista de (método, argumentos) con método 'upsert', 'remove',
+        'trim' o 'replace_source'. Los gestores la llaman con el bloqueo del almacén
+        tomado, así que los cambios llegan en el mismo orden que a los almacenes.
+        Si el índice aún no existe o está caducado no se aplican: se construirá
+        completo en la próxima búsqueda. Cada llamada cuenta como una escritura,
+        para que una reconstrucción simultánea sepa que su copia ha quedado atrás.
+        Un error nunca se propaga, porque el índice es un dato derivado: se marca
+        como caducado para reconstruirlo.
+        """
+        if not updates or not os.path.exists(cls.get_db_file()):
+            return False
+
+        try:
+            index = cls()
+            try:
+                with index.conn:
+                    index.conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'writes'")
+                if not index.is_current():
+                    return False
+                for operation, args in updates:
+                    getattr(index, operation)(*args)
+                return True
+            finally:
+                index.close()
+        except Exception as e:
+            Utils.log(f"Error actualizando índice de búsqueda: {str(e)}", xbmc.LOGWARNING)
+            cls.mark_stale()
+            return False
+
+    @classmethod
+    def mark_stale(cls):
+        """Marcar el índice como caducado para que se reconstruya antes de usarlo"""
+        try:
+            index = cls()
+            try:
+                with index.conn:
+                    index.conn.execute("INSERT OR REPLACE INTO meta VALUES ('stale', '1')")
+            finally:
+                index.close()
+        except Exception as e:
+            Utils.log(f"No se pudo marcar el índice de búsqueda como caducado: {str(e)}", xbmc.LOGERROR)
+
+    def _ensure_schema(self):
+        """Crear las tablas; un índice nuevo queda pendiente de construir"""
+        version = self.conn.execute('PRAGMA user_version').fetchone()[0]
+        if version == self.SCHEMA_VERSION:
+            return
+
+        with self.conn:
+            self.conn.execute('DROP TABLE IF EXISTS trigrams')
+            self.conn.execute('DROP TABLE IF EXISTS docs')
+            self.conn.execute('DROP TABLE IF EXISTS meta')
+            self.conn.execute('''
+                CREATE TABLE docs (
+                    id INTEGER PRIMARY KEY,
+                    source TEXT NOT NULL,
+                    ref TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    description TEXT NOT NULL,
+                    canonical TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    timestamp REAL NOT NULL
+                )''')
+            self.conn.execute('CREATE UNIQUE INDEX idx_docs_ref ON docs (source, ref)')
+            self.conn.execute('CREATE INDEX idx_docs_source_timestamp ON docs (source, timestamp)')
+            self.conn.execute('CREATE INDEX idx_docs_timestamp ON docs (timestamp)')
+            self.conn.execute('''
+                CREATE TABLE trigrams (
+                    trigram INTEGER NOT NULL,
+                    doc_id INTEGER NOT NULL,
+                    PRIMARY KEY (trigram, doc_id)
+                ) WITHOUT ROWID''')
+            self.conn.execute('CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)')
+            self.conn.execute("INSERT INTO meta VALUES ('writes', 0)")
+            self.conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+
+    @staticmethod
+    def normalize(text):
+        """Normalizar texto para buscar sin distinguir mayúsculas"""
+        return ' '.join((text or '').casefold().split())
+
+    @staticmethod
+    def trigrams(text):
+        """Trigramas de un texto normalizado, codificados como enteros (21 bits por carácter)"""
+        codes = [ord(char) for char in text]
+        return {(a << 42) | (b << 21) | c for a, b, c in zip(codes, codes[1:], codes[2:])}
+
+    @staticmethod
+    def _iso_to_timestamp(value):
+        """Convertir una fecha ISO a segundos desde epoch (0 si no es válida)"""
+        try:
+            return datetime.datetime.fromisoformat(value).timestamp()
+        except (TypeError, ValueError):
+            return 0
+
+    @classmethod
+    def history_doc(cls, entry):
+        """Documento del índice para una entrada del historial"""
+        return {
+            'source': cls.SOURCE_HISTORY,
+            'ref': entry['url'],
+            'url': entry['url'],
+            'title': entry.get('title') or entry['url'],
+            'description': '',
+            'timestamp': entry.get('timestamp', 0)
+        }
+
+    @classmethod
+    def url_doc(cls, url_data):
+        """Documento del índice para una URL guardada"""
+        timestamp = max(cls._iso_to_timestamp(url_data.get('last_accessed')),
+                        cls._iso_to_timestamp(url_data.get('created_date')))
+        return {
+            'source': cls.SOURCE_URLS,
+            'ref': url_data['id'],
+            'url': url_data['url'],
+            'title': url_data['name'],
+            'description': url_data.get('description') or '',
+            'timestamp': timestamp
+        }
+
+    def _get_meta(self, key):
+        """Leer un valor de la tabla meta (None si no existe)"""
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row is not None else None
+
+    def is_built(self):
+        """Comprobar si el índice se ha construido al menos una vez"""
+        return self._get_meta('built') is not None
+
+    def is_current(self):
+        """Comprobar si el índice está construido y no se ha marcado como caducado"""
+        return self.is_built() and self._get_meta('stale') is None
+
+    def ensure_built(self):
+        """Construir el índice desde los almacenes si no existe o está caducado"""
+        if not self.is_current():
+            self.rebuild()
+
+    def _store_docs(self):
+        """Documentos del historial y de las URLs guardadas tal como están en los almacenes"""
+        from history_manager import HistoryManager
+        from url_manager import URLManager
+
+        history_docs = [self.history_doc(entry) for entry in HistoryManager().load_history()]
+        url_docs = [self.url_doc(url_data) for url_data in URLManager().get_saved_urls()]
+        return history_docs, url_docs
+
+    def rebuild(self):
+        """Reconstruir todo el índice a partir del historial y las URLs guardadas.
+
+        Si otro proceso escribe en los almacenes mientras se leen, la copia leída
+        puede no incluir su cambio: el índice queda marcado como caducado y se
+        reconstruye de nuevo la próxima vez que se necesite.
+        """
+        writes = self._get_meta('writes')
+        history_docs, url_docs = self._store_docs()
+
+        with self.conn:
+            # Sin escrituras de otros procesos entre la comprobación y el commit
+            self.conn.execute('BEGIN IMMEDIATE')
+            raced = self._get_meta('writes') != writes
+            self.conn.execute('DELETE FROM trigrams')
+            self.conn.execute('DELETE FROM docs')
+            self._insert_many(history_docs + url_docs)
+            self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('built', '1')")
+            if raced:
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('stale', '1')")
+            else:
+                self.conn.execute("DELETE FROM meta WHERE key = 'stale'")
+
+        if raced:
+            Utils.log("Índice de búsqueda reconstruido con cambios simultáneos: queda caducado", xbmc.LOGWARNING)
+        Utils.log(f"Índice de búsqueda reconstruido: {len(history_docs)} entradas del historial, "
+                  f"{len(url_docs)} URLs guardadas")
+
+    def check(self):
+        """Comparar el índice con los almacenes y reconstruirlo si no coinciden.
+
+        Devuelve True si el índice estaba al día. Recorre todos los documentos:
+        es para la verificación periódica del servicio, no para cada búsqueda.
+        """
+        if not self.is_current():
+            self.rebuild()
+            return False
+
+        writes = self._get_meta('writes')
+        history_docs, url_docs = self._store_docs()
+        expected = {(doc['source'], doc['ref'], doc['url'], doc['title'], doc['description'])
+                    for doc in history_docs + url_docs}
+        indexed = {tuple(row) for row in self.conn.execute('SELECT source, ref, url, title, description FROM docs')}
+
+        # Una escritura durante la comparación invalida la comprobación, no el índice
+        if indexed == expected or self._get_meta('writes') != writes:
+            return True
+
+        Utils.log("Índice de búsqueda inconsistente: reconstruyendo", xbmc.LOGWARNING)
+        self.rebuild()
+        return False
+
+    def _insert(self, doc):
+        """Insertar un documento y sus trigramas (dentro de una transacción)"""
+        self._insert_many([doc])
+
+    def _insert_many(self, docs):
+        """Insertar documentos y sus trigramas (dentro de una transacción).
+
+        Los trigramas se insertan ordenados: en lote es mucho más rápido que
+        insertarlos en orden aleatorio en la clave primaria.
+        """
+        next_id = self.conn.execute('SELECT COALESCE(MAX(id), 0) + 1 FROM docs').fetchone()[0]
+        doc_rows = []
+        trigram_rows = []
+        for doc_id, doc in enumerate(docs, next_id):
+            text = self.normalize(' '.join((doc['url'], doc['title'], doc['description'])))
+            doc_rows.append((doc_id, doc['source'], doc['ref'], doc['url'], doc['title'], doc['description'],
+                             Utils.canonicalize_url(doc['url']), text, doc['timestamp']))
+            trigram_rows.extend((trigram, doc_id) for trigram in self.trigrams(text))
+
+        self.conn.executemany('INSERT INTO docs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', doc_rows)
+        trigram_rows.sort()
+        self.conn.executemany('INSERT INTO trigrams VALUES (?, ?)', trigram_rows)
+
+    def _delete(self, row):
+        """Eliminar un documento y sus trigramas (dentro de una transacción)"""
+        self.conn.executemany('DELETE FROM trigrams WHERE trigram = ? AND doc_id = ?',
+                              [(trigram, row['id']) for trigram in self.trigrams(row['text'])])
+        self.conn.execute('DELETE FROM docs WHERE id = ?', (row['id'],))
+
+    def upsert(self, docs):
+        """Añadir o actualizar documentos; si el texto no cambia solo se actualiza la fecha"""
+        with self.conn:
+            for doc in docs:
+                row = self.conn.execute('SELECT id, url, title, description, text FROM docs '
+                                        'WHERE source = ? AND ref = ?', (doc['source'], doc['ref'])).fetchone()
+                if row is not None:
+                    if (row['url'], row['title'], row['description']) == (doc['url'], doc['title'], doc['description']):
+                        self.conn.execute('UPDATE docs SET timestamp = ? WHERE id = ?', (doc['timestamp'], row['id']))
+                        continue
+                    self._delete(row)
+                self._insert(doc)
+
+    def remove(self, source, refs):
+        """Eliminar documentos de un origen"""
+        with self.conn:
+            for ref in refs:
+                row = self.conn.execute('SELECT id, text FROM docs WHERE source = ? AND ref = ?',
+                                        (source, ref)).fetchone()
+                if row is not None:
+                    self._delete(row)
+
+    def trim(self, source, max_docs):
+        """Conservar solo los max_docs documentos más recientes de un origen (0: sin límite)"""
+        if max_docs <= 0:
+            return
+        with self.conn:
+            rows = self.conn.execute('''
+                SELECT id, text FROM docs WHERE source = ? AND timestamp < (
+                    SELECT timestamp FROM docs WHERE source = ? ORDER BY timestamp DESC LIMIT 1 OFFSET ?)''',
+                (source, source, max_docs - 1)).fetchall()
+            for row in rows:
+                self._delete(row)
+
+    def replace_source(self, source, docs):
+        """Sustituir todos los documentos de un origen"""
+        with self.conn:
+            self.conn.execute('DELETE FROM trigrams WHERE doc_id IN (SELECT id FROM docs WHERE source = ?)',
+                              (source,))
+            self.conn.execute('DELETE FROM docs WHERE source = ?', (source,))
+            self._insert_many(docs)
+
+    def _selective_trigrams(self, term):
+        """Elegir los trigramas menos frecuentes de un término.
+
+        Si todos son muy frecuentes se devuelve una lista vacía: el término aparece
+        en tantos documentos que recorrerlos por fecha encuentra resultados antes.
+        """
+        counts = []
+        for trigram in self.trigrams(term):
+            count = self.conn.execute('SELECT COUNT(*) FROM (SELECT 1 FROM trigrams WHERE trigram = ? LIMIT ?)',
+                                      (trigram, self.SELECTIVE_TRIGRAM_LIMIT)).fetchone()[0]
+            if count == 0:
+                # Ningún documento contiene el término
+                return [trigram]
+            counts.append((count, trigram))
+
+        counts.sort()
+        return [trigram for count, trigram in counts[:self.TRIGRAMS_PER_TERM]
+                if count < self.SELECTIVE_TRIGRAM_LIMIT]
+
+    def search(self, query, limit=50, sources=None):
+        """Buscar documentos que contengan todos los términos de la consulta.
+
+        Devuelve como máximo limit resultados, de más reciente a más antiguo y sin
+        URLs repetidas (si una URL está guardada y en el historial se muestra la guardada).
+        """
+        terms = self.normalize(query).split()
+        if not terms:
+            return []
+
+        conditions = []
+        params = []
+        for term in terms:
+            trigrams = self._selective_trigrams(term)
+            if trigrams:
+                placeholders = ', '.join('?' * len(trigrams))
+                conditions.append(f'''id IN (SELECT doc_id FROM trigrams WHERE trigram IN ({placeholders})
+                                      GROUP BY doc_id HAVING COUNT(*) = ?)''')
+                params.extend(trigrams)
+                params.append(len(trigrams))
+            # Los trigramas solo preseleccionan: la subcadena se comprueba siempre
+            conditions.append('instr(text, ?) > 0')
+            params.append(term)
+
+        if sources:
+            conditions.append(f"source IN ({', '.join('?' * len(sources))})")
+            params.extend(sources)
+
+        sql = f'''SELECT source, ref, url, title, description, canonical, timestamp FROM docs
+                  WHERE {' AND '.join(conditions)}
+                  ORDER BY timestamp DESC'''
+
+        results = []
+        positions = {}
+        # Resultados del historial cuya URL guardada podría aparecer más adelante
+        unmerged = 0
+        for row in self.conn.execute(sql, params):
+            position = positions.get(row['canonical'])
+            if position is not None:
+                # Misma URL en los dos orígenes: mostrar la guardada en el lugar de la más reciente
+                if row['source'] == self.SOURCE_URLS and results[position]['source'] != self.SOURCE_URLS:
+                    results[position] = dict(row, timestamp=results[position]['timestamp'])
+                    unmerged -= 1
+            elif len(results) < limit:
+                positions[row['canonical']] = len(results)
+                results.append(dict(row))
+                if row['source'] != self.SOURCE_URLS:
+                    unmerged += 1
+            # Con la lista llena solo se siguen leyendo filas para fusionar URLs guardadas
+            if len(results) >= limit and not unmerged:
+                break
+
+        return results
+
+    def close(self):
+        """Cerrar la conexión con la base de datos"""
+        self.conn.close()
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import time
+import xbmc
+import xbmcaddon
+from browser_detector import BrowserDetector
+from history_manager import HistoryManager
+from inotify_watcher import InotifyWatcher
+from search_index import SearchIndex
+from url_manager import URLManager
+from utils import Utils
+
+class DetectionService(xbmc.Monitor):
+    """Servicio que mantiene la detección de navegadores al día en segundo plano"""
+
+    # Espera tras un cambio antes de redetectar (agrupa ráfagas de eventos)
+    DEBOUNCE_SECONDS = 2
+    # Revalidación periódica cuando inotify no está disponible
+    POLL_INTERVAL = 60
+    # Revalidación de seguridad aunque inotify esté activo (rutas no vigilables)
+    SAFETY_INTERVAL = 600
+    HEARTBEAT_INTERVAL = 10
+    # Compactación del historial mientras el servicio está inactivo
+    COMPACT_INTERVAL = 300
+    # Pausa entre lotes de la poda del historial
+    RETENTION_PAUSE = 0.1
+    # Verificación de las estadísticas mantenidas (recorre todo el historial)
+    STATS_CHECK_INTERVAL = 24 * 60 * 60
+
+    def __init__(self):
+        super().__init__()
+        self.settings_changed = False
+        self.watcher = None
+        self.last_compaction = time.monotonic()
+        self.last_stats_check = None
+
+    def onSettingsChanged(self):
+        """Redetectar al cambiar la configuración (p. ej. el modo de descubrimiento)"""
+        self.settings_changed = True
+
+    def _is_enabled(self):
+        """Comprobar si el servicio está habilitado en la configuración"""
+        return xbmcaddon.Addon().getSetting('enable_detection_service') != 'false'
+
+    def _refresh(self, force_refresh):
+        """Detectar navegadores, publicarlos y reiniciar la vigilancia"""
+        detector = BrowserDetector()
+        start = time.perf_counter()
+        # Lo publicado es el resultado anterior del propio servicio: la revalidación
+        # debe pasar por la caché en disco, que comprueba las rutas con stat
+        browsers = detector.get_installed_browsers(force_refresh=force_refresh, use_published=False)
+        detector.publish_browsers(browsers)
+        BrowserDetector.service_heartbeat()
+        Utils.log(f"Servicio: {len(browsers)} navegadores publicados en "
+                  f"{(time.perf_counter() - start) * 1000:.1f} ms")
+
+        self._close_watcher()
+        if InotifyWatcher.is_available():
+            try:
+                self.watcher = InotifyWatcher()
+                for path in detector.get_watch_paths(browsers):
+                    self.watcher.add_watch(path)
+                Utils.log(f"Servicio: vigilando {len(self.watcher.watches)} rutas con inotify")
+            except OSError as e:
+                Utils.log(f"Servicio: inotify no disponible ({str(e)}), usando sondeo", xbmc.LOGWARNING)
+                self._close_watcher()
+
+    def _close_watcher(self):
+        """Cerrar la vigilancia actual"""
+        if self.watcher:
+            self.watcher.close()
+            self.watcher = None
+
+    def _idle_maintenance(self):
+        """Tareas de mantenimiento que no deben retrasar al plugin"""
+        try:
+            self._apply_retention()
+        except Exception as e:
+            Utils.log(f"Servicio: error podando historial: {str(e)}", xbmc.LOGWARNING)
+        try:
+            HistoryManager().compact_history()
+        except Exception as e:
+            Utils.log(f"Servicio: error compactando historial: {str(e)}", xbmc.LOGWARNING)
+        try:
+            # Construir el índice aquí evita que la primera búsqueda tenga que hacerlo
+            index = SearchIndex()
+            try:
+                index.ensure_built()
+            finally:
+                index.close()
+        except Exception as e:
+            Utils.log(f"Servicio: error construyendo índice de búsqueda: {str(e)}", xbmc.LOGWARNING)
+        if self.last_stats_check is None or time.monotonic() - self.last_stats_check >= self.STATS_CHECK_INTERVAL:
+            try:
+                HistoryManager().check_history_stats()
+                URLManager().get_statistics(verify=True)
+            except Exception as e:
+                Utils.log(f"Servicio: error verificando estadísticas: {str(e)}", xbmc.LOGWARNING)
+            try:
+                index = SearchIndex()
+                try:
+                    index.check()
+                finally:
+                    index.close()
+            except Exception as e:
+                Utils.log(f"Servicio: error verificando índice de búsqueda: {str(e)}", xbmc.LOGWARNING)
+            self.last_stats_check = time.monotonic()
+        self.last_compaction = time.monotonic()
+
+    def _apply_retention(self):
+        """Podar el historial por lotes, cediendo entre uno y otro"""
+        history_manager = HistoryManager()
+        removed = 0
+        while not self.abortRequested():
+            pruned = history_manager.apply_retention()
+            removed += pruned
+            if pruned < history_manager.RETENTION_BATCH:
+                break
+            # Cada lote es una transacción corta: el plugin puede escribir entre lotes
+            if self.waitForAbort(self.RETENTION_PAUSE):
+                break
+        if removed:
+            Utils.log(f"Servicio: {removed} entradas eliminadas del historial")
+
+    def _wait_for_change(self):
+        """Esperar un cambio relevante; devuelve None si Kodi se cierra"""
+        last_poll = time.monotonic()
+        last_heartbeat = 0
+
+        while not self.abortRequested():
+            now = time.monotonic()
+            if now - last_heartbeat >= self.HEARTBEAT_INTERVAL:
+                BrowserDetector.service_heartbeat()
+                last_heartbeat = now
+
+            if now - self.last_compaction >= self.COMPACT_INTERVAL:
+                self._idle_maintenance()
+
+            if self.settings_changed:
+                self.settings_changed = False
+                return True
+
+            # Datos retirados (p. ej. al limpiar la caché): volver a publicar
+            if not BrowserDetector.is_published():
+                return True
+
+            if self.watcher:
+                changed = self.watcher.read_events()
+                if changed:
+                    Utils.log(f"Servicio: cambios en {', '.join(sorted(changed))}")
+                    # Agrupar el resto de eventos de la misma instalación
+                    while not self.waitForAbort(self.DEBOUNCE_SECONDS):
+                        if not self.watcher.read_events():
+                            return True
+                    return None
+                if now - last_poll >= self.SAFETY_INTERVAL:
+                    return False
+            elif now - last_poll >= self.POLL_INTERVAL:
+                # Sin inotify, la caché en disco revalida con unas pocas llamadas a stat
+                return False
+
+            if self.waitForAbort(1):
+                return None
+
+        return None
+
+    def run(self):
+        """Bucle principal del servicio"""
+        Utils.log("Servicio de detección iniciado")
+        force_refresh = False
+
+        while not self.abortRequested():
+            if not self._is_enabled():
+                self._close_watcher()
+                BrowserDetector.clear_published()
+                # La retención del historial no depende de la detección
+                if time.monotonic() - self.last_compaction >= self.COMPACT_INTERVAL:
+                    self._idle_maintenance()
+                if self.waitForAbort(self.HEARTBEAT_INTERVAL):
+                    break
+                continue
+
+            self._refresh(force_refresh)
+
+            force_refresh = self._wait_for_change()
+            if force_refresh is None:
+                break
+
+        self._close_watcher()
+        BrowserDetector.clear_published()
+        Utils.log("Servicio de detección detenido")
+
+if __name__ == '__main__':
+    DetectionService().run()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import json
+
+def atomic_write_json(path, data, indent=None, sync=True):
+    """Escribir JSON sin dejar nunca el archivo truncado o a medias.
+
+    Se escribe en un temporal del mismo directorio, se sincroniza con el disco y se
+    sustituye al original con os.replace, que es atómico. Si algo falla antes del
+    reemplazo, el archivo anterior queda intacto. Con sync=False no se espera al
+    disco: para datos derivados que se pueden reconstruir si se pierden.
+    """
+    separators = None if indent else (',', ':')
+    temp_path = f"{path}.{os.getpid()}.tmp"
+
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False, separators=separators)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+    if sync:
+        fsync_directory(os.path.dirname(path))
+
+def append_lines(path, lines):
+    """Añadir líneas al final de un archivo con una única escritura sincronizada.
+
+    Devuelve el tamaño del archivo tras la escritura.
+    """
+    with open(path, 'a', encoding='utf-8') as f:
+        f.write(''.join(lines))
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+def fsync_directory(directory):
+    """Sincronizar la entrada de directorio tras un rename (solo POSIX)"""
+    if os.name != 'posix':
+        return
+    try:
+        fd = os.open(directory or '.', os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
@@ -0,0 +1,424 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Medir las operaciones del historial, las URLs y los marcadores a escala.
+
+Para cada tamaño se genera un perfil sintético con ese número de entradas de
+historial y de URLs guardadas, y marcadores de Chrome (Bookmarks en JSON) y de
+Firefox (places.sqlite) con ese número de marcadores. Cada operación se mide en
+un intérprete nuevo sobre los stubs de tools/kodi_stubs: la primera llamada
+corresponde a la primera invocación tras arrancar Kodi (sin caché en las
+propiedades de ventana) y las siguientes, a invocaciones posteriores.
+
+Uso:
+    python3 tools/benchmark.py [--sizes 1000,10000,100000,1000000] [--backend json|sqlite|both]
+                               [--repeat N] [--json] [--output resultados.json]
+                               [--baseline anterior.json [--tolerance 1.5]]
+
+Además se mide una vez la resolución en el PATH de los ejecutables de los
+navegadores de Linux: el índice en memoria frente a lanzar `which` para cada uno.
+
+Con --baseline termina con código 1 si alguna operación es más lenta que en la
+medición anterior por encima de la tolerancia.
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import sqlite3
+import argparse
+import platform
+import tempfile
+import statistics
+import multiprocessing
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.dirname(TOOLS_DIR)
+STUBS_DIR = os.path.join(TOOLS_DIR, 'kodi_stubs')
+
+DEFAULT_SIZES = '1000,10000,100000,1000000'
+BROWSERS = ('Chrome', 'Firefox', 'Edge', 'Opera')
+TOPICS = ('noticias', 'deportes', 'música', 'cine', 'recetas', 'viajes', 'tecnología', 'ciencia')
+# Consulta que coincide con una de cada len(TOPICS) entradas
+QUERY = 'noticias'
+# URLs de cada archivo importado con import_urls
+IMPORT_BATCH = 1000
+# Marcadores por carpeta en el archivo de Chrome
+CHROME_FOLDER_SIZE = 100
+# Diferencia de milisegundos por debajo de la cual no se considera regresión
+REGRESSION_MIN_MS = 1.0
+
+# (grupo, operación, depende del almacén del historial, solo una ejecución)
+OPERATIONS = [
+    ('history', 'add_to_history', True, False),
+    ('history', 'get_recent_history', True, False),
+    ('history', 'get_most_visited', True, False),
+    ('history', 'search_history', True, False),
+    ('history', 'get_history_stats', True, False),
+    ('urls', 'save_url', False, False),
+    ('urls', 'search_urls', False, False),
+    ('urls', 'import_urls', False, False),
+    ('bookmarks', 'import_chrome_bookmarks', False, False),
+    ('bookmarks', 'import_firefox_bookmarks', False, False),
+    ('search_index', 'build', True, True),
+    ('search_index', 'search', True, False),
+]
+
+
+def synthetic_entry(i, now):
+    """Entrada de historial número i (0 es la más reciente)"""
+    timestamp = now - i * 60
+    return {
+        'url': f"https://www.sitio{i}.example/{TOPICS[i % len(TOPICS)]}/{i}",
+        'title': f"Página {i} de {TOPICS[i % len(TOPICS)]}",
+        'browser': BROWSERS[i % len(BROWSERS)],
+        'timestamp': timestamp,
+        'date': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(timestamp)),
+        'access_count': 1 + (i * 7919) % 50
+    }
+
+
+def synthetic_bookmark(i):
+    """Marcador número i (nombre y URL)"""
+    topic = TOPICS[i % len(TOPICS)]
+    return f"Marcador {i} de {topic}", f"https://marcador{i}.example/{topic}"
+
+
+def write_chrome_fixture(path, size):
+    """Archivo Bookmarks de Chrome con carpetas de CHROME_FOLDER_SIZE marcadores"""
+    folders = []
+    for start in range(0, size, CHROME_FOLDER_SIZE):
+        children = []
+        for i in range(start, min(size, start + CHROME_FOLDER_SIZE)):
+            name, url = synthetic_bookmark(i)
+            children.append({'type': 'url', 'name': name, 'url': url, 'id': str(i)})
+        folders.append({'type': 'folder', 'name': f"Carpeta {start // CHROME_FOLDER_SIZE}", 'children': children})
+
+    # La mitad de las carpetas en la barra de marcadores y la otra mitad en "otros"
+    half = len(folders) // 2
+    data = {
+        'version': 1,
+        'roots': {
+            'bookmark_bar': {'type': 'folder', 'name': 'Barra de marcadores', 'children': folders[:half]},
+            'other': {'type': 'folder', 'name': 'Otros marcadores', 'children': folders[half:]}
+        }
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def write_firefox_fixture(path, size):
+    """places.sqlite con las tablas y columnas que consulta BookmarkManager"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute('CREATE TABLE moz_places (id INTEGER PRIMARY KEY, url TEXT, title TEXT)')
+        conn.execute('CREATE TABLE moz_bookmarks (id INTEGER PRIMARY KEY, type INTEGER, fk INTEGER, '
+                     'parent INTEGER, title TEXT)')
+        places = []
+        bookmarks = []
+        for i in range(size):
+            name, url = synthetic_bookmark(i)
+            places.append((i + 1, url, name))
+            bookmarks.append((i + 1, 1, i + 1, 2, name))
+        # Una consulta guardada y una carpeta, que la importación debe descartar
+        places.append((size + 1, 'place:sort=8', 'Más visitados'))
+        bookmarks.append((size + 1, 1, size + 1, 2, 'Más visitados'))
+        bookmarks.append((size + 2, 2, None, 1, 'Menú de marcadores'))
+        conn.executemany('INSERT INTO moz_places VALUES (?, ?, ?)', places)
+        conn.executemany('INSERT INTO moz_bookmarks VALUES (?, ?, ?, ?, ?)', bookmarks)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def setup_environment(spec):
+    """Preparar los stubs y el perfil en el proceso hijo antes de importar el addon"""
+    os.environ['KODI_STUB_PROFILE'] = spec['profile']
+    os.environ['KODI_STUB_SETTINGS'] = json.dumps({
+        'enable_history': 'true',
+        'history_backend': '1' if spec['backend'] == 'sqlite' else '0',
+        'max_history_entries': str(spec['size']),
+        'auto_cleanup_history': 'false'
+    })
+    os.environ['HOME'] = spec['home']
+    os.environ.pop('KODI_STUB_WINDOW_DIR', None)
+    for path in (STUBS_DIR, ADDON_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def seed_profile(spec):
+    """Generar el historial y las URLs del perfil; devuelve lo que ha tardado cada parte"""
+    setup_environment(spec)
+    from frecency import Frecency
+    from history_store import entry_id
+    from url_manager import URLManager
+    from history_manager import HistoryManager
+
+    timings = {}
+    now = time.time()
+    start = time.perf_counter()
+    entries = []
+    for i in range(spec['size']):
+        entry = synthetic_entry(i, now)
+        entry['id'] = entry_id(entry['url'])
+        entry['frecency'] = Frecency.estimate(entry['access_count'], entry['timestamp'])
+        entries.append(entry)
+    if not HistoryManager().save_history(entries):
+        raise RuntimeError("No se pudo generar el historial")
+    timings['seed_history'] = (time.perf_counter() - start) * 1000
+    del entries
+
+    start = time.perf_counter()
+    items = []
+    for i in range(spec['size']):
+        topic = TOPICS[i % len(TOPICS)]
+        items.append({'name': f"Sitio {i} de {topic}", 'url': f"https://guardada{i}.example/{topic}",
+                      'description': f"URL guardada número {i}"})
+    URLManager().save_urls_bulk(items, skip_duplicate_urls=False)
+    timings['seed_urls'] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def prepare_operation(operation, spec):
+    """Crear la función que ejecuta una vez la operación (sin contar su preparación)"""
+    from url_manager import URLManager
+    from history_manager import HistoryManager
+    from bookmark_manager import BookmarkManager
+    from search_index import SearchIndex
+
+    counter = iter(range(10 ** 9))
+
+    if operation == 'add_to_history':
+        return lambda: HistoryManager().add_to_history(f"https://nueva{next(counter)}.example/")
+    if operation == 'get_recent_history':
+        return lambda: HistoryManager().get_recent_history(20)
+    if operation == 'get_most_visited':
+        return lambda: HistoryManager().get_most_visited(10)
+    if operation == 'search_history':
+        return lambda: HistoryManager().search_history(QUERY)
+    if operation == 'get_history_stats':
+        return lambda: HistoryManager().get_history_stats()
+    if operation == 'save_url':
+        def save_url():
+            number = next(counter)
+            return URLManager().save_url(f"Nueva {number}", f"https://nueva{number}.example/")
+        return save_url
+    if operation == 'search_urls':
+        return lambda: URLManager().search_urls(QUERY)
+    if operation == 'import_urls':
+        # Un archivo distinto por ejecución, para que ninguna importación se quede en nada
+        paths = []
+        for run in range(spec['repeat']):
+            path = os.path.join(spec['work_dir'], f"import-{os.getpid()}-{run}.json")
+            urls = [{'id': f"import-{run}-{i}", 'name': f"Importada {run}-{i}",
+                     'url': f"https://importada{run}-{i}.example/", 'description': '',
+                     'created_date': '2024-01-01T00:00:00', 'access_count': 0, 'last_accessed': None}
+                    for i in range(IMPORT_BATCH)]
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({'export_date': '2024-01-01T00:00:00', 'urls': urls}, f)
+            paths.append(path)
+        files = iter(paths)
+        return lambda: URLManager().import_urls(next(files), merge=True)
+    if operation == 'import_chrome_bookmarks':
+        return lambda: BookmarkManager().import_chrome_bookmarks()
+    if operation == 'import_firefox_bookmarks':
+        return lambda: BookmarkManager().import_firefox_bookmarks()
+
+    def with_index(method):
+        index = SearchIndex()
+        try:
+            return method(index)
+        finally:
+            index.close()
+
+    if operation == 'build':
+        return lambda: with_index(lambda index: index.rebuild())
+    if operation == 'search':
+        with_index(lambda index: index.ensure_built())
+        return lambda: with_index(lambda index: index.search(QUERY))
+    raise ValueError(f"Operación desconocida: {operation}")
+
+
+def run_operation(spec):
+    """Medir una operación en este proceso; devuelve los tiempos en milisegundos"""
+    setup_environment(spec)
+    call = prepare_operation(spec['operation'], spec)
+
+    timings = []
+    result = None
+    for _ in range(1 if spec['once'] else spec['repeat']):
+        start = time.perf_counter()
+        result = call()
+        timings.append((time.perf_counter() - start) * 1000)
+
+    # Tamaño del resultado, para comprobar que la operación ha hecho algo
+    if isinstance(result, (list, dict)):
+        result = len(result)
+    elif not isinstance(result, (bool, int)):
+        result = None
+    return {'timings': timings, 'result': result}
+
+
+def measure_path_resolution(spec):
+    """Resolver los ejecutables de los navegadores de Linux con PathIndex y con `which`"""
+    setup_environment(spec)
+    from path_index import PathIndex
+    from browser_detector import BrowserDetector
+
+    executables = [browser['executable'] for browser in BrowserDetector().browsers_config.get('linux', [])]
+    path_index = PathIndex()
+    found = sum(1 for executable in executables if path_index.find(executable))
+    timings = {name: round(value, 2) if isinstance(value, float) else value
+               for name, value in path_index.get_timings().items()}
+    return dict(timings, executables=len(executables), found=found,
+                which_ms=round(PathIndex.time_which_lookups(executables), 2))
+
+
+def in_new_process(function, spec):
+    """Ejecutar una función en un intérprete nuevo y devolver su resultado"""
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(function, (spec,))
+
+
+def summarize(timings):
+    """Primera llamada y estadísticas de las siguientes"""
+    warm = timings[1:] or timings
+    return {
+        'runs': len(timings),
+        'first_ms': round(timings[0], 2),
+        'median_ms': round(statistics.median(warm), 2),
+        'min_ms': round(min(warm), 2),
+        'max_ms': round(max(warm), 2)
+    }
+
+
+def benchmark_size(size, backends, repeat, work_dir, progress):
+    """Generar los perfiles de un tamaño y medir todas las operaciones"""
+    size_dir = os.path.join(work_dir, str(size))
+    home = os.path.join(size_dir, 'home')
+    write_chrome_fixture(os.path.join(home, '.config', 'google-chrome', 'Default', 'Bookmarks'), size)
+    write_firefox_fixture(os.path.join(home, '.mozilla', 'firefox', 'benchmark.default-release',
+                                       'places.sqlite'), size)
+
+    results = []
+    for number, backend in enumerate(backends):
+        spec = {'size': size, 'backend': backend, 'home': home, 'work_dir': size_dir,
+                'profile': os.path.join(size_dir, f"profile-{backend}"), 'repeat': repeat}
+        progress(f"{size}: generando perfil ({backend})")
+        for operation, elapsed in in_new_process(seed_profile, spec).items():
+            results.append({'size': size, 'group': 'setup', 'operation': operation, 'backend': backend,
+                            'runs': 1, 'first_ms': round(elapsed, 2), 'median_ms': round(elapsed, 2),
+                            'min_ms': round(elapsed, 2), 'max_ms': round(elapsed, 2), 'result': None})
+
+        for group, operation, per_backend, once in OPERATIONS:
+            # Las operaciones de URLs y marcadores no dependen del almacén: se miden una vez
+            if not per_backend and number > 0:
+                continue
+            progress(f"{size}: {group}.{operation}" + (f" ({backend})" if per_backend else ''))
+            measured = in_new_process(run_operation, dict(spec, group=group, operation=operation, once=once))
+            results.append(dict({'size': size, 'group': group, 'operation': operation,
+                                 'backend': backend if per_backend else None},
+                                **summarize(measured['timings']), result=measured['result']))
+
+    shutil.rmtree(size_dir, ignore_errors=True)
+    return results
+
+
+def result_key(result):
+    """Clave para emparejar una medición con la de otra ejecución"""
+    return (result['size'], result['group'], result['operation'], result['backend'])
+
+
+def compare(results, baseline_path, tolerance):
+    """Marcar las operaciones más lentas que en la medición de referencia"""
+    with open(baseline_path, 'r', encoding='utf-8') as f:
+        baseline = {result_key(r): r for r in json.load(f).get('results', [])}
+
+    regressions = []
+    for result in results:
+        previous = baseline.get(result_key(result))
+        # La generación del perfil se mide una sola vez: es orientativa
+        if previous is None or result['group'] == 'setup':
+            continue
+        result['baseline_median_ms'] = previous['median_ms']
+        if (result['median_ms'] > previous['median_ms'] * tolerance
+                and result['median_ms'] - previous['median_ms'] >= REGRESSION_MIN_MS):
+            result['regression'] = True
+            regressions.append(result)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f"tamaños separados por comas ({DEFAULT_SIZES})")
+    parser.add_argument('--backend', choices=('json', 'sqlite', 'both'), default='both',
+                        help='almacén del historial')
+    parser.add_argument('--repeat', type=int, default=5, help='ejecuciones por operación')
+    parser.add_argument('--json', action='store_true', help='emitir resultados en JSON')
+    parser.add_argument('--output', help='guardar también los resultados JSON en este archivo')
+    parser.add_argument('--baseline', help='resultados JSON anteriores con los que comparar')
+    parser.add_argument('--tolerance', type=float, default=1.5,
+                        help='factor sobre la mediana anterior a partir del cual hay regresión')
+    args = parser.parse_args()
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    backends = ['json', 'sqlite'] if args.backend == 'both' else [args.backend]
+    repeat = max(2, args.repeat)
+
+    def progress(message):
+        print(message, file=sys.stderr, flush=True)
+
+    work_dir = tempfile.mkdtemp(prefix='abridor-benchmark-')
+    results = []
+    try:
+        progress("Resolución en el PATH")
+        path_resolution = in_new_process(measure_path_resolution, {
+            'size': 0, 'backend': 'json', 'home': os.path.join(work_dir, 'home'),
+            'profile': os.path.join(work_dir, 'profile-path')})
+        for size in sizes:
+            results.extend(benchmark_size(size, backends, repeat, work_dir, progress))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    regressions = compare(results, args.baseline, args.tolerance) if args.baseline else []
+
+    report = {
+        'date': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'sizes': sizes,
+        'repeat': repeat,
+        'path_resolution': path_resolution,
+        'results': results
+    }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2, ensure_ascii=False)
+        sys.stdout.write('\n')
+    else:
+        print(f"{'tamaño':>8}  {'operación':<40}{'primera ms':>12}{'mediana ms':>12}{'resultado':>11}")
+        for r in results:
+            name = f"{r['group']}.{r['operation']}" + (f" ({r['backend']})" if r['backend'] else '')
+            mark = ' !' if r.get('regression') else ''
+            result = '-' if r['result'] is None else str(r['result'])
+            print(f"{r['size']:>8}  {name:<40}{r['first_ms']:>12}{r['median_ms']:>12}{result:>11}{mark}")
+        print(f"Resolución en el PATH de {path_resolution['executables']} ejecutables "
+              f"({path_resolution['found']} encontrados): índice {path_resolution['total_ms']} ms "
+              f"(construcción {path_resolution['build_ms']} ms, consultas {path_resolution['lookup_ms']} ms), "
+              f"which {path_resolution['which_ms']} ms")
+        if regressions:
+            print(f"{len(regressions)} operaciones más lentas que en {args.baseline}")
+
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Medir el arranque en frío de cada ruta del plugin fuera de Kodi.
+
+Cada ruta se ejecuta como lo haría Kodi sin reuselanguageinvoker: un
+intérprete nuevo que ejecuta default.py con los argumentos del plugin. Se
+usan los stubs de tools/kodi_stubs y `-X importtime` para saber qué módulos
+carga cada ruta y cuánto cuestan.
+
+Uso:
+    python3 tools/coldstart.py [--runs N] [--json] [--budget tools/coldstart_budget.json]
+
+Termina con código 1 si alguna ruta supera su presupuesto en milisegundos.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+import statistics
+import subprocess
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.dirname(TOOLS_DIR)
+STUBS_DIR = os.path.join(TOOLS_DIR, 'kodi_stubs')
+PLUGIN_URL = 'plugin://plugin.navegador.kodi/'
+
+# Rutas sin efectos externos (no lanzan navegadores)
+ROUTES = [
+    '',
+    'action=manage_urls',
+    'action=manage_history',
+    'action=recent_history',
+    'action=most_visited',
+    'action=manage_bookmarks',
+    'action=import_bookmarks',
+    'action=custom_url',
+    'action=clear_cache',
+]
+
+LAUNCHER = (
+    "import sys\n"
+    "sys.argv = sys.argv[1:]\n"
+    "sys.path.insert(0, {addon_dir!r})\n"
+    "path = {script!r}\n"
+    "with open(path, 'rb') as f:\n"
+    "    code = compile(f.read(), path, 'exec')\n"
+    "exec(code, {{'__name__': '__main__', '__file__': path}})\n"
+).format(addon_dir=ADDON_DIR, script=os.path.join(ADDON_DIR, 'default.py'))
+
+IMPORTTIME_LINE = re.compile(r'^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)')
+ADDON_MODULES = {os.path.splitext(name)[0] for name in os.listdir(ADDON_DIR) if name.endswith('.py')}
+
+
+def run_route(route, profile_dir):
+    """Ejecutar una ruta en un intérprete nuevo; devuelve (ms, módulos importados)"""
+    env = dict(os.environ)
+    env['PYTHONPATH'] = STUBS_DIR
+    env['KODI_STUB_PROFILE'] = profile_dir
+    env.pop('KODI_STUB_LOG', None)
+
+    # Kodi pasa (url del plugin, handle, consulta) como sys.argv del script
+    command = [sys.executable, '-X', 'importtime', '-c', LAUNCHER, PLUGIN_URL, '1', '?' + route]
+
+    start = time.perf_counter()
+    result = subprocess.run(command, cwd=ADDON_DIR, env=env, capture_output=True, text=True)
+    elapsed_ms = (time.perf_counter() - start) * 1000
+
+    imports = {}
+    errors = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports[module] = {'self_us': int(self_us), 'cumulative_us': int(cumulative_us),
+                               'top_level': len(indent) <= 1}
+        elif line.strip() and not line.startswith('import time:'):
+            errors.append(line)
+
+    if result.returncode != 0:
+        raise RuntimeError(f"La ruta '{route}' falló:\n" + '\n'.join(errors[-20:]))
+
+    return elapsed_ms, imports
+
+
+def measure_baseline(runs):
+    """Coste de arrancar el intérprete sin hacer nada"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'pass'], check=True)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def load_budget(path):
+    """Leer presupuestos por ruta (ms)"""
+    if not path or not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='ejecuciones por ruta (se usa la mediana)')
+    parser.add_argument('--json', action='store_true', help='emitir resultados en JSON')
+    parser.add_argument('--budget', default=os.path.join(TOOLS_DIR, 'coldstart_budget.json'),
+                        help='archivo JSON con presupuestos por ruta')
+    parser.add_argument('--route', action='append', help='medir solo estas rutas (p. ej. action=manage_urls)')
+    args = parser.parse_args()
+
+    budget = load_budget(args.budget)
+    default_budget = budget.get('default_ms')
+    route_budgets = budget.get('routes', {})
+
+    baseline_ms = measure_baseline(args.runs)
+    work_dir = tempfile.mkdtemp(prefix='abridor-coldstart-')
+    results = []
+    failed = False
+
+    try:
+        for route in args.route or ROUTES:
+            profile_dir = os.path.join(work_dir, route.replace('=', '_') or 'root')
+            timings = []
+            imports = {}
+            for _ in range(args.runs):
+                elapsed_ms, imports = run_route(route, profile_dir)
+                timings.append(elapsed_ms)
+
+            median_ms = statistics.median(timings)
+            limit = route_budgets.get(route or 'root', default_budget)
+            over_budget = limit is not None and median_ms > limit
+            failed = failed or over_budget
+
+            import_us = sum(info['self_us'] for info in imports.values())
+            results.append({
+                'route': route or 'root',
+                'median_ms': round(median_ms, 1),
+                'over_interpreter_ms': round(median_ms - baseline_ms, 1),
+                'import_ms': round(import_us / 1000, 1),
+                'addon_modules': sorted(m for m in imports if m in ADDON_MODULES),
+                'sqlite3_loaded': 'sqlite3' in imports,
+                'budget_ms': limit,
+                'over_budget': over_budget
+            })
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    if args.json:
+        json.dump({'interpreter_ms': round(baseline_ms, 1), 'runs': args.runs, 'routes': results},
+                  sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        print(f"Arranque del intérprete: {baseline_ms:.1f} ms (mediana de {args.runs})")
+        print(f"{'ruta':<26}{'total ms':>10}{'extra ms':>10}{'import ms':>11}{'presup.':>9}  módulos del addon")
+        for r in results:
+            mark = ' !' if r['over_budget'] else ''
+            budget_text = '-' if r['budget_ms'] is None else str(r['budget_ms'])
+            print(f"{r['route']:<26}{r['median_ms']:>10}{r['over_interpreter_ms']:>10}"
+                  f"{r['import_ms']:>11}{budget_text:>9}{mark}  {', '.join(r['addon_modules'])}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
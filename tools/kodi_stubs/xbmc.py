@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+"""Stub mínimo del módulo xbmc para ejecutar el addon fuera de Kodi"""
+
+import os
+import sys
+import time
+
+LOGDEBUG = 0
+LOGINFO = 1
+LOGWARNING = 2
+LOGERROR = 3
+LOGFATAL = 4
+
+_LEVEL_NAMES = {LOGDEBUG: 'DEBUG', LOGINFO: 'INFO', LOGWARNING: 'WARNING', LOGERROR: 'ERROR', LOGFATAL: 'FATAL'}
+
+
+def log(msg, level=LOGDEBUG):
+    """Escribir en stderr solo si KODI_STUB_LOG está definido"""
+    if os.environ.get('KODI_STUB_LOG'):
+        sys.stderr.write(f"{_LEVEL_NAMES.get(level, level)}: {msg}\n")
+
+
+def translatePath(path):
+    return path
+
+
+def executebuiltin(command, wait=False):
+    log(f"executebuiltin: {command}")
+
+
+def getInfoLabel(label):
+    if label == 'System.BuildVersion':
+        return '21.0 (stub)'
+    return ''
+
+
+def getLanguage(format=0, region=False):
+    return 'English'
+
+
+def playSFX(filename, useCached=True):
+    pass
+
+
+def sleep(milliseconds):
+    time.sleep(milliseconds / 1000.0)
+
+
+class Monitor:
+    """Monitor que nunca recibe petición de cierre"""
+
+    def abortRequested(self):
+        return False
+
+    def waitForAbort(self, timeout=0):
+        time.sleep(timeout or 0)
+        return False
+
+    def onSettingsChanged(self):
+        pass
+
+
+class Keyboard:
+    """Teclado no interactivo: siempre cancelado"""
+
+    def __init__(self, default='', heading='', hidden=False):
+        self._text = default
+
+    def doModal(self, autoclose=0):
+        pass
+
+    def isConfirmed(self):
+        return False
+
+    def getText(self):
+        return self._text
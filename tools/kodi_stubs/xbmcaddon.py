@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""Stub del módulo xbmcaddon.
+
+La ruta del addon es la raíz del repositorio y el perfil se toma de
+KODI_STUB_PROFILE. Los valores por defecto de la configuración se leen de
+resources/settings.xml y se pueden sobrescribir con KODI_STUB_SETTINGS (JSON).
+"""
+
+import os
+import re
+import json
+
+ADDON_PATH = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_defaults = None
+_overrides = {}
+
+
+def _load_defaults():
+    global _defaults
+    if _defaults is None:
+        _defaults = {}
+        # Expresión regular en lugar de xml.etree para no inflar las medidas de arranque
+        try:
+            with open(os.path.join(ADDON_PATH, 'resources', 'settings.xml'), 'r', encoding='utf-8') as f:
+                for tag in re.findall(r'<setting\b[^>]*>', f.read()):
+                    setting_id = re.search(r'\bid="([^"]*)"', tag)
+                    default = re.search(r'\bdefault="([^"]*)"', tag)
+                    if setting_id:
+                        _defaults[setting_id.group(1)] = default.group(1) if default else ''
+        except OSError:
+            pass
+        try:
+            _defaults.update({k: str(v).lower() if isinstance(v, bool) else str(v)
+                              for k, v in json.loads(os.environ.get('KODI_STUB_SETTINGS', '{}')).items()})
+        except ValueError:
+            pass
+    return _defaults
+
+
+class Addon:
+    def __init__(self, id=None):
+        pass
+
+    def getAddonInfo(self, key):
+        profile = os.environ.get('KODI_STUB_PROFILE')
+        if not profile:
+            import tempfile
+            profile = os.path.join(tempfile.gettempdir(), 'abridor-kodi-stub', 'profile')
+        return {
+            'id': 'plugin.navegador.kodi',
+            'name': 'Abridor Web',
+            'version': '1.1.2',
+            'path': ADDON_PATH,
+            'profile': profile + os.sep
+        }.get(key, '')
+
+    def getSetting(self, key):
+        if key in _overrides:
+            return _overrides[key]
+        return _load_defaults().get(key, '')
+
+    def getSettingBool(self, key):
+        return self.getSetting(key) == 'true'
+
+    def getSettingInt(self, key):
+        try:
+            return int(self.getSetting(key))
+        except ValueError:
+            return 0
+
+    def getSettingString(self, key):
+        return self.getSetting(key)
+
+    def setSetting(self, key, value):
+        _overrides[key] = str(value)
+
+    def getLocalizedString(self, string_id):
+        return f"#{string_id}"
@@ -0,0 +1,120 @@
+# -*- coding: utf-8 -*-
+"""Stub del módulo xbmcgui.
+
+Los diálogos no son interactivos y siempre se cancelan. Las propiedades de
+ventana viven en memoria del proceso, salvo que KODI_STUB_WINDOW_DIR indique
+un directorio: entonces se guardan en archivos y se comparten entre procesos,
+como ocurre entre invocaciones dentro de una misma sesión de Kodi.
+"""
+
+import os
+
+NOTIFICATION_INFO = 'info'
+NOTIFICATION_WARNING = 'warning'
+NOTIFICATION_ERROR = 'error'
+
+_properties = {}
+
+
+def _property_file(window_id, key):
+    import hashlib
+    name = hashlib.sha1(f"{window_id}:{key}".encode('utf-8')).hexdigest()
+    return os.path.join(os.environ['KODI_STUB_WINDOW_DIR'], name)
+
+
+class Window:
+    def __init__(self, windowId=0):
+        self.window_id = windowId
+
+    def getProperty(self, key):
+        if os.environ.get('KODI_STUB_WINDOW_DIR'):
+            try:
+                with open(_property_file(self.window_id, key), 'r', encoding='utf-8') as f:
+                    return f.read()
+            except OSError:
+                return ''
+        return _properties.get((self.window_id, key), '')
+
+    def setProperty(self, key, value):
+        if os.environ.get('KODI_STUB_WINDOW_DIR'):
+            path = _property_file(self.window_id, key)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                f.write(value)
+            os.replace(temp_path, path)
+        else:
+            _properties[(self.window_id, key)] = value
+
+    def clearProperty(self, key):
+        if os.environ.get('KODI_STUB_WINDOW_DIR'):
+            try:
+                os.remove(_property_file(self.window_id, key))
+            except OSError:
+                pass
+        else:
+            _properties.pop((self.window_id, key), None)
+
+
+class ListItem:
+    def __init__(self, label='', label2='', path='', offscreen=False):
+        self.label = label
+        self.path = path
+        self.info = {}
+        self.art = {}
+        self.properties = {}
+        self.context_menu = []
+
+    def getLabel(self):
+        return self.label
+
+    def setLabel(self, label):
+        self.label = label
+
+    def setInfo(self, type, infoLabels):
+        self.info.update(infoLabels)
+
+    def setArt(self, values):
+        self.art.update(values)
+
+    def setProperty(self, key, value):
+        self.properties[key] = value
+
+    def addContextMenuItems(self, items, replaceItems=False):
+        self.context_menu.extend(items)
+
+
+class Dialog:
+    def notification(self, heading, message, icon=NOTIFICATION_INFO, time=5000, sound=True):
+        pass
+
+    def ok(self, heading, message):
+        return True
+
+    def yesno(self, heading, message, *args, **kwargs):
+        return False
+
+    def select(self, heading, options, *args, **kwargs):
+        return -1
+
+    def multiselect(self, heading, options, *args, **kwargs):
+        return None
+
+    def input(self, heading, defaultt='', *args, **kwargs):
+        return ''
+
+    def numeric(self, type, heading, defaultt='', *args, **kwargs):
+        return defaultt
+
+
+class DialogProgress:
+    def create(self, heading, message=''):
+        pass
+
+    def update(self, percent, message=''):
+        pass
+
+    def iscanceled(self):
+        return False
+
+    def close(self):
+        pass
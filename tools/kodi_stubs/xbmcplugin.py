@@ -0,0 +1,30 @@
+# -*- coding: utf-8 -*-
+"""Stub del módulo xbmcplugin: registra los elementos añadidos al directorio"""
+
+directory_items = []
+
+
+def setPluginCategory(handle, category):
+    pass
+
+
+def setContent(handle, content):
+    pass
+
+
+def setPluginFanart(handle, image=None, color1=None, color2=None, color3=None):
+    pass
+
+
+def addDirectoryItem(handle, url, listitem, isFolder=False, totalItems=0):
+    directory_items.append((url, listitem, isFolder))
+    return True
+
+
+def addDirectoryItems(handle, items, totalItems=0):
+    directory_items.extend(items)
+    return True
+
+
+def endOfDirectory(handle, succeeded=True, updateListing=False, cacheToDisc=True):
+    pass
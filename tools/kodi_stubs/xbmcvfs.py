@@ -0,0 +1,17 @@
+# -*- coding: utf-8 -*-
+"""Stub mínimo del módulo xbmcvfs"""
+
+import os
+
+
+def translatePath(path):
+    return path
+
+
+def exists(path):
+    return os.path.exists(path)
+
+
+def mkdirs(path):
+    os.makedirs(path, exist_ok=True)
+    return True
@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""Someter URLManager e HistoryManager a varios procesos concurrentes.
+
+Cada trabajador es un intérprete nuevo, como una invocación del plugin o el
+servicio, y todos comparten el mismo directorio de perfil y las propiedades de
+ventana (KODI_STUB_WINDOW_DIR), que es donde se guardan las marcas de la
+caché. Los trabajadores lanzan una mezcla configurable de visitas
+(add_to_history), URLs nuevas (save_url), accesos (increment_access_count) y
+lecturas. Al terminar se comprueba el perfil: actualizaciones perdidas,
+archivos ilegibles o duplicados y agregados que no cuadran.
+
+Uso:
+    python3 tools/stress.py [--workers N] [--ops N] [--mix visit=40,save=10,access=25,read=25]
+                            [--backend json|sqlite] [--json] [--keep]
+
+Termina con código 1 si se pierde alguna actualización o el perfil queda dañado.
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import queue
+import multiprocessing
+from collections import Counter
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+ADDON_DIR = os.path.dirname(TOOLS_DIR)
+STUBS_DIR = os.path.join(TOOLS_DIR, 'kodi_stubs')
+
+OPERATIONS = ('visit', 'save', 'access', 'read')
+DEFAULT_MIX = 'visit=40,save=10,access=25,read=25'
+
+# URLs guardadas antes de empezar, para que los accesos tengan destino desde el principio
+SEED_URLS = 20
+
+
+def parse_mix(text):
+    """Convertir 'visit=40,save=10,...' en pesos por operación"""
+    weights = dict.fromkeys(OPERATIONS, 0)
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in weights:
+            raise argparse.ArgumentTypeError(f"Operación desconocida: {name}")
+        weights[name] = int(weight)
+    if not any(weights.values()):
+        raise argparse.ArgumentTypeError("La mezcla no tiene ninguna operación")
+    return weights
+
+
+def setup_environment(profile_dir, window_dir, backend, max_history):
+    """Preparar los stubs para este proceso y los trabajadores que lance"""
+    os.environ['KODI_STUB_PROFILE'] = profile_dir
+    os.environ['KODI_STUB_WINDOW_DIR'] = window_dir
+    os.environ['KODI_STUB_SETTINGS'] = json.dumps({
+        'enable_history': 'true',
+        'history_backend': '1' if backend == 'sqlite' else '0',
+        'max_history_entries': str(max_history),
+        'auto_cleanup_history': 'false'
+    })
+    for path in (STUBS_DIR, ADDON_DIR):
+        if path not in sys.path:
+            sys.path.insert(0, path)
+
+
+def worker(number, args, start_event, results):
+    """Ejecutar las operaciones de un trabajador y enviar lo que ha hecho"""
+    from url_manager import URLManager
+    from history_manager import HistoryManager
+    import locking
+
+    url_manager = URLManager()
+    history_manager = HistoryManager()
+    rng = random.Random(args.seed * 1000 + number)
+    names = list(args.mix)
+    weights = [args.mix[name] for name in names]
+    seed_ids = [url['id'] for url in url_manager.get_saved_urls()]
+
+    latencies = {name: [] for name in OPERATIONS}
+    visits = Counter()
+    accesses = Counter()
+    saved = []
+    errors = Counter()
+    failures = Counter()
+
+    start_event.wait()
+    for i in range(args.ops):
+        operation = rng.choices(names, weights)[0]
+        start = time.perf_counter()
+        try:
+            if operation == 'visit':
+                url = f"http://sitio{rng.randrange(args.url_pool)}.example/"
+                history_manager.add_to_history(url, browser_name=f"navegador{number % 3}")
+                visits[url] += 1
+            elif operation == 'save':
+                name = f"w{number}-{i}"
+                if url_manager.save_url(name, f"http://w{number}.example/{i}"):
+                    saved.append(name)
+                else:
+                    failures['save'] += 1
+            elif operation == 'access':
+                url_id = rng.choice(seed_ids)
+                if url_manager.increment_access_count(url_id):
+                    accesses[url_id] += 1
+                else:
+                    failures['access'] += 1
+            else:
+                read = i % 4
+                if read == 0:
+                    history_manager.get_recent_history(20)
+                elif read == 1:
+                    url_manager.get_saved_urls(limit=50)
+                elif read == 2:
+                    history_manager.get_history_stats()
+                else:
+                    url_manager.search_urls('example')
+        except Exception as e:
+            errors[f"{operation}: {type(e).__name__}: {e}"] += 1
+        latencies[operation].append((time.perf_counter() - start) * 1000)
+
+    results.put({
+        'worker': number,
+        'latencies': latencies,
+        'visits': dict(visits),
+        'accesses': dict(accesses),
+        'saved': saved,
+        'errors': dict(errors),
+        'failures': dict(failures),
+        'lock': locking.lock_stats()
+    })
+
+
+def collect_reports(processes, results):
+    """Recoger los informes; un trabajador que muere sin informe no bloquea la espera"""
+    reports = []
+    while len(reports) < len(processes):
+        try:
+            reports.append(results.get(timeout=1.0))
+        except queue.Empty:
+            if not any(process.is_alive() for process in processes):
+                break
+    return reports
+
+
+def percentile(values, fraction):
+    """Percentil por el método del rango más cercano"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def latency_summary(values):
+    """Percentiles de latencia en milisegundos"""
+    summary = {'count': len(values)}
+    for label, fraction in (('p50_ms', 0.5), ('p90_ms', 0.9), ('p99_ms', 0.99)):
+        value = percentile(values, fraction)
+        summary[label] = None if value is None else round(value, 2)
+    summary['max_ms'] = round(max(values), 2) if values else None
+    return summary
+
+
+def check_files(profile_dir, backend):
+    """Comprobar que los archivos del perfil se pueden leer; devuelve los problemas"""
+    problems = []
+    json_files = ['saved_urls.json']
+    if backend == 'json':
+        json_files.append('history.json')
+    for name in json_files:
+        path = os.path.join(profile_dir, name)
+        if not os.path.exists(path):
+            continue
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                json.load(f)
+        except ValueError as e:
+            problems.append(f"{name} ilegible: {e}")
+
+    journal = os.path.join(profile_dir, 'history.journal')
+    if backend == 'json' and os.path.exists(journal):
+        with open(journal, 'r', encoding='utf-8') as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    json.loads(line)
+                except ValueError:
+                    problems.append(f"history.journal: línea {number} ilegible")
+
+    if backend == 'sqlite':
+        import sqlite3
+        conn = sqlite3.connect(os.path.join(profile_dir, 'history.db'))
+        try:
+            result = conn.execute('PRAGMA integrity_check').fetchone()[0]
+        finally:
+            conn.close()
+        if result != 'ok':
+            problems.append(f"history.db: {result}")
+
+    leftovers = [name for name in os.listdir(profile_dir) if name.endswith('.tmp')]
+    if leftovers:
+        problems.append(f"Temporales sin eliminar: {', '.join(sorted(leftovers))}")
+    return problems
+
+
+def verify_profile(profile_dir, args, reports):
+    """Comparar el perfil final con lo que los trabajadores dicen haber hecho"""
+    from url_manager import URLManager
+    from history_manager import HistoryManager
+
+    corruption = check_files(profile_dir, args.backend)
+
+    expected_visits = Counter()
+    expected_accesses = Counter()
+    saved = set()
+    for report in reports:
+        expected_visits.update(report['visits'])
+        expected_accesses.update(report['accesses'])
+        saved.update(report['saved'])
+
+    history_manager = HistoryManager()
+    history = history_manager.load_history()
+    urls = URLManager().get_saved_urls()
+
+    history_urls = Counter(entry['url'] for entry in history)
+    duplicated = [url for url, count in history_urls.items() if count > 1]
+    if duplicated:
+        corruption.append(f"URLs repetidas en el historial: {len(duplicated)}")
+    url_ids = Counter(url['id'] for url in urls)
+    if any(count > 1 for count in url_ids.values()):
+        corruption.append("IDs repetidos en las URLs guardadas")
+
+    lost = {'visits': 0, 'saves': 0, 'accesses': 0}
+    extra = {'visits': 0, 'accesses': 0}
+
+    # Con más URLs distintas que el límite del historial las expulsiones son legítimas
+    check_visits = args.url_pool <= args.max_history
+    if check_visits:
+        counts = {entry['url']: entry.get('access_count', 1) for entry in history}
+        for url, expected in expected_visits.items():
+            actual = counts.get(url, 0)
+            lost['visits'] += max(0, expected - actual)
+            extra['visits'] += max(0, actual - expected)
+
+    names = {url['name'] for url in urls}
+    lost['saves'] = len(saved - names)
+
+    access_counts = {url['id']: url.get('access_count', 0) for url in urls}
+    for url_id, expected in expected_accesses.items():
+        actual = access_counts.get(url_id, 0)
+        lost['accesses'] += max(0, expected - actual)
+        extra['accesses'] += max(0, actual - expected)
+
+    # Agregados incrementales frente a recálculo desde cero
+    stats = history_manager.get_history_stats()
+    if stats['total_entries'] != len(history):
+        corruption.append(f"total_entries={stats['total_entries']} con {len(history)} entradas")
+    if not history_manager.check_history_stats():
+        corruption.append("Estadísticas del historial inconsistentes")
+    url_stats = URLManager().get_statistics()
+    total_accesses = sum(access_counts.values())
+    if url_stats['total_accesses'] != total_accesses or url_stats['total_urls'] != len(urls):
+        corruption.append("Estadísticas de URLs inconsistentes")
+
+    return {
+        'history_entries': len(history),
+        'saved_urls': len(urls),
+        'visits_checked': check_visits,
+        'lost_updates': lost,
+        'unexpected_updates': extra,
+        'corruption': corruption
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--workers', type=int, default=8, help='procesos concurrentes')
+    parser.add_argument('--ops', type=int, default=200, help='operaciones por trabajador')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help=f"pesos por operación (por defecto {DEFAULT_MIX})")
+    parser.add_argument('--backend', choices=('json', 'sqlite'), default='json', help='almacén del historial')
+    parser.add_argument('--url-pool', type=int, default=200, help='URLs distintas que se visitan')
+    parser.add_argument('--max-history', type=int, default=1000, help='max_history_entries')
+    parser.add_argument('--seed', type=int, default=1, help='semilla de las operaciones')
+    parser.add_argument('--json', action='store_true', help='emitir resultados en JSON')
+    parser.add_argument('--keep', action='store_true', help='conservar el perfil generado')
+    args = parser.parse_args()
+
+    work_dir = tempfile.mkdtemp(prefix='abridor-stress-')
+    profile_dir = os.path.join(work_dir, 'profile')
+    window_dir = os.path.join(work_dir, 'window')
+    os.makedirs(profile_dir)
+    os.makedirs(window_dir)
+    setup_environment(profile_dir, window_dir, args.backend, args.max_history)
+
+    try:
+        from url_manager import URLManager
+        URLManager().save_urls_bulk([{'name': f"semilla{i}", 'url': f"http://semilla{i}.example/"}
+                                     for i in range(SEED_URLS)])
+
+        # Intérpretes nuevos, como las invocaciones de Kodi
+        context = multiprocessing.get_context('spawn')
+        start_event = context.Event()
+        results = context.Queue()
+        processes = [context.Process(target=worker, args=(number, args, start_event, results))
+                     for number in range(args.workers)]
+        for process in processes:
+            process.start()
+
+        # Dar tiempo a que todos importen los módulos antes de arrancar a la vez
+        time.sleep(1.0)
+        start = time.perf_counter()
+        start_event.set()
+        reports = collect_reports(processes, results)
+        elapsed = time.perf_counter() - start
+        for process in processes:
+            process.join()
+
+        verification = verify_profile(profile_dir, args, reports)
+    finally:
+        if args.keep:
+            print(f"Perfil conservado en {profile_dir}", file=sys.stderr)
+        else:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    all_latencies = []
+    operations = {}
+    for name in OPERATIONS:
+        values = [value for report in reports for value in report['latencies'][name]]
+        all_latencies.extend(values)
+        if values:
+            operations[name] = latency_summary(values)
+
+    errors = Counter()
+    if len(reports) < args.workers:
+        errors[f"{args.workers - len(reports)} trabajadores terminaron sin informe"] += 1
+    failures = Counter()
+    lock = {'acquired': 0, 'contended': 0, 'timeouts': 0, 'wait_total_ms': 0.0, 'wait_max_ms': 0.0}
+    for report in reports:
+        errors.update(report['errors'])
+        failures.update(report['failures'])
+        lock['acquired'] += report['lock']['acquired']
+        lock['contended'] += report['lock']['contended']
+        lock['timeouts'] += report['lock']['timeouts']
+        lock['wait_total_ms'] += report['lock']['wait_total'] * 1000
+        lock['wait_max_ms'] = max(lock['wait_max_ms'], report['lock']['wait_max'] * 1000)
+    lock['wait_total_ms'] = round(lock['wait_total_ms'], 1)
+    lock['wait_max_ms'] = round(lock['wait_max_ms'], 1)
+
+    result = {
+        'workers': args.workers,
+        'ops_per_worker': args.ops,
+        'mix': args.mix,
+        'backend': args.backend,
+        'elapsed_s': round(elapsed, 3),
+        'throughput_ops_s': round(len(all_latencies) / elapsed, 1) if elapsed else None,
+        'latency': latency_summary(all_latencies),
+        'operations': operations,
+        'lock': lock,
+        'errors': dict(errors),
+        'failed_operations': dict(failures),
+        **verification
+    }
+    failed = (any(verification['lost_updates'].values()) or any(verification['unexpected_updates'].values())
+              or verification['corruption'] or errors)
+
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        sys.stdout.write('\n')
+    else:
+        print(f"{args.workers} procesos x {args.ops} operaciones, historial {args.backend}: "
+              f"{result['elapsed_s']} s, {result['throughput_ops_s']} op/s")
+        print(f"{'operación':<12}{'n':>7}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'máx ms':>10}")
+        for name, summary in list(operations.items()) + [('total', result['latency'])]:
+            print(f"{name:<12}{summary['count']:>7}{summary['p50_ms']:>10}{summary['p90_ms']:>10}"
+                  f"{summary['p99_ms']:>10}{summary['max_ms']:>10}")
+        print(f"Bloqueos: {lock['acquired']} adquiridos, {lock['contended']} con espera, "
+              f"{lock['timeouts']} agotados, espera máxima {lock['wait_max_ms']} ms")
+        print(f"Perfil: {verification['history_entries']} entradas de historial, "
+              f"{verification['saved_urls']} URLs guardadas")
+        lost = verification['lost_updates']
+        visits_text = lost['visits'] if verification['visits_checked'] else 'sin comprobar'
+        print(f"Actualizaciones perdidas: visitas {visits_text}, URLs {lost['saves']}, accesos {lost['accesses']}")
+        for problem in verification['corruption']:
+            print(f"Daño: {problem}")
+        for message, count in errors.items():
+            print(f"Error ({count}): {message}")
+        if failures:
+            print(f"Operaciones rechazadas: {dict(failures)}")
+
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,11 +3,23 @@
 
 import json
 import os
+import time
+import heapq
 import uuid
+from contextlib import contextmanager
 import xbmc
 import xbmcaddon
 import xbmcvfs
+from frecency import Frecency
+from locking import file_lock
+from search_index import SearchIndex
+from storage import atomic_write_json
 from utils import Utils
+from window_cache import WindowCache
+
+# Índices de las URLs guardadas por archivo, con la versión de los datos con que se
+# construyeron. Con reuselanguageinvoker sobreviven entre invocaciones del plugin
+_loaded_indexes = {}
 
 class URLManager:
     """Clase para gestionar URLs guardadas por el usuario"""
@@ -23,141 +35,476 @@ class URLManager:
             self.data_dir = xbmc.translatePath(self.addon.getAddonInfo('profile'))
         
         self.urls_file = os.path.join(self.data_dir, 'saved_urls.json')
+        self.cache = WindowCache('saved_urls')
+        # Índices de trabajo de la transacción en curso
+        self._pending = None
         
         # Crear directorio de datos si no existe
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
             Utils.log(f"Directorio de datos creado: {self.data_dir}")
     
-    def _load_urls(self):
-        """Cargar URLs desde el archivo JSON"""
+    @contextmanager
+    def transaction(self):
+        """Agrupar varias modificaciones en una sola escritura atómica al final del bloque.
+        
+        Dentro del bloque las lecturas ven los cambios ya hechos. Si el bloque termina
+        con una excepción no se escribe nada; un error al escribir se propaga como
+        OSError. Las transacciones anidadas se integran en la exterior.
+        
+        Otras invocaciones del plugin pueden escribir a la vez: la transacción toma
+        el bloqueo del archivo y parte de la última versión guardada, así que no se
+        pierden cambios. Las lecturas fuera de transacciones no esperan.
+        
+        Los índices se modifican en su sitio y solo se copian los registros que
+        cambian, de modo que cada operación cuesta lo mismo sea cual sea el número
+        de URLs. Lo hecho se anota en una lista para deshacerlo si no se escribe.
+        """
+        if self._pending is not None:
+            yield self
+            return
+        
+        with file_lock(self.urls_file):
+            index = self._get_index()
+            # 'touched' guarda el registro anterior de cada id modificado (None si es nuevo)
+            self._pending = {'index': index, 'dirty': False, 'undo': [], 'touched': {}, 'edited': set(),
+                             'stats': dict(index['stats'])}
+            try:
+                yield self
+                pending = self._pending
+                if pending['dirty']:
+                    self._write_urls(index)
+            except BaseException:
+                self._rollback(self._pending)
+                raise
+            finally:
+                self._pending = None
+            # Con el bloqueo aún tomado: el índice recibe los cambios en el orden en que se escribieron
+            if pending['dirty']:
+                self._update_search_index(index, pending['touched'])
+    
+    def _add(self, url_data):
+        """Añadir un registro a los índices de la transacción en curso"""
+        pending = self._pending
+        self._index_add(pending['index'], url_data)
+        pending['undo'].append(('add', url_data))
+        pending['touched'].setdefault(url_data['id'], None)
+        pending['dirty'] = True
+    
+    def _remove(self, url_data):
+        """Quitar un registro de los índices de la transacción en curso"""
+        pending = self._pending
+        self._index_remove(pending['index'], url_data)
+        pending['undo'].append(('remove', url_data))
+        pending['touched'].setdefault(url_data['id'], url_data)
+        pending['dirty'] = True
+    
+    def _edit(self, url_id):
+        """Obtener una copia del registro para modificarla en la transacción en curso.
+        
+        El registro compartido no se toca: otras lecturas pueden estar usándolo.
+        """
+        pending = self._pending
+        by_id = pending['index']['by_id']
+        url_data = by_id[url_id]
+        if url_id not in pending['edited']:
+            pending['edited'].add(url_id)
+            pending['touched'].setdefault(url_id, url_data)
+            pending['undo'].append(('edit', url_data))
+            url_data = by_id[url_id] = dict(url_data)
+        pending['dirty'] = True
+        return url_data
+    
+    def _rollback(self, pending):
+        """Deshacer en orden inverso los cambios de una transacción que no se escribió"""
+        index = pending['index']
+        for action, url_data in reversed(pending['undo']):
+            if action == 'add':
+                self._index_remove(index, url_data)
+            elif action == 'remove':
+                self._index_add(index, url_data)
+            else:
+                index['by_id'][url_data['id']] = url_data
+        index['stats'] = pending['stats']
+    
+    @staticmethod
+    def _build_index(urls):
+        """Construir los índices id -> registro, nombre -> ids y URL canónica -> ids.
+        
+        'stats' guarda los agregados de get_statistics, que se mantienen al añadir,
+        quitar o abrir URLs sin recorrer la lista. 'by_url' es el más caro de
+        construir y solo lo usan las importaciones: se crea la primera vez que se
+        pide con _url_index.
+        """
+        index = {'by_id': {}, 'by_name': {}, 'by_url': None,
+                 'stats': {'total_accesses': 0, 'most_accessed': None, 'most_recent': None, 'stale': False}}
+        for url in urls:
+            URLManager._index_add(index, url)
+        return index
+    
+    @staticmethod
+    def _index_add(index, url_data):
+        """Añadir un registro a los índices"""
+        index['by_id'][url_data['id']] = url_data
+        index['by_name'].setdefault(url_data['name'].lower(), []).append(url_data['id'])
+        if index['by_url'] is not None:
+            index['by_url'].setdefault(Utils.canonicalize_url(url_data['url']), []).append(url_data['id'])
+        URLManager._stats_update(index, url_data, url_data.get('access_count', 0))
+    
+    @staticmethod
+    def _url_index(index):
+        """Obtener el índice URL canónica -> ids, construyéndolo si aún no existe"""
+        if index['by_url'] is None:
+            by_url = {}
+            for url_data in index['by_id'].values():
+                by_url.setdefault(Utils.canonicalize_url(url_data['url']), []).append(url_data['id'])
+            index['by_url'] = by_url
+        return index['by_url']
+    
+    @staticmethod
+    def _stats_update(index, url_data, accesses):
+        """Sumar accesos de un registro y comprobar si pasa a ser el máximo"""
+        stats = index['stats']
+        stats['total_accesses'] += accesses
+        if stats['stale']:
+            return
+        
+        most_accessed = index['by_id'].get(stats['most_accessed'])
+        if most_accessed is None or url_data.get('access_count', 0) > most_accessed.get('access_count', 0):
+            stats['most_accessed'] = url_data['id']
+        most_recent = index['by_id'].get(stats['most_recent'])
+        if most_recent is None or url_data.get('created_date', '') > most_recent.get('created_date', ''):
+            stats['most_recent'] = url_data['id']
+    
+    @staticmethod
+    def _stats_rebuild(index):
+        """Recalcular los agregados desde cero (tras quitar un máximo o para verificarlos)"""
+        index['stats'] = {'total_accesses': 0, 'most_accessed': None, 'most_recent': None, 'stale': False}
+        for url_data in index['by_id'].values():
+            URLManager._stats_update(index, url_data, url_data.get('access_count', 0))
+    
+    @staticmethod
+    def _index_remove(index, url_data):
+        """Quitar un registro de los índices"""
+        index['by_id'].pop(url_data['id'], None)
+        stats = index['stats']
+        stats['total_accesses'] -= url_data.get('access_count', 0)
+        # Si era un máximo, el siguiente solo se conoce recorriendo: se recalcula al consultarlo
+        if url_data['id'] in (stats['most_accessed'], stats['most_recent']):
+            stats['stale'] = True
+        keys = [('by_name', url_data['name'].lower())]
+        if index['by_url'] is not None:
+            keys.append(('by_url', Utils.canonicalize_url(url_data['url'])))
+        for key, value in keys:
+            ids = index[key].get(value)
+            if ids and url_data['id'] in ids:
+                ids.remove(url_data['id'])
+                if not ids:
+                    del index[key][value]
+    
+    def _file_stamp(self):
+        """Identificar la versión del archivo en disco"""
+        try:
+            stat = os.stat(self.urls_file)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return (None, None)
+    
+    def _get_index(self):
+        """Obtener los índices de la transacción en curso o de los datos guardados.
+        
+        Los índices se construyen una vez por versión de los datos y se reutilizan
+        entre invocaciones (reuselanguageinvoker). Los registros devueltos son
+        compartidos: solo deben modificarse dentro de una transacción.
+        """
+        if self._pending is not None:
+            return self._pending['index']
+        
+        generation = self.cache.get_generation()
+        stamp = (generation,) + self._file_stamp()
+        loaded = _loaded_indexes.get(self.urls_file)
+        if loaded and loaded[0] == stamp:
+            return loaded[1]
+        
+        index = self._build_index(self._read_urls(generation))
+        _loaded_indexes[self.urls_file] = (stamp, index)
+        return index
+    
+    def _read_urls(self, generation):
+        """Leer URLs desde la caché de sesión o desde el archivo JSON"""
+        cached_urls = self.cache.get(generation)
+        if cached_urls is not None:
+            return cached_urls
+        
         try:
+            urls = []
             if os.path.exists(self.urls_file):
                 with open(self.urls_file, 'r', encoding='utf-8') as f:
                     data = json.load(f)
-                    return data.get('urls', [])
-            return []
+                    urls = data.get('urls', [])
+            self.cache.set(urls, generation)
+            return urls
         except (json.JSONDecodeError, IOError) as e:
             Utils.log(f"Error al cargar URLs: {str(e)}", xbmc.LOGERROR)
             return []
     
+    def _load_urls(self):
+        """Obtener la lista de URLs en el orden en que se guardaron"""
+        return list(self._get_index()['by_id'].values())
+    
     def _save_urls(self, urls):
-        """Guardar URLs en el archivo JSON"""
+        """Sustituir todas las URLs al terminar la transacción en curso (o abrir una para ello)"""
+        with self.transaction():
+            for url_data in list(self._pending['index']['by_id'].values()):
+                self._remove(url_data)
+            for url_data in urls:
+                self._add(url_data)
+            self._pending['dirty'] = True
+        return True
+    
+    def _write_urls(self, index):
+        """Escribir las URLs en el archivo JSON de forma atómica"""
+        urls = list(index['by_id'].values())
         try:
             data = {
                 'urls': urls,
                 'version': '1.0'
             }
-            with open(self.urls_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            atomic_write_json(self.urls_file, data, indent=2)
             Utils.log(f"URLs guardadas: {len(urls)} elementos")
-            return True
-        except IOError as e:
-            Utils.log(f"Error al guardar URLs: {str(e)}", xbmc.LOGERROR)
-            return False
-    
-    def save_url(self, name, url, description=None):
-        """Guardar una nueva URL"""
-        urls = self._load_urls()
+        finally:
+            self.cache.invalidate()
         
-        # Verificar si ya existe una URL con el mismo nombre
-        for existing_url in urls:
-            if existing_url['name'].lower() == name.lower():
-                Utils.log(f"URL con nombre '{name}' ya existe")
-                return False
+        # Lo recién escrito pasa a ser la versión en memoria sin volver a leerlo
+        _loaded_indexes[self.urls_file] = ((self.cache.get_generation(),) + self._file_stamp(), index)
+    
+    def _update_search_index(self, index, touched):
+        """Reflejar en el índice de búsqueda las URLs añadidas, cambiadas o eliminadas"""
+        new_urls = index['by_id']
+        changed = [SearchIndex.url_doc(new_urls[url_id]) for url_id, old in touched.items()
+                   if url_id in new_urls and new_urls[url_id] != old]
+        removed = [url_id for url_id, old in touched.items() if old is not None and url_id not in new_urls]
         
-        # Crear nueva entrada
-        new_url = {
+        updates = []
+        if changed:
+            updates.append(('upsert', (changed,)))
+        if removed:
+            updates.append(('remove', (SearchIndex.SOURCE_URLS, removed)))
+        SearchIndex.apply_updates(updates)
+    
+    def _new_url(self, name, url, description=None, created_date=None):
+        """Crear un registro de URL nuevo"""
+        return {
             'id': str(uuid.uuid4()),
             'name': name,
             'url': url,
             'description': description or '',
-            'created_date': Utils.get_current_datetime(),
+            'created_date': created_date or Utils.get_current_datetime(),
             'access_count': 0,
             'last_accessed': None
         }
-        
-        urls.append(new_url)
-        
-        if self._save_urls(urls):
+    
+    def save_url(self, name, url, description=None):
+        """Guardar una nueva URL"""
+        try:
+            with self.transaction():
+                index = self._get_index()
+                
+                # Verificar si ya existe una URL con el mismo nombre
+                if name.lower() in index['by_name']:
+                    Utils.log(f"URL con nombre '{name}' ya existe")
+                    return False
+                
+                self._add(self._new_url(name, url, description))
+            
             Utils.log(f"URL guardada: {name} -> {url}")
             return True
-        return False
+        except (IOError, OSError) as e:
+            Utils.log(f"Error al guardar URLs: {str(e)}", xbmc.LOGERROR)
+            return False
     
-    def get_saved_urls(self):
-        """Obtener todas las URLs guardadas"""
-        urls = self._load_urls()
-        # Ordenar por fecha de creación (más recientes primero)
-        return sorted(urls, key=lambda x: x.get('created_date', ''), reverse=True)
+    def save_urls_bulk(self, items, skip_duplicate_urls=True):
+        """Guardar varias URLs con una sola carga y una sola escritura.
+        
+        items es una lista de diccionarios con 'name', 'url' y opcionalmente
+        'description'. Se omiten los nombres (sin distinguir mayúsculas) y, si
+        skip_duplicate_urls, las URLs canónicas que ya existan o que se repitan
+        dentro de la propia lista.
+        Devuelve un resultado por elemento, en el mismo orden:
+        {'name', 'url', 'status', 'id'} con status 'saved', 'duplicate_name',
+        'duplicate_url', 'invalid' o 'error'.
+        """
+        results = []
+        saved = 0
+        try:
+            with self.transaction():
+                index = self._get_index()
+                by_url = self._url_index(index)
+                created_date = Utils.get_current_datetime()
+                
+                for item in items:
+                    name = (item.get('name') or '').strip()
+                    url = (item.get('url') or '').strip()
+                    result = {'name': name, 'url': url, 'status': 'saved', 'id': None}
+                    results.append(result)
+                    
+                    if not name or not url:
+                        result['status'] = 'invalid'
+                        continue
+                    if name.lower() in index['by_name']:
+                        result['status'] = 'duplicate_name'
+                        continue
+                    if skip_duplicate_urls and Utils.canonicalize_url(url) in by_url:
+                        result['status'] = 'duplicate_url'
+                        continue
+                    
+                    new_url = self._new_url(name, url, item.get('description'), created_date)
+                    self._add(new_url)
+                    result['id'] = new_url['id']
+                    saved += 1
+        except (IOError, OSError) as e:
+            Utils.log(f"Error al guardar URLs: {str(e)}", xbmc.LOGERROR)
+            for result in results:
+                if result['status'] == 'saved':
+                    result['status'] = 'error'
+                    result['id'] = None
+            return results
+        
+        Utils.log(f"URLs guardadas en bloque: {saved} de {len(results)}")
+        return results
+    
+    def replace_urls(self, records, progress_callback=None):
+        """Sustituir todas las URLs por las de un respaldo en una sola escritura atómica.
+        
+        Los registros se conservan tal cual (id, contadores y fechas); solo se
+        completan los campos que falten y se asigna un id nuevo a los repetidos.
+        progress_callback(procesados, total) se llama periódicamente y puede
+        devolver False para cancelar sin modificar nada.
+        """
+        total = len(records)
+        # Informar unas 100 veces como máximo, sea cual sea el tamaño del respaldo
+        report_every = max(1, total // 100)
+        
+        urls = []
+        seen_ids = set()
+        for done, record in enumerate(records, 1):
+            if record.get('name') and record.get('url'):
+                url_data = dict(record)
+                if not url_data.get('id') or url_data['id'] in seen_ids:
+                    url_data['id'] = str(uuid.uuid4())
+                seen_ids.add(url_data['id'])
+                url_data.setdefault('description', '')
+                url_data.setdefault('created_date', Utils.get_current_datetime())
+                url_data.setdefault('access_count', 0)
+                url_data.setdefault('last_accessed', None)
+                urls.append(url_data)
+            
+            if progress_callback and (done % report_every == 0 or done == total):
+                if progress_callback(done, total) is False:
+                    Utils.log("Sustitución de URLs cancelada")
+                    return False
+        
+        try:
+            with self.transaction():
+                self._save_urls(urls)
+        except (IOError, OSError) as e:
+            Utils.log(f"Error al guardar URLs: {str(e)}", xbmc.LOGERROR)
+            return False
+        
+        Utils.log(f"URLs sustituidas: {len(urls)} de {total} registros")
+        return True
+    
+    def get_saved_urls(self, limit=None, offset=0):
+        """Obtener las URLs guardadas, de la más reciente a la más antigua.
+        
+        Con limit se devuelve solo una página a partir de offset, con un montículo
+        acotado en lugar de ordenar todas.
+        """
+        urls = self._get_index()['by_id'].values()
+        if limit is None:
+            # Ordenar por fecha de creación (más recientes primero)
+            return sorted(urls, key=lambda x: x.get('created_date', ''), reverse=True)[offset:]
+        return heapq.nlargest(offset + limit, urls, key=lambda x: x.get('created_date', ''))[offset:]
     
     def get_url_by_id(self, url_id):
         """Obtener URL específica por ID"""
-        urls = self._load_urls()
-        for url in urls:
-            if url['id'] == url_id:
-                return url
-        return None
+        return self._get_index()['by_id'].get(url_id)
     
     def update_url(self, url_id, name=None, url=None, description=None):
         """Actualizar URL existente"""
-        urls = self._load_urls()
-        
-        for i, existing_url in enumerate(urls):
-            if existing_url['id'] == url_id:
+        try:
+            with self.transaction():
+                index = self._get_index()
+                existing_url = index['by_id'].get(url_id)
+                if existing_url is None:
+                    Utils.log(f"URL no encontrada para actualizar: {url_id}")
+                    return False
+                
+                # Reindexar una copia con el nombre y la URL nuevos
+                self._remove(existing_url)
+                updated_url = dict(existing_url)
                 if name is not None:
-                    existing_url['name'] = name
+                    updated_url['name'] = name
                 if url is not None:
-                    existing_url['url'] = url
+                    updated_url['url'] = url
                 if description is not None:
-                    existing_url['description'] = description
+                    updated_url['description'] = description
                 
-                existing_url['modified_date'] = Utils.get_current_datetime()
-                
-                if self._save_urls(urls):
-                    Utils.log(f"URL actualizada: {existing_url['name']}")
-                    return True
-                return False
-        
-        Utils.log(f"URL no encontrada para actualizar: {url_id}")
-        return False
+                updated_url['modified_date'] = Utils.get_current_datetime()
+                self._add(updated_url)
+            
+            Utils.log(f"URL actualizada: {updated_url['name']}")
+            return True
+        except (IOError, OSError) as e:
+            Utils.log(f"Error al guardar URLs: {str(e)}", xbmc.LOGERROR)
+            return False
     
     def delete_url(self, url_id):
         """Eliminar URL por ID"""
-        urls = self._load_urls()
-        
-        for i, url in enumerate(urls):
-            if url['id'] == url_id:
-                deleted_url = urls.pop(i)
-                if self._save_urls(urls):
-                    Utils.log(f"URL eliminada: {deleted_url['name']}")
-                    return True
-                return False
-        
-        Utils.log(f"URL no encontrada para eliminar: {url_id}")
-        return False
+        try:
+            with self.transaction():
+                index = self._get_index()
+                deleted_url = index['by_id'].get(url_id)
+                if deleted_url is None:
+                    Utils.log(f"URL no encontrada para eliminar: {url_id}")
+                    return False
+                
+                self._remove(deleted_url)
+            
+            Utils.log(f"URL eliminada: {deleted_url['name']}")
+            return True
+        except (IOError, OSError) as e:
+            Utils.log(f"Error al guardar URLs: {str(e)}", xbmc.LOGERROR)
+            return False
     
     def increment_access_count(self, url_id):
         """Incrementar contador de accesos de una URL"""
-        urls = self._load_urls()
-        
-        for url in urls:
-            if url['id'] == url_id:
+        try:
+            with self.transaction():
+                if url_id not in self._get_index()['by_id']:
+                    return False
+                
+                url = self._edit(url_id)
+                url['frecency'] = Frecency.add_visit(Frecency.url_key(url), time.time())
                 url['access_count'] = url.get('access_count', 0) + 1
                 url['last_accessed'] = Utils.get_current_datetime()
-                
-                if self._save_urls(urls):
-                    Utils.log(f"Contador de accesos actualizado para: {url['name']}")
-                    return True
-                return False
-        
-        return False
+                self._stats_update(self._pending['index'], url, 1)
+            
+            Utils.log(f"Contador de accesos actualizado para: {url['name']}")
+            return True
+        except (IOError, OSError) as e:
+            Utils.log(f"Error al guardar URLs: {str(e)}", xbmc.LOGERROR)
+            return False
     
     def get_most_accessed_urls(self, limit=10):
         """Obtener URLs más accedidas"""
-        urls = self._load_urls()
-        # Ordenar por número de accesos (mayor a menor)
-        sorted_urls = sorted(urls, key=lambda x: x.get('access_count', 0), reverse=True)
-        return sorted_urls[:limit]
+        # Montículo acotado: no hace falta ordenar todas las URLs
+        urls = self._get_index()['by_id'].values()
+        return heapq.nlargest(limit, urls, key=lambda x: x.get('access_count', 0))
+    
+    def get_top_frecency(self, limit=10):
+        """Obtener las URLs abiertas con mayor puntuación de frecencia"""
+        return Frecency.top(self._get_index()['by_id'].values(), limit, Frecency.url_key)
     
     def search_urls(self, query):
         """Buscar URLs por nombre o URL"""
@@ -200,28 +547,24 @@ class URLManager:
             
             imported_urls = import_data.get('urls', [])
             
-            if merge:
-                # Fusionar con URLs existentes
-                existing_urls = self._load_urls()
-                existing_names = {url['name'].lower() for url in existing_urls}
-                
-                # Agregar solo URLs que no existan
-                new_urls = []
-                for url in imported_urls:
-                    if url['name'].lower() not in existing_names:
-                        # Generar nuevo ID para evitar conflictos
-                        url['id'] = str(uuid.uuid4())
-                        new_urls.append(url)
-                
-                all_urls = existing_urls + new_urls
-            else:
-                # Reemplazar todas las URLs
-                all_urls = imported_urls
+            # Leer y fusionar dentro de la transacción: lo guardado entretanto por
+            # otra invocación forma parte de la versión de partida y no se pierde
+            with self.transaction():
+                if merge:
+                    existing_names = self._get_index()['by_name']
+                    
+                    # Agregar solo URLs que no existan
+                    for url in imported_urls:
+                        if url['name'].lower() not in existing_names:
+                            # Generar nuevo ID para evitar conflictos
+                            url['id'] = str(uuid.uuid4())
+                            self._add(url)
+                else:
+                    # Reemplazar todas las URLs
+                    self._save_urls(imported_urls)
             
-            if self._save_urls(all_urls):
-                Utils.log(f"URLs importadas: {len(imported_urls)} elementos")
-                return True
-            return False
+            Utils.log(f"URLs importadas: {len(imported_urls)} elementos")
+            return True
             
         except (json.JSONDecodeError, IOError) as e:
             Utils.log(f"Error al importar URLs: {str(e)}", xbmc.LOGERROR)
@@ -242,22 +585,24 @@ class URLManager:
         """Restaurar URLs desde copia de seguridad"""
         return self.import_urls(backup_path, merge=False)
     
-    def get_statistics(self):
-        """Obtener estadísticas de URLs"""
-        urls = self._load_urls()
-        
-        total_urls = len(urls)
-        total_accesses = sum(url.get('access_count', 0) for url in urls)
+    def get_statistics(self, verify=False):
+        """Obtener estadísticas de URLs a partir de los agregados del índice.
         
-        # URL más accedida
-        most_accessed = None
-        if urls:
-            most_accessed = max(urls, key=lambda x: x.get('access_count', 0))
+        Con verify=True se recalculan desde cero y se registra si no coincidían.
+        """
+        index = self._get_index()
+        stats = index['stats']
+        if verify or stats['stale']:
+            previous = dict(stats)
+            self._stats_rebuild(index)
+            if verify and not previous['stale'] and previous != index['stats']:
+                Utils.log("Estadísticas de URLs inconsistentes: recalculadas", xbmc.LOGWARNING)
+            stats = index['stats']
         
-        # URL más reciente
-        most_recent = None
-        if urls:
-            most_recent = max(urls, key=lambda x: x.get('created_date', ''))
+        total_urls = len(index['by_id'])
+        total_accesses = stats['total_accesses']
+        most_accessed = index['by_id'].get(stats['most_accessed'])
+        most_recent = index['by_id'].get(stats['most_recent'])
         
         return {
             'total_urls': total_urls,
@@ -9,12 +9,15 @@ import xbmcaddon
 class Utils:
     """Clase de utilidades para el plugin"""
     
+    # Nombre del addon para el log; se conserva entre invocaciones (reuselanguageinvoker)
+    _addon_name = None
+    
     @staticmethod
     def log(message, level=xbmc.LOGDEBUG):
         """Escribir mensaje en el log de Kodi"""
-        addon = xbmcaddon.Addon()
-        addon_name = addon.getAddonInfo('name')
-        xbmc.log(f"[{addon_name}] {message}", level)
+        if Utils._addon_name is None:
+            Utils._addon_name = xbmcaddon.Addon().getAddonInfo('name')
+        xbmc.log(f"[{Utils._addon_name}] {message}", level)
     
     @staticmethod
     def show_notification(title, message, icon=xbmcgui.NOTIFICATION_INFO, time=5000):
@@ -77,6 +80,24 @@ class Utils:
         
         return bool(url_pattern.match(url))
     
+    @staticmethod
+    def canonicalize_url(url):
+        """Normalizar una URL para detectar duplicados (esquema y host en minúsculas,
+        sin puerto por defecto ni fragmento)"""
+        import urllib.parse
+        url = (url or '').strip()
+        try:
+            parts = urllib.parse.urlsplit(url)
+        except ValueError:
+            return url.lower()
+        
+        scheme = parts.scheme.lower()
+        netloc = parts.netloc.lower()
+        if (scheme, netloc.rsplit(':', 1)[-1]) in (('http', '80'), ('https', '443')):
+            netloc = netloc.rsplit(':', 1)[0]
+        path = parts.path or '/'
+        return urllib.parse.urlunsplit((scheme, netloc, path, parts.query, ''))
+    
     @staticmethod
     def sanitize_filename(filename):
         """Sanitizar nombre de archivo eliminando caracteres no válidos"""
@@ -116,6 +137,12 @@ class Utils:
         except OSError:
             return False
     
+    @staticmethod
+    def get_system():
+        """Obtener nombre del sistema operativo en minúsculas (windows, linux...)"""
+        import platform
+        return platform.system().lower()
+    
     @staticmethod
     def get_system_info():
         """Obtener información del sistema"""
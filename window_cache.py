@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import json
+import uuid
+import xbmcgui
+
+class WindowCache:
+    """Caché compartida entre invocaciones del plugin en propiedades de la ventana principal"""
+
+    PREFIX = 'plugin.navegador.kodi.cache.'
+
+    def __init__(self, namespace):
+        self.window = xbmcgui.Window(10000)
+        self.data_property = self.PREFIX + namespace
+        self.generation_property = self.data_property + '.generation'
+
+    def get_generation(self):
+        """Obtener la generación actual; cambia con cada invalidación"""
+        return self.window.getProperty(self.generation_property)
+
+    def has_data(self):
+        """Comprobar sin decodificar si hay datos guardados"""
+        return bool(self.window.getProperty(self.data_property))
+
+    def get(self, generation=None):
+        """Obtener los datos si se guardaron con la generación vigente"""
+        if generation is None:
+            generation = self.get_generation()
+
+        raw = self.window.getProperty(self.data_property)
+        if not raw:
+            return None
+
+        try:
+            stored = json.loads(raw)
+        except ValueError:
+            return None
+
+        if stored.get('generation') != generation:
+            return None
+        return stored.get('data')
+
+    def set(self, data, generation):
+        """Guardar datos leídos de disco con la generación obtenida ANTES de leerlos.
+
+        Si otra invocación invalida la caché mientras tanto, estos datos quedan
+        descartados automáticamente al no coincidir la generación.
+        """
+        stored = {
+            'generation': generation,
+            'data': data
+        }
+        self.window.setProperty(self.data_property, json.dumps(stored, ensure_ascii=False))
+
+    def invalidate(self):
+        """Descartar los datos guardados tras modificar el archivo de origen"""
+        self.window.setProperty(self.generation_property, uuid.uuid4().hex)
+        self.window.clearProperty(self.data_property)